@@ -0,0 +1,89 @@
+"""
+Branded-content detector: accuracy on the labeled corpus and throughput
+against the old per-keyword substring scan
+
+    python benchmarks/bench_branded.py [--posts 100000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from branded import detector  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'branded_corpus.jsonl')
+
+# What calculate_branded_views / calculate_yt_branded_views used to do
+LEGACY_INDICATORS = [
+    'sponsored', 'ad', 'branded', 'collab', 'partnership',
+    'paid', 'promotion', 'sponsor', 'brand', 'product'
+]
+
+
+def legacy_is_branded(platform, item):
+    if platform == 'youtube':
+        title = item['snippet'].get('title', '').lower()
+        description = item['snippet'].get('description', '').lower()
+        return any(i in title or i in description for i in LEGACY_INDICATORS)
+    alt_text = item.get('alt', '').lower()
+    return any(i in alt_text for i in LEGACY_INDICATORS)
+
+
+def load_corpus():
+    with open(CORPUS) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def score(corpus, classify):
+    tp = fp = fn = tn = 0
+    for example in corpus:
+        predicted = classify(example['platform'], example['item'])
+        if predicted and example['branded']:
+            tp += 1
+        elif predicted:
+            fp += 1
+        elif example['branded']:
+            fn += 1
+        else:
+            tn += 1
+    precision = tp / (tp + fp) if tp + fp else 0
+    recall = tp / (tp + fn) if tp + fn else 0
+    return {'accuracy': (tp + tn) / len(corpus), 'precision': precision, 'recall': recall}
+
+
+def throughput(items, classify_batch):
+    start = time.perf_counter()
+    classify_batch(items)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the branded-content detector')
+    parser.add_argument('--posts', type=int, default=100000, help='posts per platform to classify')
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    print(f"Labeled corpus: {len(corpus)} examples")
+    for name, classify in [
+        ('legacy substring', legacy_is_branded),
+        ('detector', lambda platform, item: detector.classify(platform, [item])[0])
+    ]:
+        metrics = score(corpus, classify)
+        print(f"  {name:<17} accuracy {metrics['accuracy']:.2f}  "
+              f"precision {metrics['precision']:.2f}  recall {metrics['recall']:.2f}")
+
+    print(f"Throughput ({args.posts:,} posts per platform):")
+    for platform in ('instagram', 'youtube'):
+        examples = [e['item'] for e in corpus if e['platform'] == platform]
+        items = (examples * (args.posts // len(examples) + 1))[:args.posts]
+        legacy = throughput(items, lambda batch: [legacy_is_branded(platform, i) for i in batch])
+        current = throughput(items, lambda batch: detector.classify(platform, batch))
+        print(f"  {platform:<10} legacy {legacy:>12,.0f}/s  detector {current:>12,.0f}/s  "
+              f"({current / legacy:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,454 @@
+"""
+Offline end-to-end benchmarks: the YouTube client, the metrics engine, the
+proxy manager and process_influencers run against recorded API responses
+(see fixture_server.py) at several roster sizes, reporting throughput,
+latency percentiles and peak RSS, compared with a stored baseline
+
+    python benchmarks/bench_pipeline.py [--sizes 10,1000,50000]
+        [--scenarios metrics,proxy,youtube,pipeline] [--latency 0.02]
+        [--browser] [--save-baseline] [--check]
+
+Each scenario and size runs in its own process, in a scratch directory, so
+peak RSS is per run and no cache, checkpoint or quota file is shared.
+Request-rate limits and quota budgets are lifted: the numbers measure the
+code, not the politeness delays configured for the real services.
+--browser adds the Instagram scenario, which drives a local Chromium (needs
+playwright and its browsers installed) against the fixture pages.
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fixture_server import load_fixture, roster, spreadsheet_id  # noqa: E402
+
+BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_SIZES = [10, 1000, 50000]
+DEFAULT_SCENARIOS = ['metrics', 'proxy', 'youtube', 'pipeline']
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+# Worker side: one scenario at one size, in a scratch directory
+
+def prepare(args):
+    """Isolate the run and lift rate limits and quotas before anything is built"""
+    os.chdir(args.workdir)
+    os.environ.setdefault('YOUTUBE_API_KEY', 'bench')
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+
+    import config
+    for limits in config.RATE_LIMITS.values():
+        limits.update(rate=1e9, burst=1e9, max_rate=1e9)
+    config.YOUTUBE_QUOTA.update(daily_limit=10 ** 12, reserve=0, state_path=None)
+    if args.demographics_model:
+        config.DEMOGRAPHIC_ESTIMATION.update(enabled=True, model_name=args.demographics_model)
+
+    from instrumentation import configure_logging
+    configure_logging(args.log_level)
+
+
+def make_analyzer(args):
+    """A SocialMediaAnalyzer whose Google API clients talk to the fixture server"""
+    from config import DISCOVERY_CACHE
+    from discovery import DiscoveryDocuments
+    from main import SocialMediaAnalyzer
+
+    class FixtureDiscovery(DiscoveryDocuments):
+        def build(self, service, version, **kwargs):
+            kwargs.pop('credentials', None)
+            kwargs.setdefault('developerKey', 'bench')
+            return super().build(service, version,
+                                 client_options={'api_endpoint': args.server + '/'}, **kwargs)
+
+    analyzer = SocialMediaAnalyzer()
+    analyzer.discovery = FixtureDiscovery(**DISCOVERY_CACHE)
+    analyzer._subsystems['sheets'] = analyzer.discovery.build('sheets', 'v4')
+    if not args.demographics_model:
+        # Without a local model, skip loading one: splits are reported as Unknown
+        analyzer.demographics._loaded = True
+        analyzer.demographics._available = False
+    return analyzer
+
+
+def stage_samples(stage):
+    """Latency samples recorded by instrumentation spans for one stage"""
+    from instrumentation import metrics
+    samples = []
+    for (name, _), histogram in metrics.histograms.items():
+        if name == stage:
+            samples.extend(histogram.samples)
+    return samples
+
+
+def bench_metrics(size, args):
+    """profile_metrics per profile, then the whole roster as one DataFrame"""
+    from instagram_scraper import parse_profile_payloads
+    from metrics import aggregate, posts_frame, profile_metrics
+
+    videos = json.loads(load_fixture('youtube', 'videos.list.json'))['items']
+    profiles = []
+    for i in range(size):
+        if i % 2:
+            payload = json.loads(load_fixture('instagram', 'web_profile_info.json')
+                                 .replace('{username}', f'bench.creator.{i:05d}'))
+            posts = parse_profile_payloads([payload], f'bench.creator.{i:05d}')['recent_posts']
+            profiles.append(('instagram', f'bench.creator.{i:05d}', posts))
+        else:
+            profiles.append(('youtube', f'@benchcreator{i:05d}', (videos * 3)[:15]))
+
+    latencies = []
+    start = time.perf_counter()
+    for platform_name, handle, posts in profiles:
+        t = time.perf_counter()
+        profile_metrics(platform_name, handle, posts)
+        latencies.append(time.perf_counter() - t)
+    seconds = time.perf_counter() - start
+
+    t = time.perf_counter()
+    aggregate(posts_frame(profiles))
+    return {'items': size, 'seconds': seconds, 'latencies': latencies,
+            'frame_seconds': round(time.perf_counter() - t, 4)}
+
+
+def bench_proxy(size, args):
+    """Load a proxy list, lease/score/release proxies, validate through the fake proxy"""
+    from proxy_manager import ProxyManager
+
+    countries = ['us', 'uk', 'ca', 'au']
+    path = os.path.join(args.workdir, 'proxies.jsonl')
+    with open(path, 'w') as f:
+        for i in range(size):
+            f.write(json.dumps({'server': f'http://10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}:8080',
+                                'username': f'user{i}', 'password': 'secret',
+                                'country': countries[i % len(countries)]}) + '\n')
+    config = {'path': path, 'snapshot_directory': os.path.join(args.workdir, 'snapshots')}
+
+    t = time.perf_counter()
+    ProxyManager(proxy_source='file', proxy_config=config)
+    load_cold = time.perf_counter() - t
+    t = time.perf_counter()
+    manager = ProxyManager(proxy_source='file', proxy_config=config)
+    load_warm = time.perf_counter() - t
+
+    latencies = []
+    start = time.perf_counter()
+    for i in range(args.proxy_ops):
+        t = time.perf_counter()
+        key = f'worker-{i % 64}'
+        lease = manager.lease(key, country=(countries + [None])[i % 5])
+        if lease is not None:
+            failed = i % 10 == 0
+            if not failed:
+                manager.record_success(lease.base, 0.2)
+            manager.release(key, failed=failed)
+        latencies.append(time.perf_counter() - t)
+    seconds = time.perf_counter() - start
+
+    proxy = f'http://127.0.0.1:{args.proxy_port}'
+    sample = [{'server': proxy, 'username': f'bench-{i}' + ('-bad' if i % 10 == 0 else ''),
+               'password': 'secret'} for i in range(min(size, 100))]
+    t = time.perf_counter()
+    working = manager.validate_proxies(sample, test_url=f'{args.server}/generate_204', timeout=5)
+    return {'items': args.proxy_ops, 'seconds': seconds, 'latencies': latencies,
+            'load_cold_seconds': round(load_cold, 4), 'load_warm_seconds': round(load_warm, 4),
+            'validate_seconds': round(time.perf_counter() - t, 4),
+            'validated': f'{len(working)}/{len(sample)}'}
+
+
+def bench_youtube(size, args):
+    """get_youtube_data for each handle, one at a time"""
+    analyzer = make_analyzer(args)
+    handles = [handle for _, handle, _ in roster(size)]
+    latencies = []
+    found = 0
+    start = time.perf_counter()
+    for handle in handles:
+        t = time.perf_counter()
+        found += analyzer.get_youtube_data(handle) is not None
+        latencies.append(time.perf_counter() - t)
+    return {'items': size, 'seconds': time.perf_counter() - start, 'latencies': latencies,
+            'found': found, 'quota_units': analyzer.youtube_client.quota.used_this_run}
+
+
+def bench_pipeline(size, args):
+    """process_influencers over an Input sheet of this many rows"""
+    analyzer = make_analyzer(args)
+    share = args.instagram_share if args.browser else 0.0
+    if share:
+        setup_local_browser(analyzer, args)
+    start = time.perf_counter()
+    analyzer.process_influencers(spreadsheet_id(size, share), concurrent=args.concurrent, resume=False,
+                                 analysis_workers=args.analysis_workers)
+    seconds = time.perf_counter() - start
+    analyzer.close()
+    return {'items': size, 'seconds': seconds, 'latencies': stage_samples('handle')}
+
+
+def bench_instagram(size, args):
+    """get_instagram_data through the browser pool, on a local Chromium"""
+    analyzer = make_analyzer(args)
+    setup_local_browser(analyzer, args)
+    count = min(size, args.browser_limit)
+    latencies = []
+    found = 0
+    start = time.perf_counter()
+    for i in range(count):
+        t = time.perf_counter()
+        found += analyzer.get_instagram_data(f'bench.creator.{i:05d}') is not None
+        latencies.append(time.perf_counter() - t)
+    seconds = time.perf_counter() - start
+    analyzer.close()
+    return {'items': count, 'seconds': seconds, 'latencies': latencies, 'found': found}
+
+
+def setup_local_browser(analyzer, args):
+    """
+    Point the browser pool at a local headless Chromium (over CDP) and answer
+    www.instagram.com requests from the fixture server
+    """
+    import socket
+    import urllib.request
+
+    import main
+    from playwright.sync_api import sync_playwright
+    from proxy_manager import ProxyManager
+
+    with sync_playwright() as playwright:
+        executable = playwright.chromium.executable_path
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    chromium = subprocess.Popen(
+        [executable, '--headless=new', f'--remote-debugging-port={port}', '--no-first-run',
+         f'--user-data-dir={os.path.join(args.workdir, "chromium")}', 'about:blank'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    endpoint = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f'{endpoint}/json/version', timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    atexit.register(chromium.terminate)
+
+    base = args.server + '/instagram'
+    blocker_install = main.ResourceBlocker.install
+
+    async def install(blocker, page):
+        await blocker_install(blocker, page)
+
+        async def forward(route):
+            url = route.request.url.replace('https://www.instagram.com', base, 1)
+            await route.fulfill(response=await route.fetch(url=url))
+        # Registered last, so it sees Instagram requests before the blocker does
+        await page.route('https://www.instagram.com/**', forward)
+
+    main.ResourceBlocker.install = install
+    # Per-exit-IP pacing only matters against the real site
+    ProxyManager.MIN_REQUEST_INTERVAL = 0
+    analyzer._page_endpoint = lambda slot, failed: endpoint
+
+
+SCENARIOS = {
+    'metrics': bench_metrics,
+    'proxy': bench_proxy,
+    'youtube': bench_youtube,
+    'pipeline': bench_pipeline,
+    'instagram': bench_instagram,
+}
+
+
+def run_worker(args):
+    prepare(args)
+    result = SCENARIOS[args.worker](args.size, args)
+    latencies = sorted(result.pop('latencies'))
+    seconds = result.pop('seconds')
+    items = result.pop('items')
+    summary = {
+        'scenario': args.worker,
+        'size': args.size,
+        'items': items,
+        'seconds': round(seconds, 3),
+        'throughput': round(items / seconds, 2) if seconds else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        **result
+    }
+    print(json.dumps(summary), flush=True)
+
+
+# Runner side: fixture server, one child process per run, report
+
+def start_fixture_server(latency):
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, 'fixture_server.py'),
+         '--port', '0', '--proxy-port', '0', '--latency', str(latency)],
+        stdout=subprocess.PIPE, text=True
+    )
+    _, port, proxy_port = server.stdout.readline().split()
+    return server, f'http://127.0.0.1:{port}', int(proxy_port)
+
+
+def run_one(scenario, size, args, server, proxy_port):
+    with tempfile.TemporaryDirectory(prefix=f'bench-{scenario}-{size}-') as workdir:
+        command = [sys.executable, os.path.abspath(__file__), '--worker', scenario,
+                   '--size', str(size), '--workdir', workdir, '--server', server,
+                   '--proxy-port', str(proxy_port), '--log-level', args.log_level,
+                   '--proxy-ops', str(args.proxy_ops), '--browser-limit', str(args.browser_limit),
+                   '--instagram-share', str(args.instagram_share)]
+        for flag in ('concurrent', 'browser'):
+            if getattr(args, flag):
+                command.append(f'--{flag}')
+        if args.demographics_model:
+            command += ['--demographics-model', args.demographics_model]
+        if args.analysis_workers is not None:
+            command += ['--analysis-workers', str(args.analysis_workers)]
+        completed = subprocess.run(command, stdout=subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            return {'scenario': scenario, 'size': size, 'error': f'exit code {completed.returncode}'}
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def change(current, previous):
+    return (current - previous) / previous * 100 if previous else 0.0
+
+
+def compare(result, baseline, tolerance):
+    """Percentage changes against the baseline and whether any is a regression"""
+    previous = baseline.get(f"{result['scenario']}@{result['size']}")
+    if not previous or 'error' in result:
+        return '', False
+    throughput = change(result['throughput'], previous['throughput'])
+    p95 = change(result['p95_ms'], previous['p95_ms'])
+    rss = change(result['peak_rss_mb'], previous['peak_rss_mb'])
+    regressed = throughput < -tolerance or p95 > tolerance or rss > tolerance
+    text = f"tput {throughput:+.0f}%  p95 {p95:+.0f}%  rss {rss:+.0f}%"
+    return text + ('  REGRESSION' if regressed else ''), regressed
+
+
+def load_baseline():
+    try:
+        with open(BASELINE) as f:
+            return json.load(f).get('results', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baseline(results, args):
+    baseline = load_baseline()
+    baseline.update({f"{r['scenario']}@{r['size']}": r for r in results if 'error' not in r})
+    with open(BASELINE, 'w') as f:
+        json.dump({
+            'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                        'cpus': os.cpu_count()},
+            'latency': args.latency,
+            'results': dict(sorted(baseline.items()))
+        }, f, indent=2)
+        f.write('\n')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Offline benchmarks for the full pipeline')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated roster sizes')
+    parser.add_argument('--scenarios', default=','.join(DEFAULT_SCENARIOS),
+                        help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the fixture server adds to every response')
+    parser.add_argument('--concurrent', action='store_true',
+                        help='run process_influencers with concurrent workers')
+    parser.add_argument('--analysis-workers', type=int,
+                        help='analysis processes with --concurrent (default: config.ANALYSIS)')
+    parser.add_argument('--browser', action='store_true',
+                        help='add the Instagram scenario and Instagram rows, on a local Chromium')
+    parser.add_argument('--browser-limit', type=int, default=100,
+                        help='most Instagram profiles fetched per run in the browser scenario')
+    parser.add_argument('--instagram-share', type=float, default=0.01,
+                        help='fraction of pipeline rows that are Instagram (with --browser)')
+    parser.add_argument('--proxy-ops', type=int, default=2000,
+                        help='lease/release cycles in the proxy scenario')
+    parser.add_argument('--demographics-model',
+                        help='local model directory for demographic estimates (default: skip)')
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--tolerance', type=float, default=10.0,
+                        help='percent change from the baseline reported as a regression')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store these results as the new baseline')
+    parser.add_argument('--check', action='store_true',
+                        help='exit with status 1 if anything regressed')
+    # Used by the runner to start a single measurement
+    parser.add_argument('--worker', choices=list(SCENARIOS), help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--server', help=argparse.SUPPRESS)
+    parser.add_argument('--proxy-port', type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        run_worker(args)
+        return
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    scenarios = args.scenarios.split(',')
+    if args.browser and 'instagram' not in scenarios:
+        scenarios.append('instagram')
+    baseline = load_baseline()
+
+    server, url, proxy_port = start_fixture_server(args.latency)
+    results = []
+    regressions = 0
+    print(f"{'scenario':<10} {'size':>6} {'items':>7} {'seconds':>9} {'items/s':>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rss MB':>7}  vs baseline")
+    try:
+        for scenario in scenarios:
+            for size in sizes:
+                result = run_one(scenario, size, args, url, proxy_port)
+                results.append(result)
+                if 'error' in result:
+                    print(f"{scenario:<10} {size:>6}  failed: {result['error']}")
+                    continue
+                comparison, regressed = compare(result, baseline, args.tolerance)
+                regressions += regressed
+                print(f"{scenario:<10} {size:>6} {result['items']:>7} {result['seconds']:>9.2f} "
+                      f"{result['throughput']:>10,.1f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                      f"{result['p99_ms']:>8.2f} {result['peak_rss_mb']:>7.1f}  {comparison}", flush=True)
+    finally:
+        server.terminate()
+
+    if args.save_baseline:
+        save_baseline(results, args)
+        print(f"Baseline saved to {os.path.relpath(BASELINE)}")
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""
+Offline stand-ins for everything the pipeline talks to, served from the
+recorded responses in benchmarks/fixtures:
+
+- the YouTube Data API (channels, playlistItems, videos, search)
+- the Sheets API (values get/update/batchUpdate), with the Input sheet
+  generated for the roster size encoded in the spreadsheet ID
+- Instagram's homepage, profile pages and web_profile_info JSON, under /instagram
+- a forward HTTP proxy on a second port; users ending in '-bad' get a 502
+
+    python benchmarks/fixture_server.py [--port 8765] [--proxy-port 8766] [--latency 0.02]
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+COUNTRIES = ['us', 'uk', 'ca', 'au', 'United States', 'Canada']
+
+
+def load_fixture(*path):
+    with open(os.path.join(FIXTURES, *path), encoding='utf-8') as f:
+        return f.read()
+
+
+def spreadsheet_id(size, instagram_share=0.0):
+    """Spreadsheet ID whose Input sheet holds a roster of this size"""
+    return f'bench-{size}-{instagram_share:g}'
+
+
+def roster(size, instagram_share=0.0):
+    """Deterministic Input rows: [platform, handle, country]"""
+    every = round(1 / instagram_share) if instagram_share else 0
+    rows = []
+    for i in range(size):
+        if every and i % every == 0:
+            rows.append(['Instagram', f'bench.creator.{i:05d}', COUNTRIES[i % len(COUNTRIES)]])
+        else:
+            rows.append(['YouTube', f'@benchcreator{i:05d}', COUNTRIES[i % len(COUNTRIES)]])
+    return rows
+
+
+def _digest(value, length):
+    raw = hashlib.blake2b(value.encode('utf-8'), digest_size=24).digest()
+    return base64.urlsafe_b64encode(raw).decode('ascii')[:length]
+
+
+def channel_id(handle):
+    return 'UC' + _digest(handle.lstrip('@').lower(), 22)
+
+
+class Fixtures:
+    """Recorded responses, rewritten per request so every handle looks distinct"""
+
+    def __init__(self):
+        self.channel = json.loads(load_fixture('youtube', 'channels.list.json'))['items'][0]
+        self.playlist = json.loads(load_fixture('youtube', 'playlistItems.list.json'))
+        self.videos = json.loads(load_fixture('youtube', 'videos.list.json'))['items']
+        self.batch_update = json.loads(load_fixture('sheets', 'values.batchUpdate.json'))
+        self.update = json.loads(load_fixture('sheets', 'values.update.json'))
+        self.values = json.loads(load_fixture('sheets', 'values.get.json'))
+        self.profile_html = load_fixture('instagram', 'profile.html')
+        self.home_html = load_fixture('instagram', 'home.html')
+        self.profile_json = load_fixture('instagram', 'web_profile_info.json')
+        self._rosters = {}
+        self._lock = threading.Lock()
+
+    # YouTube
+
+    def channels(self, query):
+        if 'forHandle' in query:
+            return {'kind': 'youtube#channelListResponse',
+                    'items': [{'kind': 'youtube#channel', 'id': channel_id(query['forHandle'])}]}
+        items = []
+        for cid in query.get('id', '').split(','):
+            item = json.loads(json.dumps(self.channel))
+            item['id'] = cid
+            item['snippet']['title'] = f'Bench Channel {cid[-6:]}'
+            item['snippet']['customUrl'] = f'@bench{cid[-6:].lower()}'
+            item['contentDetails']['relatedPlaylists']['uploads'] = 'UU' + cid[2:]
+            item['statistics']['subscriberCount'] = str(1000 + int(hashlib.md5(cid.encode()).hexdigest()[:6], 16))
+            items.append(item)
+        return {'kind': 'youtube#channelListResponse', 'items': items}
+
+    def playlist_items(self, query):
+        playlist = query['playlistId']
+        template = self.playlist['items'][0]
+        items = []
+        for k in range(int(query.get('maxResults', 5))):
+            item = json.loads(json.dumps(template))
+            item['contentDetails']['videoId'] = _digest(f'{playlist}:{k}', 11)
+            items.append(item)
+        return {**self.playlist, 'items': items}
+
+    def video_items(self, query):
+        items = []
+        for vid in query.get('id', '').split(','):
+            seed = int(hashlib.md5(vid.encode()).hexdigest()[:8], 16)
+            item = json.loads(json.dumps(self.videos[seed % len(self.videos)]))
+            item['id'] = vid
+            item['statistics']['viewCount'] = str(1000 + seed % 500000)
+            items.append(item)
+        return {'kind': 'youtube#videoListResponse', 'items': items}
+
+    # Sheets
+
+    def _roster(self, sid):
+        with self._lock:
+            if sid not in self._rosters:
+                _, size, share = sid.split('-')
+                self._rosters[sid] = roster(int(size), float(share))
+            return self._rosters[sid]
+
+    def values_get(self, sid, range_name):
+        match = re.search(r'[A-Z]+(\d+):[A-Z]+(\d+)', range_name)
+        first, last = int(match.group(1)), int(match.group(2))
+        rows = self._roster(sid)[first - 2:last - 1] if sid.startswith('bench-') else self.values['values']
+        response = {'range': range_name, 'majorDimension': 'ROWS'}
+        if rows:
+            response['values'] = rows
+        return response
+
+    def values_update(self, sid, range_name, body):
+        rows = body.get('values', [])
+        cells = sum(len(row) for row in rows)
+        return {**self.update, 'spreadsheetId': sid, 'updatedRange': range_name,
+                'updatedRows': len(rows), 'updatedCells': cells}
+
+    def values_batch_update(self, sid, body):
+        data = body.get('data', [])
+        cells = sum(len(row) for entry in data for row in entry.get('values', []))
+        rows = sum(len(entry.get('values', [])) for entry in data)
+        return {**self.batch_update, 'spreadsheetId': sid, 'totalUpdatedRows': rows,
+                'totalUpdatedCells': cells, 'responses': []}
+
+    # Instagram
+
+    def instagram(self, path, query):
+        if path in ('', '/'):
+            return 'text/html; charset=utf-8', self.home_html
+        if path.startswith('/api/v1/users/web_profile_info'):
+            username = query.get('username', '')
+            return 'application/json; charset=utf-8', self.profile_json.replace('{username}', username)
+        username = path.strip('/').split('/')[0]
+        return 'text/html; charset=utf-8', self.profile_html.replace('{username}', username)
+
+
+def make_handler(fixtures, latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are written separately; don't let Nagle hold the body back
+        disable_nagle_algorithm = True
+
+        def _send(self, status, body, content_type='application/json; charset=UTF-8'):
+            if not isinstance(body, (str, bytes)):
+                body = json.dumps(body)
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def _route(self, method):
+            if latency:
+                time.sleep(latency)
+            url = urlsplit(self.path)
+            path = unquote(url.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+            if path == '/generate_204':
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if path.startswith('/instagram'):
+                content_type, body = fixtures.instagram(path[len('/instagram'):], query)
+                return self._send(200, body, content_type)
+            if path.startswith('/youtube/v3/'):
+                resource = path[len('/youtube/v3/'):]
+                handler = {'channels': fixtures.channels, 'playlistItems': fixtures.playlist_items,
+                           'videos': fixtures.video_items,
+                           'search': lambda q: {'items': [{'id': {'channelId': channel_id(q.get('q', ''))}}]}
+                           }.get(resource)
+                if handler:
+                    return self._send(200, handler(query))
+            match = re.match(r'/v4/spreadsheets/([^/]+)/values(?:/(.+)|:batchUpdate)$', path)
+            if match:
+                sid, range_name = match.groups()
+                if method == 'GET':
+                    return self._send(200, fixtures.values_get(sid, range_name))
+                if range_name:
+                    return self._send(200, fixtures.values_update(sid, range_name, self._body()))
+                return self._send(200, fixtures.values_batch_update(sid, self._body()))
+            self._send(404, {'error': {'code': 404, 'message': f'No fixture for {path}'}})
+
+        def do_GET(self):
+            self._route('GET')
+
+        def do_PUT(self):
+            self._route('PUT')
+
+        def do_POST(self):
+            self._route('POST')
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def make_proxy_handler(upstream):
+    """Forward proxy for plain HTTP requests to the fixture server"""
+    class ProxyHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            auth = self.headers.get('Proxy-Authorization', '')
+            user = ''
+            if auth.startswith('Basic '):
+                user = base64.b64decode(auth[6:]).decode('utf-8', 'replace').split(':')[0]
+            url = urlsplit(self.path)
+            if user.endswith('-bad'):
+                self.send_error(502, 'Bad gateway')
+                return
+            if f'{url.hostname}:{url.port}' != upstream:
+                self.send_error(403, 'The benchmark proxy only reaches the fixture server')
+                return
+            with urllib.request.urlopen(self.path, timeout=10) as response:
+                body = response.read()
+                self.send_response(response.status)
+                self.send_header('Content-Type', response.headers.get('Content-Type', 'text/plain'))
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        def do_CONNECT(self):
+            self.send_error(405, 'HTTPS tunnelling is not supported')
+
+        def log_message(self, format, *args):
+            pass
+
+    return ProxyHandler
+
+
+def serve(port=0, proxy_port=0, latency=0.0, host='127.0.0.1'):
+    """Start the fixture server and proxy on daemon threads; returns both servers"""
+    server = ThreadingHTTPServer((host, port), make_handler(Fixtures(), latency))
+    server.daemon_threads = True
+    proxy = ThreadingHTTPServer((host, proxy_port),
+                                make_proxy_handler(f'{host}:{server.server_address[1]}'))
+    proxy.daemon_threads = True
+    for name, instance in (('fixtures', server), ('proxy', proxy)):
+        threading.Thread(target=instance.serve_forever, name=name, daemon=True).start()
+    return server, proxy
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve recorded API responses for the benchmarks')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--proxy-port', type=int, default=8766)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every response, to mimic network round trips')
+    args = parser.parse_args()
+
+    server, proxy = serve(args.port, args.proxy_port, args.latency)
+    # The benchmark runner reads the ports from this line
+    print(f'ready {server.server_address[1]} {proxy.server_address[1]}', flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
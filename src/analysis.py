@@ -0,0 +1,107 @@
+import os
+import re
+from typing import List, Optional
+
+from config import CACHE, DEMOGRAPHIC_ESTIMATION, LANGUAGE_DETECTION
+from instrumentation import configure_logging, get_logger
+
+log = get_logger(__name__)
+
+# Common location patterns in bios
+LOCATION_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'📍\s*([^,\n]+)',  # Location emoji
+    r'Location:\s*([^,\n]+)',  # "Location:" prefix
+    r'Based in\s*([^,\n]+)',  # "Based in" prefix
+    r'From\s*([^,\n]+)',  # "From" prefix
+    r'Living in\s*([^,\n]+)',  # "Living in" prefix
+    r'🌍\s*([^,\n]+)',  # Globe emoji
+    r'🌎\s*([^,\n]+)',  # Earth emoji
+)]
+
+# Detectors of the current analysis process, built by init_process
+_context = None
+
+
+def extract_location(bio: Optional[str]) -> str:
+    """Extract location from bio using NLP patterns"""
+    if not bio or not bio.strip():
+        return 'Unknown'
+    for pattern in LOCATION_PATTERNS:
+        match = pattern.search(bio)
+        if match:
+            # Clean up common suffixes
+            return re.sub(r'[.,;].*$', '', match.group(1).strip())
+    return 'Unknown'
+
+
+def detect_language(detector, text: Optional[str], platform: Optional[str] = None,
+                    channel_info: Optional[dict] = None) -> str:
+    """Content language: a YouTube channel's declared language, else detected from text"""
+    if platform == 'youtube' and channel_info:
+        # defaultLanguage first, then the default audio language; 'en-US' -> 'en'
+        lang = channel_info.get('defaultLanguage') or channel_info.get('defaultAudioLanguage')
+        if lang:
+            return lang.split('-')[0]
+    return detector.detect(text)
+
+
+def build_row(platform: str, handle: str, data: dict, language_detector,
+              demographics) -> List[str]:
+    """The Output sheet row for a fetched Instagram profile or YouTube channel"""
+    # pandas is only imported once the first row is built
+    from metrics import format_count, profile_metrics
+    if platform == 'instagram':
+        metrics = profile_metrics('instagram', handle, data['recent_posts'])
+        return [
+            'Instagram',
+            handle,
+            data['followers'],
+            extract_location(data['bio']),
+            detect_language(language_detector, data['bio'], platform='instagram'),
+            format_count(metrics['avg_views']),
+            format_count(metrics['avg_reach']),
+            format_count(metrics['branded_avg_views']),
+            # Gender, state and age split
+            *demographics.columns('instagram', handle, data)
+        ]
+
+    metrics = profile_metrics('youtube', handle, data['recent_videos'])
+    return [
+        'YouTube',
+        handle,
+        data['subscriber_count'],
+        data['channel_info'].get('country', 'Unknown'),
+        detect_language(language_detector, data['channel_info'].get('description', ''),
+                        platform='youtube', channel_info=data['channel_info']),
+        format_count(metrics['avg_views']),
+        'N/A',  # YouTube doesn't provide reach data
+        format_count(metrics['branded_avg_views']),
+        # Gender, state and age split
+        *demographics.columns('youtube', handle, data)
+    ]
+
+
+def init_process(log_level='INFO', log_format: str = 'text'):
+    """
+    ProcessPoolExecutor initializer: each analysis process gets its own
+    language detector and demographic estimator (and so its own model copy)
+    The processes already use every core between them, so each runs torch
+    (and any BLAS/OpenMP library) on a single thread
+    """
+    global _context
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+    from cache import DataCache
+    from demographics import DemographicEstimator
+    from language import LanguageDetector
+    configure_logging(log_level, log_format)
+    cache = DataCache(CACHE['path'], ttl=CACHE['ttl'], default_ttl=CACHE['default_ttl'])
+    # torch.set_num_threads(1) once the model is loaded
+    _context = (LanguageDetector(**LANGUAGE_DETECTION),
+                DemographicEstimator(cache=cache, **dict(DEMOGRAPHIC_ESTIMATION, threads=1)))
+
+
+def analyze(platform: str, handle: str, data: dict) -> List[str]:
+    """build_row in an analysis process; arguments and result are pickled"""
+    if _context is None:
+        init_process()
+    return build_row(platform, handle, data, *_context)
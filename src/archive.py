@@ -0,0 +1,226 @@
+import glob
+import gzip
+import io
+import json
+import os
+import random
+import re
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from instrumentation import count, get_logger
+
+log = get_logger(__name__)
+
+EXTENSIONS = {'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst'}
+
+# What reading a part that ends in a half-written frame raises
+READ_ERRORS: Tuple[type, ...] = (EOFError, OSError, ValueError)
+try:
+    import zstandard
+    READ_ERRORS += (zstandard.ZstdError,)
+except ImportError:
+    zstandard = None
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+
+class PayloadArchive:
+    """
+    Append-only, compressed JSONL copy of every profile and channel payload
+    fetched, so parsers, metrics and detectors can be rerun over history
+    without scraping again. Records keep what was downloaded: the Instagram
+    JSON responses (source 'network') or the YouTube API resources ('api');
+    DOM scrapes ('dom') only have the parsed profile. Files are partitioned as
+    <directory>/platform=<platform>/date=<YYYY-MM-DD>/part-<host>-<pid>-<time>.jsonl.gz
+    (or .zst); every process writes its own parts, and records are buffered
+    and appended as complete compressed frames, so a crash loses at most
+    the unflushed buffer and never corrupts earlier records
+    """
+
+    def __init__(self, directory: str = '.archive', enabled: bool = True,
+                 compression: str = 'zstd', flush_records: int = 100,
+                 flush_interval: float = 30, screenshots: str = 'failures',
+                 screenshot_sample_rate: float = 0.0):
+        self.directory = directory
+        self.enabled = enabled
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        # 'failures' (plus a sample of successes), 'all' or 'off'
+        self.screenshots = screenshots
+        self.screenshot_sample_rate = screenshot_sample_rate
+        self.records = 0
+
+        self._compressor = None
+        if compression == 'zstd':
+            if zstandard is not None:
+                self._compressor = zstandard.ZstdCompressor(level=3)
+            else:
+                log.info("zstandard is not installed, archiving with gzip")
+                compression = 'gzip'
+        self.compression = compression
+        self._part = f"part-{socket.gethostname()}-{os.getpid()}-{int(time.time())}"
+        self._buffers: Dict[Tuple[str, str], List[str]] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _path(self, platform: str, date: str) -> str:
+        return os.path.join(self.directory, f'platform={platform}', f'date={date}',
+                            self._part + EXTENSIONS[self.compression])
+
+    def _compress(self, data: bytes) -> bytes:
+        if self._compressor is not None:
+            return self._compressor.compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    def append(self, platform: str, handle: str, payload: dict, source: str = 'fetch'):
+        """Archive one fetched payload; source says what it is (see parse_record)"""
+        if not self.enabled or not payload:
+            return
+        record = {'fetched_at': round(time.time(), 3), 'platform': platform,
+                  'handle': handle, 'source': source, 'payload': payload}
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            self._buffers.setdefault((platform, _today()), []).append(line)
+            self.records += 1
+            buffered = sum(len(lines) for lines in self._buffers.values())
+            if (buffered >= self.flush_records
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+        count('archived_payloads', platform=platform)
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        for (platform, date), lines in self._buffers.items():
+            if not lines:
+                continue
+            path = self._path(platform, date)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Each flush appends one self-contained gzip member / zstd frame
+            with open(path, 'ab') as f:
+                f.write(self._compress(''.join(lines).encode('utf-8')))
+        self._buffers.clear()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+
+    # Screenshots
+
+    def wants_screenshot(self, failed: bool) -> bool:
+        """Whether to capture the page: on failure, or for a sample of successes"""
+        if not self.enabled or self.screenshots == 'off':
+            return False
+        if self.screenshots == 'all' or failed:
+            return True
+        return random.random() < self.screenshot_sample_rate
+
+    def save_screenshot(self, platform: str, handle: str, image: bytes, reason: str) -> str:
+        """Store a PNG next to the payloads; returns its path"""
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', handle)
+        path = os.path.join(self.directory, 'screenshots', f'date={_today()}',
+                            f"{platform}_{name}_{time.strftime('%H%M%S')}_{reason}.png")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(image)
+        log.debug("Saved %s screenshot to %s", reason, path)
+        return path
+
+
+def _open_part(path: str):
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"Reading {path} needs the zstandard package (pip install zstandard)")
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True,
+                                                          closefd=True)
+        return io.TextIOWrapper(raw, encoding='utf-8')
+    return gzip.open(path, 'rt', encoding='utf-8')
+
+
+def read_archive(directory: str = '.archive', platform: Optional[str] = None,
+                 since: Optional[str] = None, until: Optional[str] = None) -> Iterator[dict]:
+    """
+    Archived records, optionally for one platform and a date range
+    (inclusive 'YYYY-MM-DD' strings); a part cut short by a crash is read
+    up to its last complete record
+    """
+    pattern = os.path.join(directory, f"platform={platform or '*'}", 'date=*', 'part-*.jsonl.*')
+    for path in sorted(glob.glob(pattern)):
+        date = os.path.basename(os.path.dirname(path))[len('date='):]
+        if (since and date < since) or (until and date > until):
+            continue
+        try:
+            with _open_part(path) as f:
+                for line in f:
+                    if line.endswith('\n'):
+                        yield json.loads(line)
+        except READ_ERRORS as e:
+            log.warning("Stopped reading %s early: %s", path, e)
+
+
+def parse_record(record: dict) -> dict:
+    """
+    The profile/channel data a row is built from, parsed again from the
+    archived raw payload with the current parsers
+    """
+    payload = record['payload']
+    if record.get('source') == 'network':
+        from config import INSTAGRAM_SCRAPER
+        from instagram_scraper import parse_profile_payloads
+        return parse_profile_payloads(payload['payloads'], record['handle'],
+                                      max_posts=INSTAGRAM_SCRAPER['max_posts']) or {}
+    if record.get('source') == 'api':
+        from youtube_client import channel_data
+        return channel_data(payload['channel'], payload['videos'])
+    # DOM scrapes (and records from before raw payloads were kept) are already parsed
+    return payload
+
+
+def latest_payloads(records: Iterator[dict]) -> Dict[Tuple[str, str], dict]:
+    """The newest record per (platform, handle)"""
+    latest: Dict[Tuple[str, str], dict] = {}
+    for record in records:
+        key = (record['platform'], record['handle'])
+        if key not in latest or record['fetched_at'] >= latest[key]['fetched_at']:
+            latest[key] = record
+    return latest
+
+
+def rescore(directory: str = '.archive', platform: Optional[str] = None,
+            since: Optional[str] = None, until: Optional[str] = None, language_detector=None):
+    """
+    Recompute metrics from the archive instead of scraping again: one row
+    per (platform, handle) from its newest payload, with the metrics.aggregate
+    columns and, given a LanguageDetector, the content language
+    """
+    from metrics import aggregate, posts_frame
+
+    latest = latest_payloads(read_archive(directory, platform, since, until))
+    parsed = {key: parse_record(record) for key, record in latest.items()}
+    profiles = []
+    for (name, handle), payload in parsed.items():
+        posts = payload.get('recent_posts') if name == 'instagram' else payload.get('recent_videos')
+        profiles.append((name, handle, posts or []))
+    metrics = aggregate(posts_frame(profiles))
+
+    if language_detector is not None and not metrics.empty:
+        from analysis import detect_language
+        languages = []
+        for name, handle in metrics.index:
+            payload = parsed[(name, handle)]
+            if name == 'instagram':
+                languages.append(detect_language(language_detector, payload.get('bio'), platform=name))
+            else:
+                channel_info = payload.get('channel_info') or {}
+                languages.append(detect_language(language_detector, channel_info.get('description', ''),
+                                                 platform=name, channel_info=channel_info))
+        metrics['language'] = languages
+    return metrics
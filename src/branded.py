@@ -0,0 +1,67 @@
+import re
+from typing import Iterable, List, Optional
+
+# Whole words and phrases (optionally #hashtags, optionally plural) that mark
+# branded content. 'brand', 'partner' and 'product' only count in a phrase:
+# alone they are everyday words ("brand new", "my partner and I")
+BRANDED_KEYWORDS = [
+    'sponsored', 'sponsor', 'ad', 'branded', 'collab', 'partnership',
+    'paid', 'promotion', 'promo', 'spon', 'gifted',
+    'brand partner', 'brand deal', 'brand ambassador', 'product placement'
+]
+
+# Phrases the platforms themselves put on disclosed paid content
+PLATFORM_PHRASES = [
+    'paid partnership',
+    'includes paid promotion',
+    'paid promotion'
+]
+
+
+def compile_pattern(keywords: Iterable[str], phrases: Iterable[str] = ()) -> re.Pattern:
+    """
+    One alternation of whole words/phrases, longest first, for searching
+    lowercased text (much faster than re.IGNORECASE); hashtags match too
+    """
+    words = sorted({r'\s+'.join(map(re.escape, word.lower().split())) for word in keywords},
+                   key=len, reverse=True)
+    phrases = sorted({r'\s+'.join(map(re.escape, phrase.lower().split())) for phrase in phrases},
+                     key=len, reverse=True)
+    alternation = '|'.join(phrases + [f'{word}s?' for word in words])
+    return re.compile(rf'\b(?:{alternation})\b')
+
+
+class BrandedContentDetector:
+    """Classifies Instagram posts and YouTube videos as branded in a single regex pass each"""
+
+    def __init__(self, keywords: Optional[List[str]] = None,
+                 phrases: Optional[List[str]] = None):
+        self.pattern = compile_pattern(
+            BRANDED_KEYWORDS if keywords is None else keywords,
+            PLATFORM_PHRASES if phrases is None else phrases
+        )
+
+    def matches(self, text: Optional[str]) -> bool:
+        return bool(text) and self.pattern.search(text.lower()) is not None
+
+    def is_branded_post(self, post: dict) -> bool:
+        """Instagram: the paid-partnership flag, or a keyword in the alt text/caption"""
+        if post.get('is_paid_partnership'):
+            return True
+        return self.matches(f"{post.get('alt') or ''}\n{post.get('caption') or ''}")
+
+    def is_branded_video(self, video: dict) -> bool:
+        """YouTube: the paid product placement flag, or a keyword in the title/description"""
+        if video.get('paidProductPlacementDetails', {}).get('hasPaidProductPlacement'):
+            return True
+        snippet = video.get('snippet', {})
+        return self.matches(f"{snippet.get('title') or ''}\n{snippet.get('description') or ''}")
+
+    def classify(self, platform: str, items: Iterable[dict]) -> List[bool]:
+        """Branded flag for each post/video of one platform"""
+        check = self.is_branded_video if platform == 'youtube' else self.is_branded_post
+        return [check(item) for item in items]
+
+
+# Shared instance; the pattern is compiled once per process
+detector = BrandedContentDetector()
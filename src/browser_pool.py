@@ -0,0 +1,287 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from playwright.async_api import async_playwright
+from instrumentation import get_logger
+
+log = get_logger(__name__)
+
+
+class PoolExhausted(Exception):
+    """No pooled page was returned within the acquire timeout"""
+
+
+class PooledPage:
+    """A warm page on loan from BrowserPagePool"""
+
+    def __init__(self, page, context, endpoint: str, slot: int):
+        self.page = page
+        self.context = context
+        self.endpoint = endpoint
+        self.slot = slot
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+
+class BrowserPagePool:
+    """
+    Keeps a fixed number of warm, logged-in pages spread across one or more
+    remote browsers and lends them out one profile at a time
+    Pages live in numbered slots; with endpoint_factory each slot gets its
+    endpoint from endpoint_factory(slot, failed), e.g. a sticky proxy session
+    """
+
+    def __init__(self, endpoints: Optional[List[str]] = None, size: int = 4,
+                 endpoint_factory: Optional[Callable[[int, bool], str]] = None,
+                 context_options: Optional[Callable[[str], dict]] = None,
+                 warmup: Optional[Callable[[object, str], Awaitable[None]]] = None,
+                 init_script: Optional[str] = None,
+                 page_setup: Optional[Callable[[object], Awaitable[None]]] = None,
+                 max_page_uses: int = 50, max_page_age: float = 1800,
+                 acquire_timeout: Optional[float] = None):
+        if not endpoints and not endpoint_factory:
+            raise ValueError("BrowserPagePool needs at least one browser endpoint")
+        self.endpoints = endpoints or []
+        self.endpoint_factory = endpoint_factory
+        self.size = size
+        self.context_options = context_options or (lambda endpoint: {})
+        self.warmup = warmup
+        self.init_script = init_script
+        self.page_setup = page_setup
+        self.max_page_uses = max_page_uses
+        self.max_page_age = max_page_age
+        # Longest wait for a page before acquire gives up (None waits forever)
+        self.acquire_timeout = acquire_timeout
+
+        self._playwright = None
+        self._browsers: Dict[str, object] = {}
+        # Open pages per endpoint, so unused browsers can be closed
+        self._page_counts: Dict[str, int] = {}
+        self._idle: List[PooledPage] = []
+        self._available: Optional[asyncio.Condition] = None
+        self._slot_endpoints: Dict[int, str] = {}
+        self._closed = False
+
+        self._acquired = 0
+        self._hits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._lifetimes: List[float] = []
+
+    async def start(self):
+        """Connect to the browsers and warm up every page in the pool"""
+        self._playwright = await async_playwright().start()
+        self._available = asyncio.Condition()
+        pages = await asyncio.gather(
+            *[self.create_page(slot=slot) for slot in range(self.size)],
+            return_exceptions=True
+        )
+        failed_slots = []
+        for slot, pooled in enumerate(pages):
+            if isinstance(pooled, Exception):
+                log.error("Error warming up pooled page: %s", pooled)
+                failed_slots.append(slot)
+                continue
+            await self._put(pooled)
+        if not self._idle:
+            raise Exception("Could not create any browser pages")
+        for slot in failed_slots:
+            self._schedule_refill(slot, failed=True)
+        log.info("Browser pool ready with %s warm pages across %s browsers",
+                 len(self._idle), len(self._browsers))
+
+    def active_endpoints(self) -> List[str]:
+        """Distinct endpoints currently used by the pool's pages"""
+        return list(dict.fromkeys(self._slot_endpoints.values()))
+
+    async def _browser(self, endpoint: str):
+        browser = self._browsers.get(endpoint)
+        if browser is None or not browser.is_connected():
+            browser = await self._playwright.chromium.connect_over_cdp(endpoint)
+            self._browsers[endpoint] = browser
+        return browser
+
+    async def create_page(self, endpoint: Optional[str] = None, slot: int = -1,
+                          failed: bool = False) -> PooledPage:
+        """Open and warm up a new page, outside the pool's idle list"""
+        if endpoint is None:
+            if self.endpoint_factory:
+                endpoint = self.endpoint_factory(slot, failed)
+            else:
+                # Spread pages round-robin over the configured browsers
+                endpoint = self.endpoints[slot % len(self.endpoints)]
+
+        browser = await self._browser(endpoint)
+        context = None
+        try:
+            context = await browser.new_context(**self.context_options(endpoint))
+            page = await context.new_page()
+            if self.init_script:
+                await page.add_init_script(self.init_script)
+            if self.page_setup:
+                await self.page_setup(page)
+            if self.warmup:
+                await self.warmup(page, endpoint)
+        except Exception:
+            if context is not None:
+                await context.close()
+            await self._close_unused_browser(endpoint)
+            raise
+        self._created += 1
+        self._page_counts[endpoint] = self._page_counts.get(endpoint, 0) + 1
+        if slot >= 0:
+            previous = self._slot_endpoints.get(slot)
+            self._slot_endpoints[slot] = endpoint
+            if previous is not None and previous != endpoint:
+                await self._close_unused_browser(previous)
+        return PooledPage(page, context, endpoint, slot)
+
+    async def discard(self, pooled: PooledPage):
+        """Close a page made with create_page without returning it to the pool"""
+        await self._retire(pooled)
+
+    async def _retire(self, pooled: PooledPage):
+        self._lifetimes.append(pooled.age)
+        self._recycled += 1
+        try:
+            await pooled.context.close()
+        except Exception as e:
+            log.error("Error closing pooled context: %s", e)
+        self._page_counts[pooled.endpoint] = self._page_counts.get(pooled.endpoint, 1) - 1
+        await self._close_unused_browser(pooled.endpoint)
+
+    async def _close_unused_browser(self, endpoint: str):
+        """
+        Close the browser behind an endpoint once no page or slot uses it;
+        a slot moved to a fresh proxy session would otherwise leave its old
+        remote browser session open until the pool closes
+        """
+        if self._page_counts.get(endpoint) or endpoint in self._slot_endpoints.values():
+            return
+        self._page_counts.pop(endpoint, None)
+        browser = self._browsers.pop(endpoint, None)
+        if browser is None:
+            return
+        try:
+            await browser.close()
+        except Exception as e:
+            log.error("Error closing browser: %s", e)
+
+    async def _put(self, pooled: PooledPage):
+        async with self._available:
+            self._idle.append(pooled)
+            self._available.notify()
+
+    async def acquire(self, prefer: Optional[Callable[[PooledPage], bool]] = None) -> PooledPage:
+        """
+        Borrow a warm page, waiting for one to be returned if none is idle
+        An idle page matching prefer is picked over the others if there is one
+        Raises PoolExhausted if none comes back within acquire_timeout
+        """
+        start = time.monotonic()
+        async with self._available:
+            if self._idle:
+                self._hits += 1
+            try:
+                await asyncio.wait_for(self._available.wait_for(lambda: self._idle),
+                                       self.acquire_timeout)
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                raise PoolExhausted(f"No browser page free after {self.acquire_timeout:g}s")
+            pooled = next((p for p in self._idle if prefer(p)), None) if prefer else None
+            pooled = pooled or self._idle[0]
+            self._idle.remove(pooled)
+        waited = time.monotonic() - start
+        self._acquired += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        pooled.uses += 1
+        return pooled
+
+    async def release(self, pooled: PooledPage, healthy: bool = True):
+        """Reset a borrowed page and hand it back, replacing it if it's worn out"""
+        if healthy and pooled.uses < self.max_page_uses and pooled.age < self.max_page_age:
+            try:
+                # Drop any dialogs/popups the profile left open, keep the session cookies
+                for extra in pooled.context.pages:
+                    if extra is not pooled.page:
+                        await extra.close()
+                await pooled.page.goto('about:blank')
+                await self._put(pooled)
+                return
+            except Exception as e:
+                log.error("Error resetting pooled page: %s", e)
+                healthy = False
+
+        await self._retire(pooled)
+        await self._refill(pooled.slot, failed=not healthy)
+
+    async def _refill(self, slot: int, failed: bool = False):
+        """Fill a slot with a fresh page, retrying later so waiters aren't left hanging"""
+        if self._closed:
+            return
+        try:
+            await self._put(await self.create_page(slot=slot, failed=failed))
+        except Exception as e:
+            log.error("Error replacing pooled page: %s", e)
+            self._schedule_refill(slot, failed=True)
+
+    def _schedule_refill(self, slot: int, failed: bool):
+        asyncio.get_running_loop().call_later(
+            random.uniform(5, 10), lambda: asyncio.ensure_future(self._refill(slot, failed))
+        )
+
+    @asynccontextmanager
+    async def page(self):
+        """Borrow a page for the duration of a with-block"""
+        pooled = await self.acquire()
+        healthy = True
+        try:
+            yield pooled.page
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            await self.release(pooled, healthy=healthy)
+
+    def stats(self) -> dict:
+        """Pool hit rate, wait times and page lifetimes so far"""
+        lifetimes = self._lifetimes
+        return {
+            'size': self.size,
+            'idle': len(self._idle),
+            'acquired': self._acquired,
+            'hit_rate': self._hits / self._acquired if self._acquired else 0.0,
+            'avg_wait': self._wait_total / self._acquired if self._acquired else 0.0,
+            'max_wait': self._wait_max,
+            'acquire_timeouts': self._timeouts,
+            'pages_created': self._created,
+            'pages_recycled': self._recycled,
+            'avg_page_lifetime': sum(lifetimes) / len(lifetimes) if lifetimes else 0.0,
+        }
+
+    async def close(self):
+        """Close every page, context and browser connection"""
+        # Refills still scheduled must not reconnect afterwards
+        self._closed = True
+        while self._idle:
+            await self._retire(self._idle.pop())
+        for browser in self._browsers.values():
+            try:
+                await browser.close()
+            except Exception as e:
+                log.error("Error closing browser: %s", e)
+        self._browsers.clear()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+class DataCache:
+    """
+    SQLite cache in front of the Instagram and YouTube fetchers
+    Handle -> ID resolutions are kept forever; profile fields expire after
+    their own TTL, or sooner when max_age is set for a run
+    """
+
+    def __init__(self, path: str = '.cache/social_media.db',
+                 ttl: Optional[Dict[str, float]] = None,
+                 default_ttl: float = 86400, max_age: Optional[float] = None):
+        self.path = path
+        self.ttl = ttl or {}
+        self.default_ttl = default_ttl
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS resolved_handles (
+                platform TEXT NOT NULL,
+                handle TEXT NOT NULL,
+                resolved_id TEXT NOT NULL,
+                resolved_at REAL NOT NULL,
+                PRIMARY KEY (platform, handle)
+            );
+            CREATE TABLE IF NOT EXISTS profile_fields (
+                platform TEXT NOT NULL,
+                handle TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (platform, handle, field)
+            );
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def _key(handle: str) -> str:
+        return handle.strip().lower()
+
+    def get_resolved(self, platform: str, handle: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT resolved_id FROM resolved_handles WHERE platform = ? AND handle = ?',
+                (platform, self._key(handle))
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_resolved(self, platform: str, handle: str, resolved_id: str):
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO resolved_handles VALUES (?, ?, ?, ?)',
+                (platform, self._key(handle), resolved_id, time.time())
+            )
+            self._db.commit()
+
+    def field_ttl(self, field: str) -> float:
+        ttl = self.ttl.get(field, self.default_ttl)
+        if self.max_age is not None:
+            ttl = min(ttl, self.max_age)
+        return ttl
+
+    def get_profile(self, platform: str, handle: str) -> Optional[dict]:
+        """Cached profile data, or None if missing or any field is too old"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT field, value, fetched_at FROM profile_fields WHERE platform = ? AND handle = ?',
+                (platform, self._key(handle))
+            ).fetchall()
+
+        now = time.time()
+        data = {}
+        for field, value, fetched_at in rows:
+            if now - fetched_at > self.field_ttl(field):
+                self.misses += 1
+                return None
+            data[field] = json.loads(value)
+
+        if not data:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def set_profile(self, platform: str, handle: str, data: dict):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO profile_fields VALUES (?, ?, ?, ?, ?)',
+                [(platform, self._key(handle), field, json.dumps(value), now)
+                 for field, value in data.items()]
+            )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
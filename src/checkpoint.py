@@ -0,0 +1,161 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+from instrumentation import get_logger
+
+log = get_logger(__name__)
+
+
+class RunJournal:
+    """
+    Append-only JSONL record of every finished handle in a run, so a
+    crashed run can resume without fetching anything twice
+    Handles that failed are journaled too (with no row) and retried on resume
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[int, dict] = {}
+        self.flushed_index = 0
+        self.flushed_cursor = 2
+        # Retried rows written after the rows that had already passed them
+        self.late_written = set()
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._load()
+        self._file = open(path, 'a')
+
+    @classmethod
+    def for_spreadsheet(cls, directory: str, spreadsheet_id: str,
+                        fresh: bool = False) -> 'RunJournal':
+        """Journal for a spreadsheet; fresh=True discards an unfinished earlier run"""
+        name = re.sub(r'[^A-Za-z0-9_-]', '_', spreadsheet_id or 'default')
+        path = os.path.join(directory, f"{name}.jsonl")
+        if fresh and os.path.exists(path):
+            os.remove(path)
+        return cls(path)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a half-written last line
+                    continue
+                if entry.get('type') == 'flushed':
+                    self.flushed_index = entry['index']
+                    self.flushed_cursor = entry['cursor']
+                    self.late_written.update(entry.get('late', ()))
+                else:
+                    self.entries[entry['index']] = entry
+        if self.entries:
+            failed = sum(1 for entry in self.entries.values() if entry['row'] is None)
+            log.info("Resuming run: %s handles already done, %s failed and to be retried, "
+                     "%s written to the sheet", len(self.entries) - failed, failed, self.flushed_index)
+
+    def _append(self, entry: dict):
+        with self._lock:
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def completed(self, index: int, platform: str, handle: str) -> Optional[dict]:
+        """The journal entry for this row, if an earlier run finished it with a row"""
+        entry = self.entries.get(index)
+        if (entry and entry['row'] is not None
+                and entry['platform'] == platform.lower() and entry['handle'] == handle):
+            return entry
+        return None
+
+    def record(self, index: int, platform: str, handle: str, row: Optional[list]):
+        entry = {'index': index, 'platform': platform.lower(), 'handle': handle, 'row': row}
+        if row is not None and index <= self.flushed_index:
+            # A retried failure whose place in the sheet has already been written past
+            entry['late'] = True
+        self.entries[index] = entry
+        self._append(entry)
+
+    def record_flush(self, index: int, cursor: int, late: Iterable[int] = ()):
+        """The sheet holds every row up to index, and the late rows, up to cursor"""
+        self.flushed_index = index
+        self.flushed_cursor = cursor
+        entry = {'type': 'flushed', 'index': index, 'cursor': cursor}
+        late = list(late)
+        if late:
+            entry['late'] = late
+            self.late_written.update(late)
+        self._append(entry)
+
+    def close(self, finished: bool = False):
+        """Close the journal; a finished run's journal is removed"""
+        self._file.close()
+        if finished:
+            os.remove(self.path)
+
+
+class OrderedFlusher:
+    """
+    Hands finished rows to a SheetsWriter in input order as soon as every
+    row before them is done, and journals what the writer has written
+    A failed row that succeeds on resume after the sheet has moved past it
+    is appended after the rows already written
+    """
+
+    def __init__(self, journal: RunJournal, writer):
+        self.journal = journal
+        self.writer = writer
+        writer.cursor = journal.flushed_cursor
+        writer.on_flush = self._on_flush
+        self.next_index = journal.flushed_index + 1
+        # Failed rows are left out: they are retried and take their place again
+        self._done: Dict[int, Optional[list]] = {
+            index: entry['row'] for index, entry in journal.entries.items()
+            if index >= self.next_index and entry['row'] is not None
+        }
+        # Late rows handed to the writer but not written yet
+        self._late: List[int] = []
+        for index in sorted(journal.entries):
+            entry = journal.entries[index]
+            if entry.get('late') and index not in journal.late_written:
+                self._add_late(index, entry['row'])
+
+    def add(self, index: int, row: Optional[list]):
+        if index < self.next_index:
+            if row:
+                self._add_late(index, row)
+            return
+        self._done[index] = row
+        self._release()
+
+    def _add_late(self, index: int, row: list):
+        self._late.append(index)
+        self.writer.append([row], checkpoint=self.next_index - 1)
+
+    def _on_flush(self, index: int, cursor: int):
+        late, self._late = self._late, []
+        self.journal.record_flush(index, cursor, late)
+
+    def _release(self):
+        index = self.next_index
+        rows = []
+        while index in self._done:
+            row = self._done.pop(index)
+            if row:
+                rows.append(row)
+            index += 1
+        if index == self.next_index:
+            self.writer.maybe_flush()
+            return
+        self.next_index = index
+        self.writer.append(rows, checkpoint=index - 1)
+
+    def flush(self) -> bool:
+        """Write everything released so far"""
+        self._release()
+        return self.writer.flush()
@@ -10,10 +10,238 @@ YOUTUBE_API_SCOPES = [
 
 # AI model configuration for demographic estimation
 DEMOGRAPHIC_ESTIMATION = {
+    # Gender/age shares are similarities between an untuned encoder's embeddings
+    # and label prototypes, not a trained classifier's output. Off by default:
+    # the split columns stay 'TBD'; when on, their headers say they're heuristic
+    'enabled': False,
     'model_name': 'bert-base-uncased',
     'labels': {
         'gender': ['male', 'female', 'other'],
         'age': ['13-17', '18-24', '25-34', '35-44', '45+'],
         'location': 'state_wise'
+    },
+    # CPU inference: 'quantized' (int8 dynamic quantization), 'onnx'
+    # (ONNX Runtime via optimum, if installed) or 'torch'
+    'runtime': 'quantized',
+    'max_length': 128,       # tokens per text
+    'batch_size': 32,        # texts per forward pass, across concurrent workers
+    'max_wait': 0.05,        # seconds to wait for a batch to fill
+    'temperature': 0.05,     # softmax temperature over prototype similarities
+    'threads': None,         # torch intra-op threads (None: torch default; analysis processes use 1)
+    # Countries whose state/province names make up the state split
+    'state_countries': ['us', 'ca', 'au', 'in']
+}
+
+# Maximum number of handles fetched at once per platform in concurrent mode
+CONCURRENCY = {
+    'instagram': 4,
+    'youtube': 8
+}
+
+# CPU stage of concurrent runs: output rows (language, location, metrics,
+# demographic estimates) are built in separate processes, so the fetchers
+# never wait on them. Each process loads its own copy of the demographics model
+ANALYSIS = {
+    'workers': None,         # analysis processes (None: one per spare CPU core, 0: build rows on the fetch threads)
+    'max_workers': 4,        # cap on that default...
+    'model_memory': 600e6,   # ...and, with demographics enabled, on its model copies (bytes each)
+    'memory_share': 0.5,     # ...fitting in this share of physical memory
+    'queue_size': 32         # fetched profiles waiting for a free process; beyond this fetching slows down
+}
+
+# Warm Scraping Browser pages shared by all Instagram fetches
+BROWSER_POOL = {
+    'size': 4,
+    'max_page_uses': 50,     # recycle a page's context after this many profiles
+    'max_page_age': 1800,    # ... or after this many seconds
+    'acquire_timeout': 120,  # give up waiting for a free page after this many seconds
+    'fetch_timeout': 300     # ... and on a whole profile fetch, page wait included
+}
+
+# Stored Instagram logins (Playwright storage_state), per account and proxy country
+SESSION_CACHE = {
+    'directory': '.sessions',
+    'ttl': 86400,              # log in again once a day
+    'refresh_margin': 3600,    # renew in the background this long before expiry
+    'refresh_interval': 600    # how often to check for sessions to renew
+}
+
+INSTAGRAM_SCRAPER = {
+    # 'network' reads the profile/timeline JSON the page downloads (falling
+    # back to the DOM if none arrives), 'dom' clicks through the posts
+    'extraction': 'network',
+    'max_posts': 15
+}
+
+# Requests aborted on scraping pages to save proxy bandwidth; set 'enabled'
+# to False to measure the unblocked transfer size for comparison
+RESOURCE_BLOCKING = {
+    'enabled': True,
+    'resource_types': ['image', 'media', 'font'],
+    'url_patterns': [
+        r'google-analytics\.com',
+        r'googletagmanager\.com',
+        r'doubleclick\.net',
+        r'connect\.facebook\.net',
+        r'facebook\.com/tr',
+        r'instagram\.com/logging',
+        r'graph\.instagram\.com/logging_client_events',
+    ],
+    # Let small post thumbnails through (e.g. for screenshots)
+    'allow_thumbnails': False,
+    'thumbnail_pattern': r'cdninstagram\.com/.*(s150x150|s240x240|s320x320|s640x640)'
+}
+
+# YouTube Data API quota budget; calls are refused once used + reserve
+# would pass the daily limit
+YOUTUBE_QUOTA = {
+    'daily_limit': 10000,
+    'reserve': 200,
+    'state_path': '.youtube_quota.json'
+}
+
+# On-disk cache of fetched profiles; TTLs in seconds per field
+CACHE = {
+    'path': '.cache/social_media.db',
+    'default_ttl': 86400,
+    'ttl': {
+        # Instagram
+        'followers': 86400,
+        'bio': 7 * 86400,
+        'recent_posts': 86400,
+        # YouTube
+        'channel_id': 365 * 86400,
+        'subscriber_count': 86400,
+        'channel_info': 7 * 86400,
+        'recent_videos': 86400,
+        # Estimated audience split
+        'demographics': 7 * 86400
     }
-} 
\ No newline at end of file
+}
+
+# Journal of finished handles for resumable runs
+CHECKPOINT = {
+    'directory': '.checkpoints'
+}
+
+# Batched writes to the Output sheet
+SHEETS_WRITER = {
+    'max_rows': 200,             # flush once this many rows are buffered...
+    'max_interval': 15,          # ...or this many seconds after the last flush
+    'max_retries': 5             # retries on 429/5xx, with exponential backoff
+}
+
+# Rows fetched per request when reading the Input sheet
+INPUT = {
+    'page_size': 1000
+}
+
+# Proxy countries (one sticky session per browser page, spread over these)
+# and how an influencer's region column maps onto them
+PROXY_ROUTING = {
+    'countries': ['us', 'uk', 'ca', 'au'],
+    'aliases': {
+        'gb': 'uk',
+        'united kingdom': 'uk',
+        'united states': 'us',
+        'usa': 'us',
+        'canada': 'ca',
+        'australia': 'au'
+    }
+}
+
+# Parsed proxy list files are snapshotted here for fast startup
+PROXY_STORE = {
+    'snapshot_directory': '.cache/proxies'
+}
+
+# Adaptive token buckets per domain/API. rate and burst are the starting
+# requests/second and burst size; the rate grows by `increase` per success up
+# to max_rate and is multiplied by `decrease` on a 429 or challenge page
+# (slow_decrease when a reply takes longer than latency_target seconds)
+RATE_LIMITS = {
+    'default': {
+        'rate': 1.0,
+        'burst': 2,
+        'min_rate': 0.05,
+        'max_rate': 2.0,
+        'increase': 0.05,
+        'decrease': 0.5,
+        'slow_decrease': 0.9,
+        'cooldown': 30
+    },
+    'instagram.com': {
+        'rate': 0.3,
+        'burst': 2,
+        'min_rate': 0.02,
+        'max_rate': 1.0,
+        'increase': 0.01,
+        'latency_target': 10.0,
+        'cooldown': 120
+    },
+    'youtube': {
+        'rate': 5.0,
+        'burst': 10,
+        'min_rate': 0.5,
+        'max_rate': 20.0,
+        'increase': 0.5,
+        'latency_target': 3.0
+    },
+    'sheets': {
+        'rate': 0.8,     # ~50 writes/minute, under the 60/minute per-user quota
+        'burst': 5,
+        'min_rate': 0.1,
+        'max_rate': 0.9,
+        'increase': 0.02,
+        'cooldown': 60
+    }
+}
+
+# Language detection: fastText's lid.176 model is used when fasttext is
+# installed and the model file exists, otherwise seeded langdetect
+LANGUAGE_DETECTION = {
+    'backend': 'auto',                   # 'auto', 'fasttext' or 'langdetect'
+    'fasttext_model': 'models/lid.176.ftz',
+    'cache_size': 100000,                # texts remembered (by hash) per process
+    'seed': 0,
+    'min_length': 20,                    # shorter texts are reported as Unknown
+    'min_confidence': 0.5                # fastText predictions below this are Unknown
+}
+
+# Google API discovery documents, cached so clients build without a fetch
+DISCOVERY_CACHE = {
+    'directory': '.cache/discovery',
+    'ttl': 7 * 86400
+}
+
+# Logging and metrics. With enabled=False spans and counters are no-ops
+INSTRUMENTATION = {
+    'enabled': True,
+    'log_level': 'INFO',          # DEBUG shows every navigation/retry step
+    'log_format': 'text',         # 'text' or 'json' (one object per line)
+    'metrics_port': None,         # serve Prometheus /metrics on this port
+    'summary_directory': '.runs'  # per-run JSON summaries with p50/p95/p99
+}
+
+# Multi-machine runs: a coordinator queues the roster and merges results,
+# workers lease batches of rows. queue is a redis:// URL, or a SQLite file
+# path for workers on a single machine
+DISTRIBUTED = {
+    'queue': '.queue/tasks.db',
+    'visibility_timeout': 600,   # seconds before an unfinished lease is handed out again
+    'lease_batch': 50,           # rows leased by a worker at a time
+    'max_attempts': 5,           # leases before a row is given up (left out of the sheet)
+    'poll_interval': 2           # seconds between queue polls when idle
+}
+
+# What every fetch downloaded (Instagram JSON responses, YouTube API resources),
+# kept to re-parse and re-analyze without scraping again (archive.rescore)
+ARCHIVE = {
+    'enabled': True,
+    'directory': '.archive',         # platform=<platform>/date=<YYYY-MM-DD>/part-*.jsonl.zst
+    'compression': 'zstd',           # 'zstd' (needs zstandard, else gzip) or 'gzip'
+    'flush_records': 100,            # payloads per compressed frame...
+    'flush_interval': 30,            # ...or seconds since the last flush
+    'screenshots': 'failures',       # capture pages on 'failures', 'all' or 'off'
+    'screenshot_sample_rate': 0.01   # share of successful fetches captured too
+}
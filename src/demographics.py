@@ -0,0 +1,299 @@
+import queue
+import re
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+from instrumentation import get_logger
+
+log = get_logger(__name__)
+
+UNKNOWN = 'Unknown'
+# Split cells while estimation is disabled
+PLACEHOLDER = 'TBD'
+
+# Output sheet headers of the gender, state and age columns
+HEADERS = ['Est. Gender Split', 'Est. State Split', 'Est. Age Split']
+HEURISTIC_HEADERS = ['Gender Split (heuristic, uncalibrated)', 'State Mentions (heuristic)',
+                     'Age Split (heuristic, uncalibrated)']
+
+# Short descriptions each label's texts tend to resemble; labels from the
+# config that aren't listed here are described by the label itself
+LABEL_PROTOTYPES = {
+    'gender': {
+        'male': 'he him his man guy boy father dad husband brother son boyfriend',
+        'female': 'she her hers woman girl mother mom wife sister daughter girlfriend',
+        'other': 'they them nonbinary genderqueer trans queer enby'
+    },
+    'age': {
+        '13-17': 'teen high school homework class exams prom grade parents',
+        '18-24': 'college university student campus dorm graduation internship first job',
+        '25-34': 'young professional career wedding engaged startup new apartment newborn',
+        '35-44': 'parenting kids family mortgage school run career manager',
+        '45+': 'grandchildren retirement decades of experience empty nest veteran'
+    }
+}
+
+# State/province names looked for in bios and captions, per country
+STATE_GAZETTEERS = {
+    'us': [
+        'Alabama', 'Alaska', 'Arizona', 'Arkansas', 'California', 'Colorado', 'Connecticut',
+        'Delaware', 'Florida', 'Georgia', 'Hawaii', 'Idaho', 'Illinois', 'Indiana', 'Iowa',
+        'Kansas', 'Kentucky', 'Louisiana', 'Maine', 'Maryland', 'Massachusetts', 'Michigan',
+        'Minnesota', 'Mississippi', 'Missouri', 'Montana', 'Nebraska', 'Nevada',
+        'New Hampshire', 'New Jersey', 'New Mexico', 'New York', 'North Carolina',
+        'North Dakota', 'Ohio', 'Oklahoma', 'Oregon', 'Pennsylvania', 'Rhode Island',
+        'South Carolina', 'South Dakota', 'Tennessee', 'Texas', 'Utah', 'Vermont', 'Virginia',
+        'Washington', 'West Virginia', 'Wisconsin', 'Wyoming'
+    ],
+    'ca': [
+        'Alberta', 'British Columbia', 'Manitoba', 'New Brunswick', 'Newfoundland',
+        'Nova Scotia', 'Ontario', 'Prince Edward Island', 'Quebec', 'Saskatchewan', 'Yukon'
+    ],
+    'au': [
+        'New South Wales', 'Queensland', 'South Australia', 'Tasmania', 'Victoria',
+        'Western Australia', 'Northern Territory'
+    ],
+    'in': [
+        'Andhra Pradesh', 'Arunachal Pradesh', 'Assam', 'Bihar', 'Chhattisgarh', 'Goa',
+        'Gujarat', 'Haryana', 'Himachal Pradesh', 'Jharkhand', 'Karnataka', 'Kerala',
+        'Madhya Pradesh', 'Maharashtra', 'Manipur', 'Meghalaya', 'Mizoram', 'Nagaland',
+        'Odisha', 'Punjab', 'Rajasthan', 'Sikkim', 'Tamil Nadu', 'Telangana', 'Tripura',
+        'Uttar Pradesh', 'Uttarakhand', 'West Bengal', 'Delhi'
+    ]
+}
+
+
+def profile_texts(platform: str, data: dict, max_texts: int = 16) -> List[str]:
+    """Bio/description plus post captions (or video titles and descriptions) of a profile"""
+    if platform == 'youtube':
+        texts = [data.get('channel_info', {}).get('description', '')]
+        texts += [f"{video['snippet'].get('title', '')}. {video['snippet'].get('description', '')}"
+                  for video in data.get('recent_videos', [])]
+    else:
+        texts = [data.get('bio', '')]
+        texts += [post.get('caption') or post.get('alt') or '' for post in data.get('recent_posts', [])]
+    return [text.strip() for text in texts if text and text.strip()][:max_texts]
+
+
+def format_split(distribution: Dict[str, float], top: Optional[int] = None) -> str:
+    """{'male': 0.52, 'female': 0.41} -> 'male 52% / female 41%'"""
+    if not distribution:
+        return UNKNOWN
+    items = sorted(distribution.items(), key=lambda item: item[1], reverse=True)[:top]
+    return ' / '.join(f"{label} {share:.0%}" for label, share in items)
+
+
+class DemographicEstimator:
+    """
+    CPU estimate of the gender, age and state split behind a profile
+    Gender and age are zero-shot: texts are embedded with the configured
+    encoder (mean pooled) and compared with each label's prototype text.
+    States come from gazetteer mentions. The model is loaded on first use,
+    and requests from all worker threads are coalesced into padded batches
+    on one inference thread so they don't compete for CPU cores.
+    The shares are uncalibrated heuristics, so this only runs with enabled=True;
+    otherwise the columns keep the 'TBD' placeholder.
+    """
+
+    def __init__(self, enabled: bool = False, model_name: str = 'bert-base-uncased',
+                 labels: Optional[dict] = None,
+                 runtime: str = 'quantized', max_length: int = 128, batch_size: int = 32,
+                 max_wait: float = 0.05, temperature: float = 0.05, threads: Optional[int] = None,
+                 state_countries: Optional[List[str]] = None, cache=None):
+        self.enabled = enabled
+        self.model_name = model_name
+        self.labels = labels or {}
+        self.runtime = runtime
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.temperature = temperature
+        self.threads = threads
+        # Optional DataCache; estimates are stored per platform/handle
+        self.cache = cache
+        self._memo: Dict[tuple, dict] = {}
+
+        states = [state for country in (state_countries or []) for state in STATE_GAZETTEERS.get(country, [])]
+        self.state_names = {state.lower(): state for state in states}
+        self.state_pattern = re.compile(
+            r'\b(?:' + '|'.join(re.escape(s) for s in sorted(self.state_names, key=len, reverse=True)) + r')\b'
+        ) if states else None
+
+        self._requests: 'queue.Queue' = queue.Queue()
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._available = True
+        self._worker: Optional[threading.Thread] = None
+        self.batches = 0
+        self.texts_embedded = 0
+
+    # Model loading
+
+    def _load(self) -> bool:
+        """Load the tokenizer, encoder and label prototypes once; False if unavailable"""
+        with self._load_lock:
+            if self._loaded:
+                return self._available
+            self._loaded = True
+            try:
+                import torch
+                from transformers import AutoModel, AutoTokenizer
+            except ImportError:
+                log.warning("torch/transformers not installed; demographics will be Unknown")
+                self._available = False
+                return False
+
+            self._torch = torch
+            if self.threads:
+                torch.set_num_threads(self.threads)
+            try:
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                self._model = None
+                if self.runtime == 'onnx':
+                    try:
+                        from optimum.onnxruntime import ORTModelForFeatureExtraction
+                        self._model = ORTModelForFeatureExtraction.from_pretrained(self.model_name, export=True)
+                    except ImportError:
+                        log.warning("optimum[onnxruntime] not installed, using quantized PyTorch")
+                        self.runtime = 'quantized'
+                if self._model is None:
+                    model = AutoModel.from_pretrained(self.model_name).eval()
+                    if self.runtime == 'quantized':
+                        # int8 Linear layers: several times faster on CPU for a small accuracy cost
+                        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                    self._model = model
+
+                self._prototypes = {}
+                for dimension in ('gender', 'age'):
+                    names = self.labels.get(dimension) or []
+                    if names:
+                        descriptions = [LABEL_PROTOTYPES.get(dimension, {}).get(name, name) for name in names]
+                        self._prototypes[dimension] = (names, self._embed(descriptions))
+            except Exception as e:
+                log.error("Error loading demographic model %s: %s", self.model_name, e)
+                self._available = False
+                return False
+            log.info("Loaded demographic model %s (%s)", self.model_name, self.runtime)
+
+            self._worker = threading.Thread(target=self._serve, name='demographics', daemon=True)
+            self._worker.start()
+            return True
+
+    def _embed(self, texts: List[str]):
+        """L2-normalised mean-pooled embeddings for one padded batch"""
+        torch = self._torch
+        # Sorting by length keeps padding (wasted compute) to a minimum
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        inputs = self._tokenizer([texts[i] for i in order], padding=True, truncation=True,
+                                 max_length=self.max_length, return_tensors='pt')
+        with torch.inference_mode():
+            hidden = self._model(**inputs).last_hidden_state
+            mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1)
+            pooled = torch.nn.functional.normalize(pooled, dim=-1)
+        embeddings = torch.empty_like(pooled)
+        embeddings[torch.tensor(order)] = pooled
+        self.texts_embedded += len(texts)
+        return embeddings
+
+    # Batching
+
+    def _serve(self):
+        """Inference thread: gather queued requests into batches and embed them together"""
+        while True:
+            pending = [self._requests.get()]
+            size = len(pending[0][0])
+            while size < self.batch_size:
+                try:
+                    request = self._requests.get(timeout=self.max_wait)
+                except queue.Empty:
+                    break
+                pending.append(request)
+                size += len(request[0])
+
+            texts = [text for request_texts, _ in pending for text in request_texts]
+            try:
+                embeddings = self._embed(texts)
+                self.batches += 1
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for request_texts, future in pending:
+                future.set_result(embeddings[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+    def embed(self, texts: List[str]):
+        future = Future()
+        self._requests.put((texts, future))
+        return future.result()
+
+    # Estimation
+
+    def _split(self, dimension: str, embeddings) -> Dict[str, float]:
+        names, prototypes = self._prototypes[dimension]
+        probabilities = ((embeddings @ prototypes.T) / self.temperature).softmax(dim=-1).mean(0)
+        return {name: float(p) for name, p in zip(names, probabilities)}
+
+    def state_split(self, texts: List[str]) -> Dict[str, float]:
+        if not self.state_pattern:
+            return {}
+        counts: Dict[str, int] = {}
+        for text in texts:
+            for match in self.state_pattern.findall(text.lower()):
+                state = self.state_names[match]
+                counts[state] = counts.get(state, 0) + 1
+        total = sum(counts.values())
+        return {state: count / total for state, count in counts.items()}
+
+    def estimate(self, platform: str, handle: str, data: dict) -> dict:
+        """{'gender': {...}, 'age': {...}, 'state': {...}} shares for a profile"""
+        key = (platform, handle.strip().lower())
+        if key in self._memo:
+            return self._memo[key]
+        namespace = f'{platform}:demographics'
+        if self.cache:
+            cached = self.cache.get_profile(namespace, handle)
+            if cached:
+                self._memo[key] = cached['demographics']
+                return cached['demographics']
+
+        texts = profile_texts(platform, data)
+        result = {'gender': {}, 'age': {}, 'state': self.state_split(texts)}
+        if not texts or not self._load():
+            # Without the model only the state split is known; don't keep that
+            # around, so the profile is estimated once the model is available
+            return result
+        embeddings = self.embed(texts)
+        for dimension in self._prototypes:
+            result[dimension] = self._split(dimension, embeddings)
+
+        self._memo[key] = result
+        if self.cache:
+            self.cache.set_profile(namespace, handle, {'demographics': result})
+        return result
+
+    def headers(self) -> List[str]:
+        """Output sheet headers of the columns() cells"""
+        return HEURISTIC_HEADERS if self.enabled else HEADERS
+
+    def columns(self, platform: str, handle: str, data: dict) -> List[str]:
+        """Gender, state and age split cells for an output row"""
+        if not self.enabled:
+            return [PLACEHOLDER] * 3
+        result = self.estimate(platform, handle, data)
+        return [
+            format_split(result['gender']),
+            format_split(result['state'], top=3),
+            format_split(result['age'])
+        ]
+
+    def stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'runtime': self.runtime if self.enabled and self._available else None,
+            'batches': self.batches,
+            'texts_embedded': self.texts_embedded,
+            'profiles': len(self._memo)
+        }
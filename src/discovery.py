@@ -0,0 +1,67 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Tuple
+from instrumentation import get_logger
+
+log = get_logger(__name__)
+
+
+class DiscoveryDocuments:
+    """
+    Google API discovery documents, parsed once per process and cached on
+    disk, so every API client (one per worker thread) is built from memory
+    """
+
+    def __init__(self, directory: str = '.cache/discovery', ttl: float = 7 * 86400):
+        self.directory = directory
+        self.ttl = ttl
+        self._documents: Dict[Tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, service: str, version: str) -> str:
+        return os.path.join(self.directory, f'{service}.{version}.json')
+
+    def get(self, service: str, version: str) -> dict:
+        key = (service, version)
+        with self._lock:
+            if key not in self._documents:
+                self._documents[key] = self._load(service, version)
+            return self._documents[key]
+
+    def _load(self, service: str, version: str) -> dict:
+        path = self._path(service, version)
+        try:
+            if time.time() - os.path.getmtime(path) < self.ttl:
+                with open(path) as f:
+                    return json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        # Newer clients ship the documents; otherwise fetch it once
+        from googleapiclient.discovery_cache import get_static_doc
+        content = get_static_doc(service, version)
+        if content is None:
+            import requests
+            from googleapiclient.discovery import V2_DISCOVERY_URI
+            response = requests.get(V2_DISCOVERY_URI.format(api=service, apiVersion=version),
+                                    timeout=30)
+            response.raise_for_status()
+            content = response.text
+        document = json.loads(content)
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("Could not cache discovery document %s: %s", path, e)
+        return document
+
+    def build(self, service: str, version: str, **kwargs):
+        """googleapiclient service object, without a discovery request"""
+        from googleapiclient.discovery import build_from_document
+        return build_from_document(self.get(service, version), **kwargs)
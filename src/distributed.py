@@ -0,0 +1,640 @@
+import json
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from checkpoint import OrderedFlusher, RunJournal
+from config import CHECKPOINT, DISTRIBUTED
+from input_sources import batched
+from youtube_client import MAX_IDS_PER_REQUEST
+from instrumentation import count, get_logger, span
+
+log = get_logger(__name__)
+
+# Rows inserted per transaction when queueing the roster
+ENQUEUE_BATCH = 500
+
+
+class Task:
+    """One Input row leased to a worker; token identifies this particular lease"""
+    __slots__ = ('index', 'platform', 'handle', 'country', 'attempts', 'token')
+
+    def __init__(self, index: int, platform: str, handle: str, country: Optional[str] = None,
+                 attempts: int = 0, token: Optional[str] = None):
+        self.index = index
+        self.platform = platform
+        self.handle = handle
+        self.country = country
+        self.attempts = attempts
+        self.token = token
+
+    @property
+    def influencer(self) -> dict:
+        return {'platform': self.platform, 'handle': self.handle, 'country': self.country}
+
+    def __repr__(self) -> str:
+        return f"Task({self.index}, {self.platform!r}, {self.handle!r})"
+
+
+class TaskQueue:
+    """
+    Tasks for one run, shared by a coordinator and any number of workers
+    Leased tasks that aren't completed or extended within the visibility
+    timeout are handed out again, so delivery is at-least-once; only the
+    first result for a row is kept, which makes redelivery harmless
+    A task leased max_attempts times without a result is given up with an
+    empty row, so one poison handle can't hold up the Output sheet
+    """
+
+    def put(self, tasks: Iterable[Tuple[int, dict]]) -> int:
+        """Queue (index, influencer) pairs; rows already queued are skipped"""
+        raise NotImplementedError
+
+    def close_input(self):
+        """Mark the roster complete, so idle workers know when to stop"""
+        raise NotImplementedError
+
+    def lease(self, worker: str, limit: int, timeout: float) -> List[Task]:
+        """Up to limit tasks in input order, hidden from other workers for timeout seconds"""
+        raise NotImplementedError
+
+    def extend(self, tasks: Iterable[Task], timeout: float):
+        """Heartbeat: push back the lease deadline of tasks still in progress"""
+        raise NotImplementedError
+
+    def complete(self, task: Task, row: Optional[list]) -> bool:
+        """Store a task's row; False if another worker already delivered it"""
+        raise NotImplementedError
+
+    def release(self, tasks: Iterable[Task]):
+        """Hand unfinished tasks back without waiting for their leases to expire"""
+        raise NotImplementedError
+
+    def results(self, cursor: int = 0, limit: int = 1000) -> Tuple[int, List[dict]]:
+        """
+        Results stored after cursor, oldest first, as (new cursor, entries);
+        entries hold index, platform, handle and row
+        """
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        """Tasks by state: queued, leased, done and dead"""
+        raise NotImplementedError
+
+    def input_closed(self) -> bool:
+        raise NotImplementedError
+
+    def finished(self) -> bool:
+        """True once the roster is complete and every task has a result"""
+        counts = self.counts()
+        return self.input_closed() and not counts['queued'] and not counts['leased']
+
+    def reset(self):
+        """Drop every task and result, for a fresh run"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteTaskQueue(TaskQueue):
+    """
+    TaskQueue in a SQLite file, for workers on one machine (or testing);
+    leases are taken in BEGIN IMMEDIATE transactions, so concurrent
+    workers never get the same task
+    """
+
+    def __init__(self, path: str, name: str = 'default', max_attempts: int = 5):
+        self.path = path
+        self.name = name
+        self.max_attempts = max_attempts
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Connections can't be shared across threads (the lease keeper
+        # extends leases while results are stored), so keep one per thread
+        self._local = threading.local()
+        self._db().executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                queue TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                platform TEXT NOT NULL,
+                handle TEXT NOT NULL,
+                country TEXT,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                token TEXT,
+                worker TEXT,
+                leased_until REAL,
+                PRIMARY KEY (queue, idx)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_by_state ON tasks (queue, state, idx);
+            CREATE TABLE IF NOT EXISTS results (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                platform TEXT NOT NULL,
+                handle TEXT NOT NULL,
+                row TEXT,
+                worker TEXT,
+                finished_at REAL NOT NULL,
+                UNIQUE (queue, idx)
+            );
+            CREATE TABLE IF NOT EXISTS queue_state (
+                queue TEXT PRIMARY KEY,
+                input_closed INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # Autocommit mode; writes use explicit transactions below
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def put(self, tasks: Iterable[Tuple[int, dict]]) -> int:
+        added = 0
+        for batch in batched(tasks, ENQUEUE_BATCH):
+            with self._transaction() as db:
+                before = db.total_changes
+                db.executemany(
+                    'INSERT OR IGNORE INTO tasks (queue, idx, platform, handle, country) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    [(self.name, index, i['platform'], i['handle'], i.get('country'))
+                     for index, i in batch]
+                )
+                added += db.total_changes - before
+        return added
+
+    def close_input(self):
+        with self._transaction() as db:
+            db.execute('INSERT OR REPLACE INTO queue_state (queue, input_closed) VALUES (?, 1)',
+                       (self.name,))
+
+    def input_closed(self) -> bool:
+        row = self._db().execute('SELECT input_closed FROM queue_state WHERE queue = ?',
+                                 (self.name,)).fetchone()
+        return bool(row and row[0])
+
+    def lease(self, worker: str, limit: int, timeout: float) -> List[Task]:
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._transaction() as db:
+            self._expire(db, now)
+            rows = db.execute(
+                "SELECT idx, platform, handle, country, attempts FROM tasks "
+                "WHERE queue = ? AND state = 'queued' ORDER BY idx LIMIT ?",
+                (self.name, limit)
+            ).fetchall()
+            db.executemany(
+                "UPDATE tasks SET state = 'leased', attempts = attempts + 1, token = ?, "
+                "worker = ?, leased_until = ? WHERE queue = ? AND idx = ?",
+                [(token, worker, now + timeout, self.name, row[0]) for row in rows]
+            )
+        return [Task(index, platform, handle, country, attempts + 1, token)
+                for index, platform, handle, country, attempts in rows]
+
+    def _expire(self, db: sqlite3.Connection, now: float):
+        """Requeue expired leases, giving up tasks that have used all their attempts"""
+        dead = db.execute(
+            "SELECT idx, platform, handle FROM tasks WHERE queue = ? AND state = 'leased' "
+            "AND leased_until < ? AND attempts >= ?",
+            (self.name, now, self.max_attempts)
+        ).fetchall()
+        for index, platform, handle in dead:
+            log.warning("Giving up on row %s (%s) after %s attempts", index, handle, self.max_attempts)
+            db.execute(
+                'INSERT OR IGNORE INTO results (queue, idx, platform, handle, row, worker, finished_at) '
+                'VALUES (?, ?, ?, ?, NULL, NULL, ?)',
+                (self.name, index, platform, handle, now)
+            )
+            db.execute("UPDATE tasks SET state = 'dead', token = NULL WHERE queue = ? AND idx = ?",
+                       (self.name, index))
+        expired = db.execute(
+            "UPDATE tasks SET state = 'queued', token = NULL WHERE queue = ? AND state = 'leased' "
+            "AND leased_until < ?",
+            (self.name, now)
+        ).rowcount
+        if expired:
+            count('task_redeliveries', expired)
+        if dead:
+            count('tasks_dead', len(dead))
+
+    def extend(self, tasks: Iterable[Task], timeout: float):
+        deadline = time.time() + timeout
+        with self._transaction() as db:
+            db.executemany(
+                "UPDATE tasks SET leased_until = ? WHERE queue = ? AND idx = ? AND token = ? "
+                "AND state = 'leased'",
+                [(deadline, self.name, task.index, task.token) for task in tasks]
+            )
+
+    def complete(self, task: Task, row: Optional[list]) -> bool:
+        with self._transaction() as db:
+            first = db.execute(
+                'INSERT OR IGNORE INTO results (queue, idx, platform, handle, row, worker, finished_at) '
+                'SELECT ?, ?, ?, ?, ?, worker, ? FROM tasks WHERE queue = ? AND idx = ?',
+                (self.name, task.index, task.platform, task.handle,
+                 json.dumps(row) if row is not None else None, time.time(), self.name, task.index)
+            ).rowcount == 1
+            db.execute("UPDATE tasks SET state = 'done', token = NULL WHERE queue = ? AND idx = ? "
+                       "AND state != 'dead'", (self.name, task.index))
+        return first
+
+    def release(self, tasks: Iterable[Task]):
+        with self._transaction() as db:
+            db.executemany(
+                "UPDATE tasks SET state = 'queued', token = NULL WHERE queue = ? AND idx = ? "
+                "AND token = ? AND state = 'leased'",
+                [(self.name, task.index, task.token) for task in tasks]
+            )
+
+    def results(self, cursor: int = 0, limit: int = 1000) -> Tuple[int, List[dict]]:
+        rows = self._db().execute(
+            'SELECT seq, idx, platform, handle, row FROM results '
+            'WHERE queue = ? AND seq > ? ORDER BY seq LIMIT ?',
+            (self.name, cursor, limit)
+        ).fetchall()
+        if not rows:
+            return cursor, []
+        return rows[-1][0], [
+            {'index': index, 'platform': platform, 'handle': handle,
+             'row': json.loads(row) if row is not None else None}
+            for _, index, platform, handle, row in rows
+        ]
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(('queued', 'leased', 'done', 'dead'), 0)
+        counts.update(self._db().execute(
+            'SELECT state, COUNT(*) FROM tasks WHERE queue = ? GROUP BY state', (self.name,)
+        ).fetchall())
+        return counts
+
+    def reset(self):
+        with self._transaction() as db:
+            for table in ('tasks', 'results', 'queue_state'):
+                db.execute(f'DELETE FROM {table} WHERE queue = ?', (self.name,))
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+# Requeue expired leases (or give them up), then lease up to ARGV[3] tasks
+# KEYS: tasks, queued, leased, tokens, attempts, results, log, state
+# ARGV: now, deadline, limit, max_attempts, token
+REDIS_LEASE = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[1])
+for _, index in ipairs(expired) do
+    redis.call('ZREM', KEYS[3], index)
+    redis.call('HDEL', KEYS[4], index)
+    if tonumber(redis.call('HGET', KEYS[5], index) or '0') >= tonumber(ARGV[4]) then
+        local task = cjson.decode(redis.call('HGET', KEYS[1], index))
+        local entry = cjson.encode({platform = task.platform, handle = task.handle})
+        if redis.call('HSETNX', KEYS[6], index, entry) == 1 then
+            redis.call('RPUSH', KEYS[7], index)
+        end
+        redis.call('HINCRBY', KEYS[8], 'dead', 1)
+    else
+        redis.call('ZADD', KEYS[2], index, index)
+    end
+end
+local leased = {}
+for _, index in ipairs(redis.call('ZRANGE', KEYS[2], 0, tonumber(ARGV[3]) - 1)) do
+    redis.call('ZREM', KEYS[2], index)
+    redis.call('ZADD', KEYS[3], ARGV[2], index)
+    redis.call('HSET', KEYS[4], index, ARGV[5])
+    local attempts = redis.call('HINCRBY', KEYS[5], index, 1)
+    table.insert(leased, index)
+    table.insert(leased, redis.call('HGET', KEYS[1], index))
+    table.insert(leased, attempts)
+end
+return {#expired, leased}
+"""
+
+# Store a result unless one exists, and drop the task's lease
+# KEYS: results, log, leased, queued, tokens; ARGV: index, entry
+REDIS_COMPLETE = """
+local first = redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2])
+if first == 1 then
+    redis.call('RPUSH', KEYS[2], ARGV[1])
+end
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('ZREM', KEYS[4], ARGV[1])
+redis.call('HDEL', KEYS[5], ARGV[1])
+return first
+"""
+
+# Apply ARGV[2] to the leases in ARGV[3..] still held under token ARGV[1]:
+# a new deadline ('extend') or back to the queue ('release')
+# KEYS: leased, tokens, queued; ARGV: token, action, deadline, indexes...
+REDIS_TOUCH = """
+for i = 4, #ARGV do
+    local index = ARGV[i]
+    if redis.call('HGET', KEYS[2], index) == ARGV[1] then
+        if ARGV[2] == 'extend' then
+            redis.call('ZADD', KEYS[1], 'XX', ARGV[3], index)
+        else
+            redis.call('ZREM', KEYS[1], index)
+            redis.call('HDEL', KEYS[2], index)
+            redis.call('ZADD', KEYS[3], index, index)
+        end
+    end
+end
+return 0
+"""
+
+
+class RedisTaskQueue(TaskQueue):
+    """
+    TaskQueue in Redis, for workers spread over several machines; leasing
+    and completing run as Lua scripts, so they are atomic on the server
+    """
+
+    def __init__(self, url: str, name: str = 'default', max_attempts: int = 5):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Redis queues need the redis package (pip install redis)")
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.name = name
+        self.max_attempts = max_attempts
+        prefix = f'social_media_agent:{name}'
+        # tasks: index -> task JSON; queued/leased: sorted sets (by index /
+        # lease deadline); results: index -> entry JSON; log: result order
+        self.keys = {key: f'{prefix}:{key}' for key in
+                     ('tasks', 'queued', 'leased', 'tokens', 'attempts', 'results', 'log', 'state')}
+        self._lease = self.redis.register_script(REDIS_LEASE)
+        self._complete = self.redis.register_script(REDIS_COMPLETE)
+        self._touch = self.redis.register_script(REDIS_TOUCH)
+
+    def _key_list(self, *names) -> List[str]:
+        return [self.keys[name] for name in names]
+
+    def put(self, tasks: Iterable[Tuple[int, dict]]) -> int:
+        added = 0
+        for batch in batched(tasks, ENQUEUE_BATCH):
+            pipe = self.redis.pipeline()
+            for index, i in batch:
+                task = {'platform': i['platform'], 'handle': i['handle'], 'country': i.get('country')}
+                pipe.hsetnx(self.keys['tasks'], index, json.dumps(task))
+            new = [index for (index, _), created in zip(batch, pipe.execute()) if created]
+            if new:
+                self.redis.zadd(self.keys['queued'], {index: index for index in new})
+            added += len(new)
+        return added
+
+    def close_input(self):
+        self.redis.hset(self.keys['state'], 'input_closed', 1)
+
+    def input_closed(self) -> bool:
+        return self.redis.hget(self.keys['state'], 'input_closed') == '1'
+
+    def lease(self, worker: str, limit: int, timeout: float) -> List[Task]:
+        now = time.time()
+        token = uuid.uuid4().hex
+        expired, leased = self._lease(
+            keys=self._key_list('tasks', 'queued', 'leased', 'tokens', 'attempts',
+                                'results', 'log', 'state'),
+            args=[now, now + timeout, limit, self.max_attempts, token]
+        )
+        if expired:
+            count('task_redeliveries', expired)
+        tasks = []
+        for i in range(0, len(leased), 3):
+            task = json.loads(leased[i + 1])
+            tasks.append(Task(int(leased[i]), task['platform'], task['handle'], task.get('country'),
+                              int(leased[i + 2]), token))
+        return tasks
+
+    def _touch_leases(self, tasks: Iterable[Task], action: str, deadline: float = 0):
+        by_token: Dict[str, List[int]] = {}
+        for task in tasks:
+            by_token.setdefault(task.token, []).append(task.index)
+        for token, indexes in by_token.items():
+            self._touch(keys=self._key_list('leased', 'tokens', 'queued'),
+                        args=[token, action, deadline, *indexes])
+
+    def extend(self, tasks: Iterable[Task], timeout: float):
+        self._touch_leases(tasks, 'extend', time.time() + timeout)
+
+    def release(self, tasks: Iterable[Task]):
+        self._touch_leases(tasks, 'release')
+
+    def complete(self, task: Task, row: Optional[list]) -> bool:
+        entry = json.dumps({'platform': task.platform, 'handle': task.handle, 'row': row})
+        return self._complete(keys=self._key_list('results', 'log', 'leased', 'queued', 'tokens'),
+                              args=[task.index, entry]) == 1
+
+    def results(self, cursor: int = 0, limit: int = 1000) -> Tuple[int, List[dict]]:
+        # The cursor is a position in the append-only result log
+        indexes = self.redis.lrange(self.keys['log'], cursor, cursor + limit - 1)
+        if not indexes:
+            return cursor, []
+        entries = []
+        for index, entry in zip(indexes, self.redis.hmget(self.keys['results'], indexes)):
+            entry = json.loads(entry)
+            entries.append({'index': int(index), 'platform': entry['platform'],
+                            'handle': entry['handle'], 'row': entry.get('row')})
+        return cursor + len(indexes), entries
+
+    def counts(self) -> Dict[str, int]:
+        pipe = self.redis.pipeline()
+        pipe.zcard(self.keys['queued'])
+        pipe.zcard(self.keys['leased'])
+        pipe.hlen(self.keys['results'])
+        pipe.hget(self.keys['state'], 'dead')
+        queued, leased, results, dead = pipe.execute()
+        dead = int(dead or 0)
+        return {'queued': queued, 'leased': leased, 'done': results - dead, 'dead': dead}
+
+    def reset(self):
+        self.redis.delete(*self.keys.values())
+
+    def close(self):
+        self.redis.close()
+
+
+def open_queue(url: str, name: str = 'default', max_attempts: Optional[int] = None) -> TaskQueue:
+    """A TaskQueue for redis://... URLs, or a SQLite queue for a file path"""
+    max_attempts = max_attempts or DISTRIBUTED['max_attempts']
+    if re.match(r'rediss?://', url):
+        return RedisTaskQueue(url, name, max_attempts=max_attempts)
+    return SQLiteTaskQueue(url, name, max_attempts=max_attempts)
+
+
+class Coordinator:
+    """
+    Queues the roster for the workers and merges their results into the
+    Output sheet, in input order and in batches, as they come in
+    Merged rows are journaled like a standalone run, so a restarted
+    coordinator neither loses rows nor writes them twice
+    The queue is left finished so idle workers exit; the next run clears it
+    """
+
+    def __init__(self, analyzer, queue: TaskQueue,
+                 poll_interval: Optional[float] = None):
+        self.analyzer = analyzer
+        self.queue = queue
+        self.poll_interval = poll_interval or DISTRIBUTED['poll_interval']
+
+    def run(self, spreadsheet_id: str, source: Iterable[dict], resume: bool = True,
+            output: Optional[str] = None) -> int:
+        """
+        Queue source's rows, then merge results until every row has one;
+        returns rows written to the Output sheet (or the output .csv/.jsonl file)
+        """
+        # A finished queue belongs to an earlier run; its rows are in the sheet
+        if not resume or self.queue.finished():
+            self.queue.reset()
+        writer = self.analyzer.output_writer(spreadsheet_id, output)
+        journal = RunJournal.for_spreadsheet(CHECKPOINT['directory'], output or spreadsheet_id,
+                                             fresh=not resume)
+        flusher = OrderedFlusher(journal, writer)
+
+        rows_read = 0
+
+        def pending():
+            nonlocal rows_read
+            for index, influencer in enumerate(source, 1):
+                rows_read = index
+                if not journal.completed(index, influencer['platform'], influencer['handle']):
+                    yield index, influencer
+
+        completed_run = False
+        try:
+            with span('distributed.enqueue'):
+                added = self.queue.put(pending())
+            self.queue.close_input()
+            log.info("Queued %s of %s rows for the workers", added, rows_read)
+
+            cursor = 0
+            last_report = time.monotonic()
+            while True:
+                cursor, entries = self.queue.results(cursor)
+                for entry in entries:
+                    if journal.completed(entry['index'], entry['platform'], entry['handle']):
+                        continue
+                    journal.record(entry['index'], entry['platform'], entry['handle'], entry['row'])
+                    flusher.add(entry['index'], entry['row'])
+                if entries:
+                    continue
+                if flusher.next_index > rows_read:
+                    break
+                if time.monotonic() - last_report >= 30:
+                    log.info("Waiting for workers: %s", self.queue.counts())
+                    last_report = time.monotonic()
+                writer.maybe_flush()
+                time.sleep(self.poll_interval)
+            completed_run = True
+        finally:
+            flushed = flusher.flush()
+            journal.close(finished=completed_run and flushed)
+            log.info("%s rows written to %s", writer.rows_written, output or 'the Output sheet')
+        return writer.rows_written
+
+
+class Worker:
+    """
+    Leases batches of tasks, processes them like a standalone run and
+    reports each row back as soon as it's done; a background thread keeps
+    the leases of unfinished tasks alive while a batch is in progress
+    """
+
+    def __init__(self, analyzer, queue: TaskQueue, worker_id: Optional[str] = None,
+                 concurrent: bool = False, concurrency: Optional[Dict[str, int]] = None,
+                 batch_size: Optional[int] = None, visibility_timeout: Optional[float] = None,
+                 poll_interval: Optional[float] = None, analysis_workers: Optional[int] = None):
+        self.analyzer = analyzer
+        self.queue = queue
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+        self.concurrent = concurrent
+        self.concurrency = concurrency
+        self.analysis_workers = analysis_workers
+        self.batch_size = batch_size or DISTRIBUTED['lease_batch']
+        self.visibility_timeout = visibility_timeout or DISTRIBUTED['visibility_timeout']
+        self.poll_interval = poll_interval or DISTRIBUTED['poll_interval']
+        self.processed = 0
+
+    def run(self) -> int:
+        """Work until the coordinator has closed the roster and no tasks are left"""
+        log.info("Worker %s waiting for tasks", self.worker_id)
+        while True:
+            tasks = self.queue.lease(self.worker_id, self.batch_size, self.visibility_timeout)
+            if tasks:
+                self._process(tasks)
+            elif self.queue.finished():
+                break
+            else:
+                time.sleep(self.poll_interval)
+        self.analyzer.archive.flush()
+        log.info("Worker %s done: %s rows processed", self.worker_id, self.processed)
+        return self.processed
+
+    def _process(self, tasks: List[Task]):
+        log.info("Leased %s tasks (rows %s-%s)", len(tasks), tasks[0].index, tasks[-1].index)
+        unfinished = {task.index: task for task in tasks}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def keep_leases():
+            while not stop.wait(self.visibility_timeout / 3):
+                with lock:
+                    remaining = list(unfinished.values())
+                try:
+                    self.queue.extend(remaining, self.visibility_timeout)
+                except Exception as e:
+                    # A missed heartbeat only risks the tasks being redelivered
+                    log.warning("Could not extend leases: %s", e)
+
+        keeper = threading.Thread(target=keep_leases, name='lease-keeper', daemon=True)
+        keeper.start()
+
+        def on_result(index, row):
+            with lock:
+                task = unfinished.pop(index)
+            if not self.queue.complete(task, row):
+                count('duplicate_results')
+            self.processed += 1
+
+        try:
+            pairs = [(task.index, task.influencer) for task in tasks]
+            if self.concurrent:
+                from pipeline import ConcurrentProcessor
+                ConcurrentProcessor(self.analyzer, self.concurrency, on_result=on_result,
+                                    analysis_workers=self.analysis_workers).run(pairs)
+            else:
+                for batch in batched(pairs, MAX_IDS_PER_REQUEST):
+                    self.analyzer.prefetch_youtube([i['handle'] for _, i in batch
+                                                    if i['platform'].lower() == 'youtube'])
+                    for index, influencer in batch:
+                        on_result(index, self.analyzer.process_handle(
+                            influencer['platform'], influencer['handle'],
+                            country=influencer.get('country')))
+        finally:
+            stop.set()
+            keeper.join()
+            if unfinished:
+                # Interrupted: let other workers pick these up right away
+                self.queue.release(list(unfinished.values()))
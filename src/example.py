@@ -1,13 +1,107 @@
 from main import SocialMediaAnalyzer
+from input_sources import open_input_source
+from config import DISTRIBUTED, INPUT, INSTRUMENTATION
+from instrumentation import configure_logging, metrics
+import argparse
 import os
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Analyze influencers listed in a Google Sheet')
+    parser.add_argument('--concurrent', action='store_true',
+                        help='Fetch several handles at once instead of one by one')
+    parser.add_argument('--instagram-workers', type=int,
+                        help='Maximum concurrent Instagram fetches')
+    parser.add_argument('--youtube-workers', type=int,
+                        help='Maximum concurrent YouTube fetches')
+    parser.add_argument('--analysis-workers', type=int,
+                        help='Processes building output rows in concurrent mode (0: on the fetch threads)')
+    parser.add_argument('--max-age', type=parse_duration,
+                        help='Refetch cached profiles older than this (e.g. 3600, 30m, 12h, 2d; 0 ignores the cache)')
+    parser.add_argument('--input', default='sheets',
+                        help="Where to read handles from: 'sheets' (Input sheet), a .csv/.jsonl file, or '-' for stdin")
+    parser.add_argument('--input-format', choices=['csv', 'jsonl'], default='csv',
+                        help='Format of handles read from stdin')
+    parser.add_argument('--output',
+                        help="Where to write rows: 'sheets' (Output sheet) or a .csv/.jsonl file "
+                             "(default: sheets when reading the Input sheet, else output.csv)")
+    parser.add_argument('--no-resume', action='store_true',
+                        help='Start over instead of resuming an interrupted run')
+    parser.add_argument('--role', choices=['standalone', 'coordinator', 'worker'], default='standalone',
+                        help='standalone does everything; a coordinator queues the roster and writes '
+                             'the Output sheet while workers (on any machine) fetch the handles')
+    parser.add_argument('--queue', default=DISTRIBUTED['queue'],
+                        help='Task queue shared by the coordinator and workers: redis://host:port/db '
+                             'or a SQLite file path')
+    parser.add_argument('--worker-id',
+                        help='Name of this worker in the queue (default: hostname-pid)')
+    parser.add_argument('--log-level', default=INSTRUMENTATION['log_level'],
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], type=str.upper,
+                        help='Minimum level of log messages to print')
+    parser.add_argument('--log-format', choices=['text', 'json'], default=INSTRUMENTATION['log_format'],
+                        help='Print logs as plain text or one JSON object per line')
+    parser.add_argument('--metrics-port', type=int, default=INSTRUMENTATION['metrics_port'],
+                        help='Serve Prometheus metrics on this local port while running')
+    args = parser.parse_args()
+    if args.output is None:
+        args.output = 'sheets' if args.input == 'sheets' else 'output.csv'
+    if args.output != 'sheets' and not args.output.endswith(('.csv', '.jsonl', '.ndjson')):
+        parser.error(f"unsupported output: {args.output}")
+    return args
+
+def parse_duration(value):
+    """Seconds from '90', '30m', '12h' or '2d'"""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    try:
+        if value[-1].lower() in units:
+            return float(value[:-1]) * units[value[-1].lower()]
+        return float(value)
+    except (ValueError, IndexError):
+        raise argparse.ArgumentTypeError(f"invalid duration: {value}")
+
 def main():
+    args = parse_args()
+    configure_logging(args.log_level, args.log_format)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
     analyzer = SocialMediaAnalyzer()
     
     # Replace with your actual spreadsheet ID
     # You can get this from the Google Sheets URL
     spreadsheet_id = os.getenv('SPREADSHEET_ID')
     
-    analyzer.process_influencers(spreadsheet_id)
+    concurrency = {}
+    if args.instagram_workers:
+        concurrency['instagram'] = args.instagram_workers
+    if args.youtube_workers:
+        concurrency['youtube'] = args.youtube_workers
+    
+    if args.role != 'standalone':
+        from distributed import Coordinator, Worker, open_queue
+        # Every node of a run shares the queue named after the spreadsheet
+        queue = open_queue(args.queue, name=spreadsheet_id or 'default')
+        if args.role == 'worker':
+            analyzer.cache.max_age = args.max_age
+            Worker(analyzer, queue, worker_id=args.worker_id, concurrent=args.concurrent,
+                   concurrency=concurrency, analysis_workers=args.analysis_workers).run()
+            return
+    
+    # The Google Sheets client (and its credentials) only when a sheet is read or written
+    source = open_input_source(args.input,
+                               sheets=analyzer.sheets if args.input == 'sheets' else None,
+                               spreadsheet_id=spreadsheet_id,
+                               page_size=INPUT['page_size'],
+                               stdin_format=args.input_format)
+    output = None if args.output == 'sheets' else args.output
+    
+    if args.role == 'coordinator':
+        Coordinator(analyzer, queue).run(spreadsheet_id, source, resume=not args.no_resume,
+                                         output=output)
+        return
+    
+    analyzer.process_influencers(spreadsheet_id, concurrent=args.concurrent,
+                                 concurrency=concurrency, max_age=args.max_age,
+                                 resume=not args.no_resume, source=source,
+                                 analysis_workers=args.analysis_workers, output=output)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,104 @@
+import csv
+import json
+import os
+import time
+from typing import Callable, List, Optional
+
+from instrumentation import get_logger, span
+
+log = get_logger(__name__)
+
+
+class FileWriter:
+    """
+    SheetsWriter for a local .csv (with a header row) or .jsonl file, so
+    runs over file inputs need neither Google credentials nor a network
+    cursor counts like sheet rows (data starts at 2): a resumed run first
+    drops any rows written after the journal's last checkpoint
+    """
+
+    def __init__(self, path: str, headers: List[str], max_rows: int = 200,
+                 max_interval: float = 15,
+                 on_flush: Optional[Callable[[object, int], None]] = None):
+        self.path = path
+        self.headers = headers
+        self.format = 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+        self.cursor = 2
+        self.max_rows = max_rows
+        self.max_interval = max_interval
+        # Called as on_flush(checkpoint, cursor) after each successful write
+        self.on_flush = on_flush
+
+        self._buffer: List[list] = []
+        self._checkpoint = None
+        self._last_flush = time.monotonic()
+        self._opened = False
+        self.rows_written = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def append(self, rows: List[list], checkpoint=None):
+        """Queue rows for writing; checkpoint is passed to on_flush once they're written"""
+        self._buffer.extend(rows)
+        if checkpoint is not None:
+            self._checkpoint = checkpoint
+        self.maybe_flush()
+
+    def maybe_flush(self) -> bool:
+        """Flush if the buffer is large or old enough"""
+        if (len(self._buffer) >= self.max_rows or
+                time.monotonic() - self._last_flush >= self.max_interval):
+            return self.flush()
+        return True
+
+    def _open(self):
+        """Keep the header and the rows before cursor, for a fresh or resumed run"""
+        keep = self.cursor - 2
+        lines = []
+        if keep and os.path.exists(self.path):
+            with open(self.path, newline='') as f:
+                if self.format == 'csv':
+                    next(f, None)
+                lines = [line for _, line in zip(range(keep), f)]
+        if len(lines) < keep:
+            log.warning("%s has %s of the %s rows written before; continuing after them",
+                        self.path, len(lines), keep)
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w', newline='') as f:
+            if self.format == 'csv':
+                csv.writer(f).writerow(self.headers)
+            f.writelines(lines)
+        self._opened = True
+
+    def flush(self) -> bool:
+        """Append everything buffered; on failure the rows stay buffered"""
+        self._last_flush = time.monotonic()
+        if not self._buffer and self._checkpoint is None:
+            return True
+
+        try:
+            with span('file.flush'):
+                if not self._opened:
+                    self._open()
+                with open(self.path, 'a', newline='') as f:
+                    if self.format == 'csv':
+                        csv.writer(f).writerows(self._buffer)
+                    else:
+                        for row in self._buffer:
+                            f.write(json.dumps(dict(zip(self.headers, row)), ensure_ascii=False) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+        except OSError as e:
+            log.error("Error writing to %s: %s", self.path, e)
+            return False
+
+        self.rows_written += len(self._buffer)
+        self.cursor += len(self._buffer)
+        self._buffer = []
+        if self.on_flush and self._checkpoint is not None:
+            self.on_flush(self._checkpoint, self.cursor)
+        self._checkpoint = None
+        return True
@@ -0,0 +1,188 @@
+import csv
+import io
+import json
+import sys
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+from instrumentation import get_logger, span
+from rate_limiter import AdaptiveTokenBucket, call_with_backoff, shared_limiter
+
+log = get_logger(__name__)
+
+# Column names accepted for each field (lower-cased)
+COLUMN_ALIASES = {
+    'platform': ('platform', 'network', 'site'),
+    'handle': ('handle', 'username', 'channel', 'account'),
+    'country': ('country', 'region')
+}
+
+# Column order when there is no header row
+DEFAULT_COLUMNS = ['platform', 'handle', 'country']
+
+
+def normalize_row(values: Dict[str, str]) -> Optional[dict]:
+    """An influencer dict from raw column values, or None for blank/incomplete rows"""
+    platform = (values.get('platform') or '').strip()
+    handle = (values.get('handle') or '').strip()
+    if not platform or not handle:
+        return None
+    influencer = {'platform': platform, 'handle': handle}
+    # Optional expected region, used to route through a proxy in that country
+    country = (values.get('country') or '').strip()
+    if country:
+        influencer['country'] = country
+    return influencer
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """Lazily group an iterable into lists of at most size items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class InputSource:
+    """Base class for anything that yields influencer dicts lazily"""
+
+    def __iter__(self) -> Iterator[dict]:
+        for values in self.rows():
+            influencer = normalize_row(values)
+            if influencer:
+                yield influencer
+
+    def rows(self) -> Iterator[Dict[str, str]]:
+        raise NotImplementedError
+
+
+class SheetsInputSource(InputSource):
+    """Reads the Input sheet one page of rows at a time"""
+
+    def __init__(self, sheets, spreadsheet_id: str, sheet: str = 'Input',
+                 start_row: int = 2, page_size: int = 1000, max_retries: int = 5,
+                 limiter: Optional[AdaptiveTokenBucket] = None):
+        self.sheets = sheets
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet = sheet
+        self.start_row = start_row
+        self.page_size = page_size
+        self.max_retries = max_retries
+        # Shared with every other Sheets API caller in the process
+        self.limiter = limiter or shared_limiter().bucket('sheets')
+
+    def rows(self) -> Iterator[Dict[str, str]]:
+        row = self.start_row
+        while True:
+            range_name = f"{self.sheet}!A{row}:C{row + self.page_size - 1}"
+            try:
+                request = self.sheets.spreadsheets().values().get(
+                    spreadsheetId=self.spreadsheet_id,
+                    range=range_name
+                )
+                with span('sheets.read'):
+                    result = call_with_backoff(request.execute, self.limiter,
+                                               max_retries=self.max_retries, label='Sheets API')
+            except Exception as e:
+                log.error("Error reading from sheet: %s", e)
+                return
+
+            values = result.get('values', [])
+            if not values:
+                return
+            for value in values:
+                yield dict(zip(DEFAULT_COLUMNS, value))
+            row += self.page_size
+
+
+class CSVInputSource(InputSource):
+    """CSV with a platform/handle header, or two unlabeled columns"""
+
+    def __init__(self, path: Optional[str] = None, stream=None):
+        self.path = path
+        self.stream = stream
+
+    def rows(self) -> Iterator[Dict[str, str]]:
+        f = self.stream or open(self.path, newline='')
+        try:
+            reader = csv.reader(f)
+            columns = DEFAULT_COLUMNS
+            for i, row in enumerate(reader):
+                if i == 0:
+                    header = self._header_columns(row)
+                    if header:
+                        columns = header
+                        continue
+                yield dict(zip(columns, row))
+        finally:
+            if self.stream is None:
+                f.close()
+
+    @staticmethod
+    def _header_columns(row: List[str]) -> Optional[List[str]]:
+        """Map header cells to field names, or None if the row isn't a header"""
+        names = [cell.strip().lower() for cell in row]
+        columns = []
+        for name in names:
+            field = next((f for f, aliases in COLUMN_ALIASES.items() if name in aliases), name)
+            columns.append(field)
+        if 'platform' in columns and 'handle' in columns:
+            return columns
+        return None
+
+
+class JSONLInputSource(InputSource):
+    """One JSON object per line with platform and handle keys"""
+
+    def __init__(self, path: Optional[str] = None, stream=None):
+        self.path = path
+        self.stream = stream
+
+    def rows(self) -> Iterator[Dict[str, str]]:
+        f = self.stream or open(self.path)
+        try:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    obj = json.loads(line)
+                except json.JSONDecodeError as e:
+                    log.warning("Skipping invalid JSON on line %s: %s", line_number, e)
+                    continue
+                values = {}
+                for field, aliases in COLUMN_ALIASES.items():
+                    values[field] = next((str(obj[a]) for a in aliases if obj.get(a)), '')
+                yield values
+        finally:
+            if self.stream is None:
+                f.close()
+
+
+class StdinInputSource(InputSource):
+    """CSV or JSONL piped in on stdin"""
+
+    def __init__(self, format: str = 'csv'):
+        self.format = format
+
+    def rows(self) -> Iterator[Dict[str, str]]:
+        stream = io.TextIOWrapper(sys.stdin.buffer, newline='') if self.format == 'csv' else sys.stdin
+        source = CSVInputSource(stream=stream) if self.format == 'csv' else JSONLInputSource(stream=stream)
+        return source.rows()
+
+
+def open_input_source(spec: str, sheets=None, spreadsheet_id: Optional[str] = None,
+                      page_size: int = 1000, stdin_format: str = 'csv') -> InputSource:
+    """
+    Pick an input source from a spec: 'sheets' for the Input sheet, '-' for
+    stdin, or a path ending in .csv / .jsonl
+    """
+    if spec == 'sheets':
+        return SheetsInputSource(sheets, spreadsheet_id, page_size=page_size)
+    if spec == '-':
+        return StdinInputSource(format=stdin_format)
+    if spec.endswith('.jsonl') or spec.endswith('.ndjson'):
+        return JSONLInputSource(spec)
+    if spec.endswith('.csv'):
+        return CSVInputSource(spec)
+    raise ValueError(f"Unsupported input source: {spec}")
@@ -0,0 +1,383 @@
+import asyncio
+import os
+from instrumentation import get_logger, span
+
+log = get_logger(__name__)
+
+# Advanced stealth scripts injected into every page before any site code runs
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+    
+    // Mask automation
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5]
+    });
+    
+    // Add language preferences
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['en-US', 'en']
+    });
+    
+    // Modify hardware concurrency
+    Object.defineProperty(navigator, 'hardwareConcurrency', {
+        get: () => 8
+    });
+    
+    // Add fake battery data
+    navigator.getBattery = () => Promise.resolve({
+        charging: true,
+        chargingTime: 0,
+        dischargingTime: Infinity,
+        level: 0.98
+    });
+"""
+
+
+class SessionExpired(Exception):
+    """Instagram showed the login form on a page that should be logged in"""
+
+
+class RateLimited(Exception):
+    """Instagram answered with a 429 or a challenge/checkpoint page"""
+
+
+# Paths Instagram redirects to when it wants us to slow down or prove we're human
+CHALLENGE_PATHS = ('/challenge/', '/accounts/suspended/', '/checkpoint/')
+
+
+async def check_profile_response(page, response, username):
+    """Raise if opening a profile was throttled, challenged, logged out or failed"""
+    if not response:
+        raise Exception("No response from page")
+    
+    if response.status == 429:
+        raise RateLimited(f"HTTP 429 while opening {username}")
+    
+    if any(path in page.url for path in CHALLENGE_PATHS):
+        raise RateLimited(f"Challenge page while opening {username}: {page.url}")
+    
+    if response.status >= 400:
+        raise Exception(f"HTTP {response.status}")
+    
+    # A pooled page may have been logged out since warm-up
+    if await page.locator('input[name="username"]').count() > 0:
+        raise SessionExpired(f"Logged out while opening {username}")
+
+
+async def login_if_needed(page):
+    """Open the Instagram homepage and log in if the login form is shown"""
+    # First, go to Instagram homepage to handle any initial redirects
+    log.debug("Navigating to Instagram homepage...")
+    with span('instagram.navigate', page='home'):
+        await page.goto('https://www.instagram.com/',
+                        wait_until='domcontentloaded',
+                        timeout=30000)
+    
+    # Wait for either the login form or the logged-in navigation to render
+    with span('instagram.wait_selector', page='home'):
+        await page.wait_for_selector('input[name="username"], nav, div[role="main"]',
+                                     timeout=30000)
+    
+    # Check if we're on the login page
+    if await page.locator('input[name="username"]').count() > 0:
+        log.info("Login page detected, attempting to login...")
+        # Try to login with environment variables
+        await page.locator('input[name="username"]').fill(os.getenv('INSTAGRAM_USERNAME', ''))
+        await page.locator('input[name="password"]').fill(os.getenv('INSTAGRAM_PASSWORD', ''))
+        await page.locator('button[type="submit"]').click()
+        
+        # Wait for login to complete
+        try:
+            with span('instagram.login'):
+                await page.wait_for_selector('input[name="username"]', state='detached',
+                                             timeout=30000)
+        except Exception:
+            raise Exception("Login failed")
+
+
+async def scrape_profile(page, username, attempt=0, extraction='network', max_posts=15, raw=None):
+    """
+    Fetch followers, bio and recent posts for an Instagram profile
+    extraction='network' reads the JSON the profile page downloads and falls
+    back to DOM scraping if none shows up; extraction='dom' always scrapes
+    Given a list as raw, the JSON payloads the result was parsed from are
+    added to it (nothing for DOM scrapes)
+    """
+    if extraction == 'network':
+        data = await scrape_profile_network(page, username, max_posts=max_posts, raw=raw)
+        if data:
+            return data
+        # The profile page is already open (and checked); scrape it as it is
+        log.info("No profile JSON captured, falling back to DOM scraping")
+        return await scrape_profile_dom(page, username, attempt, navigate=False)
+    return await scrape_profile_dom(page, username, attempt)
+
+
+async def scrape_profile_network(page, username, max_posts=15, timeout=15, raw=None):
+    """
+    Build profile data from the profile/timeline JSON responses the page loads
+    raw, if given, receives those payloads when they yield a profile
+    """
+    payloads = []
+    user_seen = asyncio.Event()
+    
+    async def on_response(response):
+        if not is_data_response(response):
+            return
+        try:
+            payload = await response.json()
+        except Exception:
+            return
+        payloads.append(payload)
+        if find_user(payload, username):
+            user_seen.set()
+    
+    page.on('response', on_response)
+    try:
+        log.debug("Navigating to profile: %s", username)
+        with span('instagram.navigate', page='profile'):
+            response = await page.goto(
+                f'https://www.instagram.com/{username}/',
+                wait_until='domcontentloaded',
+                timeout=30000
+            )
+        
+        await check_profile_response(page, response, username)
+        
+        try:
+            with span('instagram.wait_json'):
+                await asyncio.wait_for(user_seen.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+    finally:
+        page.remove_listener('response', on_response)
+    
+    data = parse_profile_payloads(payloads, username, max_posts)
+    if data and raw is not None:
+        raw.extend(payloads)
+    return data
+
+
+def is_data_response(response):
+    """True for the Instagram API / GraphQL responses that carry profile data"""
+    url = response.url
+    if 'instagram.com' not in url:
+        return False
+    if '/api/' not in url and '/graphql' not in url:
+        return False
+    return 'json' in response.headers.get('content-type', '')
+
+
+def walk_json(obj):
+    """Yield every dict nested anywhere inside a JSON payload"""
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            yield item
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+
+
+def find_user(payload, username):
+    """Return the user object for username from a payload, if it has one"""
+    for item in walk_json(payload):
+        if (str(item.get('username', '')).lower() == username.lower() and
+                ('edge_followed_by' in item or 'follower_count' in item)):
+            return item
+    return None
+
+
+def media_to_post(node):
+    """Convert a timeline media node (web or GraphQL API shape) to a post dict"""
+    caption = ''
+    caption_edges = node.get('edge_media_to_caption', {}).get('edges', [])
+    if caption_edges:
+        caption = caption_edges[0].get('node', {}).get('text') or ''
+    elif isinstance(node.get('caption'), dict):
+        caption = node['caption'].get('text') or ''
+    
+    url = node.get('thumbnail_src') or node.get('display_url')
+    candidates = node.get('image_versions2', {}).get('candidates', [])
+    if not url and candidates:
+        url = candidates[0].get('url')
+    
+    views = None
+    for key in ('video_view_count', 'play_count', 'ig_play_count', 'view_count'):
+        if node.get(key) is not None:
+            views = str(node[key])
+            break
+    
+    likes = (node.get('edge_liked_by') or node.get('edge_media_preview_like') or {}).get('count')
+    if likes is None:
+        likes = node.get('like_count')
+    comments = node.get('edge_media_to_comment', {}).get('count')
+    if comments is None:
+        comments = node.get('comment_count')
+    
+    return {
+        'url': url,
+        'alt': node.get('accessibility_caption') or caption,
+        'views': views,
+        'caption': caption,
+        'likes': likes,
+        'comments': comments,
+        'is_paid_partnership': bool(node.get('is_paid_partnership')),
+        'shortcode': node.get('shortcode') or node.get('code'),
+        'taken_at': node.get('taken_at_timestamp') or node.get('taken_at')
+    }
+
+
+def parse_profile_payloads(payloads, username, max_posts=15):
+    """Pull followers, bio and the newest posts out of captured JSON payloads"""
+    user = None
+    media = {}
+    for payload in payloads:
+        user = user or find_user(payload, username)
+        for item in walk_json(payload):
+            shortcode = item.get('shortcode') or item.get('code')
+            if shortcode and ('taken_at_timestamp' in item or 'taken_at' in item):
+                media.setdefault(shortcode, item)
+    
+    if not user:
+        return None
+    
+    followers = user.get('edge_followed_by', {}).get('count')
+    if followers is None:
+        followers = user.get('follower_count')
+    
+    posts = sorted((media_to_post(node) for node in media.values()),
+                   key=lambda post: post['taken_at'] or 0, reverse=True)[:max_posts]
+    log.debug("Captured %s posts from profile JSON", len(posts))
+    
+    return {
+        'followers': str(followers) if followers is not None else "N/A",
+        'bio': user.get('biography') or '',
+        'recent_posts': posts
+    }
+
+
+async def scrape_profile_dom(page, username, attempt=0, navigate=True):
+    """
+    Scrape followers, bio and recent posts from an Instagram profile page
+    navigate=False scrapes the profile already loaded in the page
+    """
+    if navigate:
+        # Now navigate to the profile; the selector waits below decide when it's ready
+        log.debug("Navigating to profile: %s", username)
+        with span('instagram.navigate', page='profile'):
+            response = await page.goto(
+                f'https://www.instagram.com/{username}/',
+                wait_until='domcontentloaded',
+                timeout=30000
+            )
+        
+        await check_profile_response(page, response, username)
+    
+    log.debug("Waiting for content to load...")
+    # Try multiple selectors for the main content
+    main_content = None
+    for selector in [
+        'div[role="main"]',
+        'main',
+        'article',
+        'div._aagv',
+        'div[style*="padding-bottom: 100%"]'
+    ]:
+        try:
+            with span('instagram.wait_selector', page='profile'):
+                main_content = await page.wait_for_selector(selector,
+                                                            state='visible',
+                                                            timeout=5000)
+            if main_content:
+                log.debug("Found main content with selector: %s", selector)
+                break
+        except Exception as e:
+            log.debug("Selector %s not found: %s", selector, e)
+            continue
+    
+    if not main_content:
+        raise Exception("Could not find main content on page")
+    
+    log.debug("Getting follower count...")
+    # Try different selectors for follower count
+    followers = None
+    for selector in [
+        'text=/\\d+\\s*(followers|Followers)/',
+        'div[role="main"] ul li:nth-child(2) span',
+        'div[role="main"] ul li:nth-child(2) a span',
+        'div._aacl._aaco._aacw._aacx._aad6._aade'
+    ]:
+        try:
+            followers = page.locator(selector).first
+            if followers:
+                break
+        except Exception as e:
+            log.debug("Follower selector %s failed: %s", selector, e)
+            continue
+    
+    followers_text = await followers.text_content() if followers else "N/A"
+    log.debug("Found %s followers", followers_text)
+    
+    log.debug("Getting bio...")
+    # Try different selectors for bio
+    bio = None
+    for selector in [
+        'div._aa_c',
+        'div[role="main"] div._aa_c',
+        'div[role="main"] div._aacl._aaco._aacu._aacx._aad6._aade',
+        'div._aacl._aaco._aacu._aacx._aad6._aade'
+    ]:
+        try:
+            bio = page.locator(selector).first
+            if bio:
+                break
+        except Exception as e:
+            log.debug("Bio selector %s failed: %s", selector, e)
+            continue
+    
+    bio_text = await bio.text_content() if bio else ""
+    
+    log.debug("Getting recent posts...")
+    # Try different selectors for posts
+    posts = []
+    post_elements = (await page.locator('article img, div[role="main"] img, div._aagv img').all())[:15]
+    log.debug("Found %s posts", len(post_elements))
+    
+    for i, post in enumerate(post_elements, 1):
+        log.debug("Processing post %s/15", i)
+        post_url = await post.get_attribute('src')
+        post_alt = await post.get_attribute('alt')
+        
+        try:
+            with span('instagram.post_click'):
+                await post.click()
+                await page.wait_for_selector('div[role="dialog"]', timeout=5000)
+            
+            views = page.locator('text=/\\d+\\s*views/').first
+            view_count = await views.text_content() if views else None
+            
+            posts.append({
+                'url': post_url,
+                'alt': post_alt,
+                'views': view_count
+            })
+            
+            await page.keyboard.press('Escape')
+        except Exception as e:
+            log.warning("Error processing post %s: %s", i, e)
+            posts.append({
+                'url': post_url,
+                'alt': post_alt,
+                'views': None
+            })
+    
+    log.info("Successfully fetched all data!")
+    return {
+        'followers': followers_text,
+        'bio': bio_text,
+        'recent_posts': posts
+    }
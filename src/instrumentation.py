@@ -0,0 +1,265 @@
+import bisect
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+from config import INSTRUMENTATION
+
+LOGGER_ROOT = 'social_media_agent'
+METRIC_PREFIX = 'social_media_agent'
+
+# Upper bounds (seconds) of the Prometheus histogram buckets for stage latencies
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Latency samples kept per stage for percentiles (reservoir sampled beyond this)
+RESERVOIR_SIZE = 10000
+
+# Attributes every LogRecord has; anything else came in through extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class StructuredFormatter(logging.Formatter):
+    """One line per record, as text or JSON, with extra={...} fields appended"""
+
+    def __init__(self, fmt: str = 'text'):
+        super().__init__()
+        self.json = fmt == 'json'
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRS}
+        message = record.getMessage()
+        if self.json:
+            entry = {'ts': round(record.created, 3), 'level': record.levelname.lower(),
+                     'logger': record.name, 'msg': message, **fields}
+            if record.exc_info:
+                entry['exc'] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.name}: {message}"
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f'{LOGGER_ROOT}.{name}')
+
+
+def configure_logging(level: str = 'INFO', fmt: str = 'text', stream=None):
+    """Send this package's logs to stdout (or stream) at the given level"""
+    logger = logging.getLogger(LOGGER_ROOT)
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(StructuredFormatter(fmt))
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+
+
+def logging_settings() -> Tuple[int, str]:
+    """Level and format set by configure_logging, to repeat it in child processes"""
+    logger = logging.getLogger(LOGGER_ROOT)
+    json_format = any(getattr(handler.formatter, 'json', False) for handler in logger.handlers)
+    return logger.getEffectiveLevel(), 'json' if json_format else 'text'
+
+
+class Histogram:
+    """Bucket counts for Prometheus plus a bounded sample for percentiles"""
+    __slots__ = ('count', 'total', 'max', 'buckets', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.samples = []
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.buckets[bisect.bisect_left(BUCKETS, value)] += 1
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(value)
+        else:
+            slot = random.randrange(self.count)
+            if slot < RESERVOIR_SIZE:
+                self.samples[slot] = value
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels: Tuple[Tuple[str, str], ...], extra: str = '') -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Metrics:
+    """
+    Counters and per-stage latency histograms for one process
+    span() timings and counters cost a dict update under a lock; with
+    enabled=False they return immediately
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started = time.time()
+        self.counters: Dict[tuple, float] = {}
+        self.histograms: Dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+        self._null = nullcontext()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def count(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, stage: str, seconds: float, **labels):
+        if not self.enabled:
+            return
+        key = self._key(stage, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def span(self, stage: str, **labels):
+        """Context manager timing a stage; exceptions are counted as stage errors"""
+        if not self.enabled:
+            return self._null
+        return self._span(stage, labels)
+
+    @contextmanager
+    def _span(self, stage: str, labels: dict):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.count('stage_errors', stage=stage, **labels)
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def prometheus_text(self) -> str:
+        """Prometheus text exposition format (0.0.4)"""
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, h.count, h.total, list(h.buckets))
+                                for key, h in self.histograms.items())
+
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f'{METRIC_PREFIX}_{name}_total'
+            if metric not in declared:
+                lines.append(f'# TYPE {metric} counter')
+                declared.add(metric)
+            lines.append(f'{metric}{_label_text(labels)} {value:g}')
+
+        metric = f'{METRIC_PREFIX}_stage_seconds'
+        if histograms:
+            lines.append(f'# TYPE {metric} histogram')
+        for (stage, labels), count, total, buckets in histograms:
+            labels = (('stage', stage),) + labels
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + ('+Inf',), buckets):
+                cumulative += bucket
+                lines.append(f'{metric}_bucket{_label_text(labels, f"le={json.dumps(str(bound))}")} {cumulative}')
+            lines.append(f'{metric}_sum{_label_text(labels)} {total:.6f}')
+            lines.append(f'{metric}_count{_label_text(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> dict:
+        """Counters and p50/p95/p99 latency per stage, for the run summary"""
+        def name(key):
+            stage, labels = key
+            return stage + _label_text(labels).replace('"', '')
+
+        with self._lock:
+            return {
+                'started': self.started,
+                'duration': round(time.time() - self.started, 3),
+                'counters': {name(key): value for key, value in sorted(self.counters.items())},
+                'stages': {
+                    name(key): {
+                        'count': h.count,
+                        'mean': round(h.total / h.count, 4) if h.count else 0.0,
+                        'p50': round(h.percentile(50), 4),
+                        'p95': round(h.percentile(95), 4),
+                        'p99': round(h.percentile(99), 4),
+                        'max': round(h.max, 4)
+                    }
+                    for key, h in sorted(self.histograms.items())
+                }
+            }
+
+    def write_summary(self, directory: str, **extra) -> str:
+        """Write the run summary as JSON and return its path"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, time.strftime('run-%Y%m%d-%H%M%S.json'))
+        with open(path, 'w') as f:
+            json.dump({**self.summary(), **extra}, f, indent=2, default=str)
+        return path
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """Serve /metrics (Prometheus text) and /summary (JSON) from a background thread"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/metrics'):
+                    body = registry.prometheus_text().encode()
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif self.path.startswith('/summary'):
+                    body = json.dumps(registry.summary()).encode()
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+        get_logger('instrumentation').info("Serving metrics on http://%s:%d/metrics", host, port)
+        return server
+
+
+# Process-wide registry shared by every module
+metrics = Metrics(enabled=INSTRUMENTATION['enabled'])
+span = metrics.span
+count = metrics.count
+write_summary = metrics.write_summary
+
+if not logging.getLogger(LOGGER_ROOT).handlers:
+    configure_logging(INSTRUMENTATION['log_level'], INSTRUMENTATION['log_format'])
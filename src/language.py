@@ -0,0 +1,135 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+from instrumentation import get_logger
+
+log = get_logger(__name__)
+
+# Map language codes to more readable format
+LANGUAGE_NAMES = {
+    'en': 'English',
+    'es': 'Spanish',
+    'fr': 'French',
+    'de': 'German',
+    'it': 'Italian',
+    'pt': 'Portuguese',
+    'ru': 'Russian',
+    'ja': 'Japanese',
+    'ko': 'Korean',
+    'zh-cn': 'Chinese',
+    'zh': 'Chinese',
+    'hi': 'Hindi'
+}
+
+UNKNOWN = 'Unknown'
+
+
+class LanguageDetector:
+    """
+    Language of bios and descriptions, loaded once per process
+    Uses fastText's compiled language-ID model when it's installed and the
+    model file exists, otherwise langdetect seeded for repeatable results.
+    Results are memoized by text hash in an LRU cache.
+    """
+
+    def __init__(self, backend: str = 'auto', fasttext_model: Optional[str] = None,
+                 cache_size: int = 100000, seed: int = 0, min_length: int = 20,
+                 min_confidence: float = 0.5):
+        self.cache_size = cache_size
+        self.min_length = min_length
+        self.min_confidence = min_confidence
+        self.hits = 0
+        self.misses = 0
+        self._cache: 'OrderedDict[bytes, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.backend = None
+        if backend in ('auto', 'fasttext') and fasttext_model and os.path.exists(fasttext_model):
+            try:
+                import fasttext
+                self._model = fasttext.load_model(fasttext_model)
+                self.backend = 'fasttext'
+            except ImportError:
+                if backend == 'fasttext':
+                    log.warning("fasttext is not installed, falling back to langdetect")
+        if self.backend is None:
+            try:
+                from langdetect import DetectorFactory, LangDetectException, detect
+                # langdetect is randomized; a fixed seed makes it deterministic
+                DetectorFactory.seed = seed
+                self._detect = detect
+                self._error = LangDetectException
+                self.backend = 'langdetect'
+            except ImportError:
+                log.warning("langdetect is not installed; languages will be reported as Unknown")
+        log.info("Language detection backend: %s", self.backend or 'none')
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    def detect(self, text: Optional[str]) -> str:
+        return self.detect_batch([text])[0]
+
+    def detect_batch(self, texts: Iterable[Optional[str]]) -> List[str]:
+        """Languages for many texts; repeats and cached texts are only detected once"""
+        cleaned = [(text or '').strip() for text in texts]
+        results: List[Optional[str]] = [None] * len(cleaned)
+        missing: Dict[bytes, List[int]] = {}
+        with self._lock:
+            for i, text in enumerate(cleaned):
+                # Very short texts give unreliable guesses
+                if len(text) < self.min_length:
+                    results[i] = UNKNOWN
+                    continue
+                key = self._key(text)
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    results[i] = cached
+                else:
+                    missing.setdefault(key, []).append(i)
+
+        if missing:
+            keys = list(missing)
+            detected = self._detect_texts([cleaned[missing[key][0]] for key in keys])
+            with self._lock:
+                self.misses += len(keys)
+                for key, language in zip(keys, detected):
+                    for i in missing[key]:
+                        results[i] = language
+                    self._cache[key] = language
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return results
+
+    def _detect_texts(self, texts: List[str]) -> List[str]:
+        if self.backend == 'fasttext':
+            # fastText predicts a whole batch in one call but can't take newlines
+            labels, probabilities = self._model.predict([text.replace('\n', ' ') for text in texts])
+            return [
+                LANGUAGE_NAMES.get(label[0].replace('__label__', ''), label[0].replace('__label__', ''))
+                if label and probability[0] >= self.min_confidence else UNKNOWN
+                for label, probability in zip(labels, probabilities)
+            ]
+        if self.backend == 'langdetect':
+            results = []
+            for text in texts:
+                try:
+                    code = self._detect(text)
+                    results.append(LANGUAGE_NAMES.get(code, code))
+                except self._error:
+                    results.append(UNKNOWN)
+            return results
+        return [UNKNOWN] * len(texts)
+
+    def stats(self) -> dict:
+        return {
+            'backend': self.backend,
+            'cached': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses
+        }
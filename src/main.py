@@ -1,18 +1,31 @@
 import os
 from dotenv import load_dotenv
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from google.oauth2 import service_account
-from playwright.sync_api import sync_playwright
 import asyncio
-import pandas as pd
+import concurrent.futures
 import time
-import json
-from fake_useragent import UserAgent
-from proxy_manager import ProxyManager
+from contextlib import contextmanager
+from instagram_scraper import STEALTH_SCRIPT, RateLimited, SessionExpired, login_if_needed, scrape_profile
+from session_store import SessionStore
+from resource_blocker import ResourceBlocker
+from youtube_client import MAX_IDS_PER_REQUEST, QuotaExceeded, QuotaTracker, YouTubeClient
+from cache import DataCache
+from archive import PayloadArchive
+from checkpoint import OrderedFlusher, RunJournal
+from sheets_writer import SheetsWriter
+from rate_limiter import backoff_delay, call_with_backoff, shared_limiter
+from discovery import DiscoveryDocuments
+from language import LanguageDetector
+from demographics import DemographicEstimator
+from input_sources import SheetsInputSource, batched
+import analysis
+from config import ARCHIVE, BROWSER_POOL, CACHE, CHECKPOINT, DISCOVERY_CACHE, INPUT, INSTAGRAM_SCRAPER, LANGUAGE_DETECTION, DEMOGRAPHIC_ESTIMATION, INSTRUMENTATION, PROXY_ROUTING, RESOURCE_BLOCKING, SESSION_CACHE, SHEETS_WRITER, YOUTUBE_QUOTA
 import random
+import re
+import threading
 import urllib3
-import warnings
+from instrumentation import count, get_logger, span, write_summary
+
+log = get_logger(__name__)
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -20,374 +33,487 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 load_dotenv()
 
 class SocialMediaAnalyzer:
+    """
+    Fetches and analyzes influencer profiles. Each subsystem (API clients,
+    proxy manager, browser pool, ...) is built the first time a run needs it,
+    so e.g. a YouTube-only run never starts a browser
+    """
+    
+    # Header row of the Output sheet
+    OUTPUT_HEADERS = [
+        'Platform', 'Handle', 'Followers/Subscribers', 'Location',
+        'Content Language', 'Avg Views (15)', 'Avg Reach (15)',
+        'Avg Views (Branded)', 'Est. Gender Split', 'Est. State Split',
+        'Est. Age Split'
+    ]
+    
     def __init__(self):
-        self.youtube_api_key = os.getenv('YOUTUBE_API_KEY')
-        self.youtube = build('youtube', 'v3', developerKey=self.youtube_api_key)
+        # API clients are not thread-safe, so each worker thread gets its own
+        # copy (see the youtube property below)
+        self._local = threading.local()
+        # Guards lazy construction; reentrant because subsystems build each other
+        self._init_lock = threading.RLock()
+        self._subsystems = {}
+        self.startup_timings = {}
         
-        # Add Google Sheets setup
-        credentials_path = os.getenv('GOOGLE_SHEETS_CREDENTIALS')
-        self.sheets_creds = service_account.Credentials.from_service_account_file(
-            credentials_path,
-            scopes=['https://www.googleapis.com/auth/spreadsheets']
-        )
-        self.sheets = build('sheets', 'v4', credentials=self.sheets_creds)
-        
-        # Initialize playwright
-        self.playwright = sync_playwright().start()
+        with self._timed('core'):
+            self.youtube_api_key = os.getenv('YOUTUBE_API_KEY')
+            # Discovery documents are parsed once and cached on disk
+            self.discovery = DiscoveryDocuments(**DISCOVERY_CACHE)
+            
+            # Profiles and handle resolutions are cached across runs
+            self.cache = DataCache(CACHE['path'], ttl=CACHE['ttl'],
+                                   default_ttl=CACHE['default_ttl'])
+            
+            # Adaptive per-domain/API request rates, shared by every worker
+            self.rate_limiter = shared_limiter()
+            self.instagram_limiter = self.rate_limiter.bucket('instagram.com')
+            self._youtube_prefetched = {}
+            
+            # Every fetched payload is also kept, compressed, for re-analysis
+            self.archive = PayloadArchive(**ARCHIVE)
+            
+            # The model itself is only loaded when the first profile is estimated
+            self.demographics = DemographicEstimator(cache=self.cache, **DEMOGRAPHIC_ESTIMATION)
         
-        # Initialize proxy manager with Bright Data
-        brightdata_config = {
-            'username': os.getenv('BRIGHTDATA_USERNAME'),
-            'password': os.getenv('BRIGHTDATA_PASSWORD'),
-            'host': os.getenv('BRIGHTDATA_HOST', 'zproxy.lum-superproxy.io:22225'),
-            'countries': ['us', 'uk', 'ca', 'au']  # Add more countries as needed
-        }
-        self.proxy_manager = ProxyManager(proxy_source='brightdata', proxy_config=brightdata_config)
-        self.ua = UserAgent()
+        self.page_pool = None
+        self._browser_error = None
+    
+    @contextmanager
+    def _timed(self, name):
+        """Record how long starting a subsystem took"""
+        start = time.perf_counter()
+        yield
+        self.startup_timings[name] = time.perf_counter() - start
+        log.debug("Started %s in %.2fs", name, self.startup_timings[name])
+    
+    def _subsystem(self, name, factory):
+        """Build a subsystem on first use, exactly once across threads"""
+        subsystem = self._subsystems.get(name)
+        if subsystem is None:
+            with self._init_lock:
+                subsystem = self._subsystems.get(name)
+                if subsystem is None:
+                    with self._timed(name):
+                        subsystem = factory()
+                    self._subsystems[name] = subsystem
+        return subsystem
+    
+    @property
+    def output_headers(self):
+        """OUTPUT_HEADERS, with the split columns labelled as heuristic when they're estimated"""
+        return self.OUTPUT_HEADERS[:-3] + self.demographics.headers()
+    
+    @property
+    def youtube_client(self):
+        return self._subsystem('youtube_client', lambda: YouTubeClient(
+            lambda: self.youtube,
+            QuotaTracker(**YOUTUBE_QUOTA),
+            cache=self.cache,
+            limiter=self.rate_limiter.bucket('youtube')
+        ))
+    
+    @property
+    def sheets(self):
+        """Google Sheets API client"""
+        def create():
+            from google.oauth2 import service_account
+            credentials_path = os.getenv('GOOGLE_SHEETS_CREDENTIALS')
+            self.sheets_creds = service_account.Credentials.from_service_account_file(
+                credentials_path,
+                scopes=['https://www.googleapis.com/auth/spreadsheets']
+            )
+            return self.discovery.build('sheets', 'v4', credentials=self.sheets_creds)
+        return self._subsystem('sheets', create)
+    
+    @property
+    def proxy_manager(self):
+        """Proxy manager with Bright Data"""
+        def create():
+            from proxy_manager import ProxyManager
+            brightdata_config = {
+                'username': os.getenv('BRIGHTDATA_USERNAME'),
+                'password': os.getenv('BRIGHTDATA_PASSWORD'),
+                'host': os.getenv('BRIGHTDATA_HOST', 'zproxy.lum-superproxy.io:22225'),
+                'countries': PROXY_ROUTING['countries']
+            }
+            return ProxyManager(proxy_source='brightdata', proxy_config=brightdata_config)
+        return self._subsystem('proxy_manager', create)
+    
+    @property
+    def ua(self):
+        def create():
+            from fake_useragent import UserAgent
+            return UserAgent()
+        return self._subsystem('user_agent', create)
+    
+    @property
+    def language_detector(self):
+        return self._subsystem('language', lambda: LanguageDetector(**LANGUAGE_DETECTION))
+    
+    def analysis_pool(self, workers):
+        """Processes that build output rows in concurrent runs, started once and kept until close()"""
+        def create():
+            from pipeline import start_analysis_pool
+            return start_analysis_pool(workers)
+        return self._subsystem('analysis_pool', create)
+    
+    def ensure_browser(self):
+        """
+        Start the browser pool and check the connection, once. A failed start
+        is torn down and remembered, so later rows don't each start (and
+        leak) another pool of remote browsers
+        """
+        def create():
+            if self._browser_error is not None:
+                raise self._browser_error
+            try:
+                self.setup_browser()
+                # Test connection
+                if not self.test_brightdata_connection():
+                    raise Exception("Failed to connect to Bright Data Scraping Browser")
+            except Exception as e:
+                self._shutdown_browser()
+                self._browser_error = e
+                raise
+            return self.page_pool
+        if self._browser_error is not None:
+            raise self._browser_error
+        return self._subsystem('browser', create)
+    
+    @property
+    def youtube(self):
+        """YouTube API client for the current thread"""
+        if getattr(self._local, 'youtube', None) is None:
+            self._local.youtube = self.discovery.build('youtube', 'v3', developerKey=self.youtube_api_key)
+        return self._local.youtube
+    
+    @youtube.setter
+    def youtube(self, client):
+        self._local.youtube = client
+    
+    def setup_browser(self):
+        """Start the pool of warm Bright Data Scraping Browser pages"""
+        log.info("Connecting to Bright Data Scraping Browser...")
+        from browser_pool import BrowserPagePool
+        # The pool calls back into these from its loop thread, which must
+        # never wait on _init_lock, so build them before it starts
+        self.proxy_manager, self.ua
         
-        # Setup browser
-        self.setup_browser()
+        # Playwright's async pool lives on its own event loop thread so it can
+        # serve the sync callers below and the concurrent worker threads alike
+        if getattr(self, '_loop', None) is None:
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                                 name='browser-pool', daemon=True)
+            self._loop_thread.start()
         
-        # Test connection
-        if not self.test_brightdata_connection():
-            raise Exception("Failed to connect to Bright Data Scraping Browser")
+        # Several hosts can be given to spread pages over more remote browsers
+        hosts = os.getenv('BRIGHTDATA_BROWSER_HOSTS') or os.getenv('BRIGHTDATA_HOST', '')
+        self.browser_hosts = [host.strip() for host in hosts.split(',') if host.strip()]
         
-    def setup_browser(self):
-        """Setup Bright Data Scraping Browser"""
-        print("Connecting to Bright Data Scraping Browser...")
+        # Logged-in sessions are reused across contexts and runs
+        self.session_store = SessionStore(
+            SESSION_CACHE['directory'],
+            ttl=SESSION_CACHE['ttl'],
+            refresh_margin=SESSION_CACHE['refresh_margin']
+        )
         
-        # Construct the WebSocket URL from environment variables
-        ws_url = f"wss://{os.getenv('BRIGHTDATA_USERNAME')}:{os.getenv('BRIGHTDATA_PASSWORD')}@{os.getenv('BRIGHTDATA_HOST')}"
+        # Skip media, fonts and trackers on every pooled page
+        self.resource_blocker = ResourceBlocker(**RESOURCE_BLOCKING)
+        self.profile_bytes = []
+        # Proxy lease behind each page endpoint, to report fetch outcomes to
+        self._page_leases = {}
         
         try:
-            self.browser = self.playwright.chromium.connect_over_cdp(ws_url)
-            print("Successfully connected to Bright Data Scraping Browser")
-            
-            # Create a context with enhanced stealth configurations
-            self.context = self.browser.new_context(
-                viewport={'width': random.randint(1024, 1920), 
-                         'height': random.randint(768, 1080)},
-                user_agent=self.ua.random,
-                locale='en-US',
-                timezone_id='America/New_York',
-                permissions=['geolocation'],
-                geolocation={'latitude': 40.7128, 'longitude': -74.0060},
-                color_scheme='dark'
+            self.page_pool = BrowserPagePool(
+                endpoint_factory=self._page_endpoint,
+                size=int(os.getenv('BROWSER_POOL_SIZE', BROWSER_POOL['size'])),
+                context_options=self._context_options,
+                warmup=self._warm_page,
+                init_script=STEALTH_SCRIPT,
+                page_setup=self.resource_blocker.install,
+                max_page_uses=BROWSER_POOL['max_page_uses'],
+                max_page_age=BROWSER_POOL['max_page_age'],
+                acquire_timeout=BROWSER_POOL['acquire_timeout']
+            )
+            self._run_async(self.page_pool.start())
+            self._session_refresher = asyncio.run_coroutine_threadsafe(
+                self._refresh_sessions(), self._loop
             )
-            print("Browser context created successfully")
+            log.info("Successfully connected to Bright Data Scraping Browser")
             
         except Exception as e:
-            print(f"Error connecting to Bright Data Scraping Browser: {str(e)}")
+            log.error("Error connecting to Bright Data Scraping Browser: %s", e)
             raise
     
-    def add_stealth_scripts(self, page):
-        """Add advanced stealth scripts to the page"""
-        # Mask WebDriver
-        page.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-            
-            // Mask automation
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [1, 2, 3, 4, 5]
-            });
-            
-            // Add language preferences
-            Object.defineProperty(navigator, 'languages', {
-                get: () => ['en-US', 'en']
-            });
-            
-            // Modify hardware concurrency
-            Object.defineProperty(navigator, 'hardwareConcurrency', {
-                get: () => 8
-            });
-            
-            // Add fake battery data
-            navigator.getBattery = () => Promise.resolve({
-                charging: true,
-                chargingTime: 0,
-                dischargingTime: Infinity,
-                level: 0.98
-            });
-        """)
-    
-    def get_instagram_data(self, username):
-        """Fetch Instagram data using Playwright with enhanced stealth"""
-        print(f"\nFetching data for Instagram user: {username}")
+    def _page_endpoint(self, slot, failed):
+        """
+        WebSocket URL for a pool slot: each slot holds its own sticky proxy
+        session, so parallel pages never share an exit IP
+        """
+        key = f'page-{slot}'
+        if failed:
+            # Drop the burned IP; the new lease gets a fresh session
+            self.proxy_manager.release(key, failed=True)
+        countries = PROXY_ROUTING['countries']
+        lease = self.proxy_manager.lease(key, country=countries[slot % len(countries)])
+        username = lease.username if lease else os.getenv('BRIGHTDATA_USERNAME')
+        host = self.browser_hosts[slot % len(self.browser_hosts)]
+        endpoint = f"wss://{username}:{os.getenv('BRIGHTDATA_PASSWORD')}@{host}"
+        # Forget leases that have been given up since
+        leases = self.proxy_manager.leases
+        self._page_leases = {e: l for e, l in self._page_leases.items() if leases.get(l.key) is l}
+        if lease is not None:
+            self._page_leases[endpoint] = lease
+        return endpoint
+    
+    def _session_key(self, endpoint):
+        """Sessions are kept per Instagram account and proxy country"""
+        match = re.search(r'-country-([a-z]{2})', endpoint)
+        return os.getenv('INSTAGRAM_USERNAME', ''), match.group(1) if match else 'any'
+    
+    def _context_options(self, endpoint):
+        """Enhanced stealth configuration for each new browser context"""
+        options = {
+            'viewport': {'width': random.randint(1024, 1920),
+                         'height': random.randint(768, 1080)},
+            'user_agent': self.ua.random,
+            'locale': 'en-US',
+            'timezone_id': 'America/New_York',
+            'permissions': ['geolocation'],
+            'geolocation': {'latitude': 40.7128, 'longitude': -74.0060},
+            'color_scheme': 'dark'
+        }
+        # A session due for renewal isn't reused: the context starts logged
+        # out, so _warm_page logs in for real rather than re-saving old cookies
+        key = self._session_key(endpoint)
+        if not self.session_store.needs_refresh(*key):
+            storage_state = self.session_store.load(*key)
+            if storage_state:
+                options['storage_state'] = storage_state
+        return options
+    
+    async def _warm_page(self, page, endpoint):
+        """Log in (on a context started without the stored session) when it's missing or due for renewal"""
+        key = self._session_key(endpoint)
+        if not self.session_store.needs_refresh(*key):
+            return
+        await login_if_needed(page)
+        self.session_store.save(*key, await page.context.storage_state())
+    
+    async def _refresh_sessions(self):
+        """Renew stored sessions in the background before they expire"""
+        while True:
+            await asyncio.sleep(SESSION_CACHE['refresh_interval'])
+            for endpoint in self.page_pool.active_endpoints():
+                if not self.session_store.needs_refresh(*self._session_key(endpoint)):
+                    continue
+                try:
+                    # A throwaway page, started logged out, logs in and saves the new state
+                    await self.page_pool.discard(await self.page_pool.create_page(endpoint))
+                except Exception as e:
+                    log.error("Error refreshing Instagram session: %s", e)
+    
+    def _run_async(self, coro, timeout=None):
+        """Run a coroutine on the browser pool's event loop and wait for it"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # Cancelling lets the coroutine hand back any page it borrowed
+            future.cancel()
+            raise TimeoutError(f"Browser task still running after {timeout:g}s") from None
+    
+    async def _fetch_instagram(self, username, attempt, country=None, raw=None):
+        # Prefer a page whose exit IP is in the influencer's region
+        with span('instagram.acquire_page'):
+            pooled = await self.page_pool.acquire(
+                prefer=lambda p: country is not None and self._session_key(p.endpoint)[1] == country
+            )
+        # Keep the request rate through each exit IP low, and to Instagram
+        # as a whole within what it currently tolerates
+        await asyncio.sleep(self.proxy_manager.wait_for_turn(f'page-{pooled.slot}'))
+        await self.instagram_limiter.acquire_async()
+        self.resource_blocker.take_counts(pooled.page)
+        lease = self._page_leases.get(pooled.endpoint)
+        healthy = False
+        proxy_failed = True
+        try:
+            start = time.monotonic()
+            with span('instagram.profile'):
+                data = await scrape_profile(
+                    pooled.page, username, attempt,
+                    extraction=INSTAGRAM_SCRAPER['extraction'],
+                    max_posts=INSTAGRAM_SCRAPER['max_posts'],
+                    raw=raw
+                )
+            latency = time.monotonic() - start
+            self.instagram_limiter.on_success(latency)
+            if lease is not None:
+                self.proxy_manager.record_success(lease.base, latency)
+            healthy = True
+            counts = self.resource_blocker.take_counts(pooled.page)
+            self.profile_bytes.append(counts['bytes'])
+            count('instagram_bytes', counts['bytes'])
+            log.debug("Transferred %.0f KB for %s (%s requests blocked)",
+                      counts['bytes'] / 1024, username, counts['blocked_requests'])
+            return data
+        except RateLimited:
+            self.instagram_limiter.on_throttle()
+            raise
+        except SessionExpired:
+            # Force a fresh login for the replacement context; the proxy isn't to blame
+            self.session_store.invalidate(*self._session_key(pooled.endpoint))
+            proxy_failed = False
+            raise
+        finally:
+            if not healthy and lease is not None:
+                # Penalise the lease this page used; the replacement page gets a new IP
+                self.proxy_manager.release(lease.key, failed=proxy_failed, lease=lease)
+            # Failed fetches (and a sample of good ones) keep a screenshot
+            if self.archive.wants_screenshot(failed=not healthy):
+                await self._save_screenshot(pooled.page, username, 'ok' if healthy else 'failed')
+            await self.page_pool.release(pooled, healthy=healthy)
+    
+    async def _save_screenshot(self, page, username, reason):
+        try:
+            image = await page.screenshot()
+        except Exception as e:
+            log.debug("Could not take a screenshot of %s: %s", username, e)
+            return
+        self.archive.save_screenshot('instagram', username, image, reason)
+    
+    def get_instagram_data(self, username, country=None):
+        """
+        Fetch Instagram data using Playwright with enhanced stealth
+        country is the influencer's expected region, used to pick the proxy exit
+        """
+        log.info("Fetching data for Instagram user: %s", username)
+        cached = self.cache.get_profile('instagram', username)
+        if cached:
+            log.debug("Using cached Instagram data")
+            return cached
+        
         max_retries = 3
         current_retry = 0
         
+        try:
+            self.ensure_browser()
+        except Exception as e:
+            # Retrying can't help until the browser is reachable again
+            log.error("Skipping Instagram user %s, no browser: %s", username, e)
+            return None
         while current_retry < max_retries:
             try:
-                print(f"Attempt {current_retry + 1} of {max_retries}")
-                page = self.context.new_page()
-                self.add_stealth_scripts(page)
-                
-                # First, go to Instagram homepage to handle any initial redirects
-                print("Navigating to Instagram homepage...")
-                page.goto('https://www.instagram.com/', 
-                         wait_until='networkidle',
-                         timeout=30000)
-                
-                # Check if we're on the login page
-                if page.locator('input[name="username"]').count() > 0:
-                    print("Login page detected, attempting to login...")
-                    # Try to login with environment variables
-                    username_input = page.locator('input[name="username"]')
-                    password_input = page.locator('input[name="password"]')
-                    
-                    if username_input and password_input:
-                        username_input.fill(os.getenv('INSTAGRAM_USERNAME', ''))
-                        password_input.fill(os.getenv('INSTAGRAM_PASSWORD', ''))
-                        page.locator('button[type="submit"]').click()
-                        
-                        # Wait for login to complete
-                        page.wait_for_load_state('networkidle', timeout=30000)
-                        
-                        # Check if login was successful
-                        if page.locator('input[name="username"]').count() > 0:
-                            raise Exception("Login failed")
-                
-                # Now navigate to the profile
-                print(f"Navigating to profile: {username}")
-                response = page.goto(
-                    f'https://www.instagram.com/{username}/',
-                    wait_until='networkidle',
-                    timeout=30000
-                )
-                
-                if not response:
-                    raise Exception("No response from page")
-                    
-                if response.status >= 400:
-                    raise Exception(f"HTTP {response.status}")
-                
-                print("Waiting for content to load...")
-                # Try multiple selectors for the main content
-                main_content = None
-                for selector in [
-                    'div[role="main"]',
-                    'main',
-                    'article',
-                    'div._aagv',
-                    'div[style*="padding-bottom: 100%"]'
-                ]:
-                    try:
-                        main_content = page.wait_for_selector(selector, 
-                                                           state='visible', 
-                                                           timeout=5000)
-                        if main_content:
-                            print(f"Found main content with selector: {selector}")
-                            break
-                    except Exception as e:
-                        print(f"Selector {selector} not found: {str(e)}")
-                        continue
-                
-                if not main_content:
-                    raise Exception("Could not find main content on page")
-                
-                # Take a screenshot for debugging
-                page.screenshot(path=f"debug_{username}_{current_retry}.png")
-                print(f"Saved debug screenshot to debug_{username}_{current_retry}.png")
-                
-                print("Getting follower count...")
-                # Try different selectors for follower count
-                followers = None
-                for selector in [
-                    'text=/\\d+\\s*(followers|Followers)/',
-                    'div[role="main"] ul li:nth-child(2) span',
-                    'div[role="main"] ul li:nth-child(2) a span',
-                    'div._aacl._aaco._aacw._aacx._aad6._aade'
-                ]:
-                    try:
-                        followers = page.locator(selector).first
-                        if followers:
-                            break
-                    except Exception as e:
-                        print(f"Follower selector {selector} failed: {str(e)}")
-                        continue
-                
-                followers_text = followers.text_content() if followers else "N/A"
-                print(f"Found {followers_text} followers")
-                
-                print("Getting bio...")
-                # Try different selectors for bio
-                bio = None
-                for selector in [
-                    'div._aa_c',
-                    'div[role="main"] div._aa_c',
-                    'div[role="main"] div._aacl._aaco._aacu._aacx._aad6._aade',
-                    'div._aacl._aaco._aacu._aacx._aad6._aade'
-                ]:
-                    try:
-                        bio = page.locator(selector).first
-                        if bio:
-                            break
-                    except Exception as e:
-                        print(f"Bio selector {selector} failed: {str(e)}")
-                        continue
-                
-                bio_text = bio.text_content() if bio else ""
-                
-                print("Getting recent posts...")
-                # Try different selectors for posts
-                posts = []
-                post_elements = page.locator('article img, div[role="main"] img, div._aagv img').all()[:15]
-                print(f"Found {len(post_elements)} posts")
-                
-                for i, post in enumerate(post_elements, 1):
-                    print(f"Processing post {i}/15")
-                    post_url = post.get_attribute('src')
-                    post_alt = post.get_attribute('alt')
-                    
-                    try:
-                        post.click()
-                        page.wait_for_selector('div[role="dialog"]', timeout=5000)
-                        
-                        views = page.locator('text=/\\d+\\s*views/').first
-                        view_count = views.text_content() if views else None
-                        
-                        posts.append({
-                            'url': post_url,
-                            'alt': post_alt,
-                            'views': view_count
-                        })
-                        
-                        page.keyboard.press('Escape')
-                    except Exception as e:
-                        print(f"Error processing post {i}: {str(e)}")
-                        posts.append({
-                            'url': post_url,
-                            'alt': post_alt,
-                            'views': None
-                        })
-                
-                page.close()
-                print("Successfully fetched all data!")
-                
-                return {
-                    'followers': followers_text,
-                    'bio': bio_text,
-                    'recent_posts': posts
-                }
+                log.debug("Attempt %s of %s", current_retry + 1, max_retries)
+                raw = []
+                data = self._run_async(self._fetch_instagram(
+                    username, current_retry,
+                    country=self.proxy_manager.route_country(country, PROXY_ROUTING['aliases']),
+                    raw=raw
+                ), timeout=BROWSER_POOL['fetch_timeout'])
+                self.cache.set_profile('instagram', username, data)
+                # The JSON the profile was parsed from; a DOM scrape has only its result
+                if raw:
+                    self.archive.append('instagram', username, {'payloads': raw}, source='network')
+                else:
+                    self.archive.append('instagram', username, data, source='dom')
+                return data
                 
             except Exception as e:
                 current_retry += 1
-                print(f"Attempt {current_retry} failed: {str(e)}")
+                log.warning("Attempt %s failed: %s", current_retry, e)
                 
                 if current_retry < max_retries:
-                    print("Rotating proxy and retrying...")
-                    current_proxy = self.proxy_manager.get_proxy()
-                    if current_proxy:
-                        self.proxy_manager.mark_proxy_failed(current_proxy)
-                        self.setup_browser()
-                        time.sleep(random.uniform(5, 10))
-                    else:
-                        print("No more proxies available!")
-                        return None
+                    # The failed page is replaced by the pool on a fresh proxy session
+                    count('retries', label='Instagram')
+                    delay = backoff_delay(current_retry, base=5, cap=60)
+                    log.info("Rotating proxy and retrying in %.1fs...", delay)
+                    time.sleep(delay)
                 else:
-                    print(f"All retries failed for {username}")
+                    log.warning("All retries failed for %s", username)
                     return None
             
     def get_youtube_data(self, channel_handle):
         """Fetch YouTube data using the YouTube Data API"""
-        print(f"\nFetching data for YouTube channel: {channel_handle}")
+        log.info("Fetching data for YouTube channel: %s", channel_handle)
+        if channel_handle in self._youtube_prefetched:
+            return self._youtube_prefetched.pop(channel_handle)
+        cached = self.cache.get_profile('youtube', channel_handle)
+        if cached:
+            log.debug("Using cached YouTube data")
+            return cached
         try:
-            # First, try to get channel ID from handle
-            print("Converting channel handle to ID...")
-            search_response = self.youtube.search().list(
-                part='id',
-                q=channel_handle,
-                type='channel',
-                maxResults=1
-            ).execute()
-            
-            if not search_response.get('items'):
-                print(f"No channel found with handle: {channel_handle}")
-                return None
-                
-            channel_id = search_response['items'][0]['id']['channelId']
-            print(f"Found channel ID: {channel_id}")
-            
-            # Now get channel data
-            print("Fetching channel data...")
-            channel_response = self.youtube.channels().list(
-                part='statistics,snippet',
-                id=channel_id
-            ).execute()
-            
-            if not channel_response.get('items'):
-                print(f"No channel data found for ID: {channel_id}")
-                return None
-                
-            channel_data = channel_response['items'][0]
-            print(f"Found channel: {channel_data['snippet']['title']}")
-            
-            # Get recent videos
-            print("Fetching recent videos...")
-            videos_response = self.youtube.search().list(
-                part='id',
-                channelId=channel_id,
-                order='date',
-                type='video',
-                maxResults=15
-            ).execute()
-            
-            if not videos_response.get('items'):
-                print("No videos found for this channel")
-                return {
-                    'subscriber_count': channel_data['statistics'].get('subscriberCount', 'N/A'),
-                    'channel_info': channel_data['snippet'],
-                    'recent_videos': []
-                }
-            
-            video_ids = [item['id']['videoId'] for item in videos_response['items']]
-            print(f"Found {len(video_ids)} recent videos")
-            
-            # Get video statistics
-            print("Fetching video statistics...")
-            videos_stats = self.youtube.videos().list(
-                part='statistics,snippet',
-                id=','.join(video_ids)
-            ).execute()
-            
-            if not videos_stats.get('items'):
-                print("Could not fetch video statistics")
-                return {
-                    'subscriber_count': channel_data['statistics'].get('subscriberCount', 'N/A'),
-                    'channel_info': channel_data['snippet'],
-                    'recent_videos': []
-                }
-            
-            print("Successfully fetched all YouTube data")
-            return {
-                'subscriber_count': channel_data['statistics'].get('subscriberCount', 'N/A'),
-                'channel_info': channel_data['snippet'],
-                'recent_videos': videos_stats['items']
-            }
+            raw = {}
+            data = self.youtube_client.fetch_channels([channel_handle], raw=raw)[channel_handle]
+            if data:
+                self.cache.set_profile('youtube', channel_handle, data)
+                self.archive.append('youtube', channel_handle, raw[channel_handle], source='api')
+                log.info("Found channel: %s with %s recent videos",
+                         data['channel_info']['title'], len(data['recent_videos']))
+            return data
             
         except Exception as e:
-            print(f"Error fetching YouTube data: {str(e)}")
-            print("Full error details:", e.__class__.__name__)
+            log.error("Error fetching YouTube data: %s", e)
+            log.debug("Full error details: %s", e.__class__.__name__)
             if hasattr(e, 'response'):
-                print("API Response:", e.response)
+                log.debug("API Response: %s", e.response)
             return None
+    
+    def prefetch_youtube(self, handles):
+        """Fetch many YouTube channels with batched channel/video lookups"""
+        missing = []
+        for handle in dict.fromkeys(handles):
+            cached = self.cache.get_profile('youtube', handle)
+            if cached:
+                self._youtube_prefetched[handle] = cached
+            else:
+                missing.append(handle)
+        handles = missing
+        if not handles:
+            return
+        log.info("Prefetching %s YouTube channels...", len(handles))
+        
+        def fetch(batch):
+            try:
+                raw = {}
+                results = self.youtube_client.fetch_channels(batch, raw=raw)
+                for handle, data in results.items():
+                    if data:
+                        self.cache.set_profile('youtube', handle, data)
+                        self.archive.append('youtube', handle, raw[handle], source='api')
+                self._youtube_prefetched.update(results)
+            except QuotaExceeded as e:
+                log.info("Stopping YouTube prefetch: %s", e)
+            except Exception as e:
+                # Whatever wasn't prefetched is fetched one by one later
+                log.error("Error prefetching YouTube channels: %s", e)
+        
+        for batch in batched(handles, MAX_IDS_PER_REQUEST):
+            fetch(batch)
 
+    def _execute_sheets(self, request):
+        """Execute a Sheets API request under the shared 'sheets' rate limit, retrying 429/5xx"""
+        return call_with_backoff(request.execute, self.rate_limiter.bucket('sheets'),
+                                 max_retries=SHEETS_WRITER['max_retries'], label='Sheets API')
+    
     def read_sheet_data(self, spreadsheet_id, range_name):
         """
         Read influencer handles from Google Sheet
         Example range_name: 'Sheet1!A2:B20'
         """
         try:
-            result = self.sheets.spreadsheets().values().get(
+            request = self.sheets.spreadsheets().values().get(
                 spreadsheetId=spreadsheet_id,
                 range=range_name
-            ).execute()
+            )
+            with span('sheets.read'):
+                result = self._execute_sheets(request)
             
             rows = result.get('values', [])
             if not rows:
-                print('No data found in sheet')
+                log.info("No data found in sheet")
                 return []
                 
             # Convert to list of dicts
@@ -395,7 +521,7 @@ class SocialMediaAnalyzer:
             return [dict(zip(headers, row)) for row in rows]
             
         except Exception as e:
-            print(f"Error reading from sheet: {str(e)}")
+            log.error("Error reading from sheet: %s", e)
             return []
     
     def write_analytics_data(self, spreadsheet_id, range_name, data):
@@ -407,361 +533,232 @@ class SocialMediaAnalyzer:
             body = {
                 'values': data
             }
-            result = self.sheets.spreadsheets().values().update(
+            request = self.sheets.spreadsheets().values().update(
                 spreadsheetId=spreadsheet_id,
                 range=range_name,
                 valueInputOption='USER_ENTERED',
                 body=body
-            ).execute()
-            print(f"{result.get('updatedCells')} cells updated")
+            )
+            with span('sheets.write'):
+                result = self._execute_sheets(request)
+            log.info("%s cells updated", result.get('updatedCells'))
             return True
             
         except Exception as e:
-            print(f"Error writing to sheet: {str(e)}")
+            log.error("Error writing to sheet: %s", e)
             return False
     
-    def process_influencers(self, spreadsheet_id):
-        """Main function to process all influencers from sheet"""
-        print("\nStarting to process influencers...")
+    def process_handle(self, platform, handle, country=None):
+        """Fetch and analyze a single influencer, returning an output row or None"""
+        platform = platform.lower()
+        log.debug("Platform: %s, Handle: %s", platform, handle)
+        with span('handle', platform=platform):
+            data = self.fetch_handle(platform, handle, country)
+            row = self.build_row(platform, handle, data) if data else None
+        count('profiles', platform=platform, outcome='ok' if row else 'failed')
+        return row
+    
+    def fetch_handle(self, platform, handle, country=None):
+        """Raw profile or channel data for an influencer (None if it couldn't be fetched)"""
+        data = None
+        if platform == 'instagram':
+            data = self.get_instagram_data(handle, country=country)
+        elif platform == 'youtube':
+            data = self.get_youtube_data(handle)
+        if data:
+            log.info("Successfully processed %s data", 'Instagram' if platform == 'instagram' else 'YouTube')
+        return data
+    
+    def build_row(self, platform, handle, data):
+        """Output row from fetched data, on this thread (see analysis.analyze for processes)"""
+        return analysis.build_row(platform, handle, data, self.language_detector, self.demographics)
+    
+    def output_writer(self, spreadsheet_id, output=None):
+        """
+        Where finished rows go: the Output sheet (its header row is written
+        now), or with output a local .csv/.jsonl file, which needs no Google access
+        """
+        if output:
+            from file_writer import FileWriter
+            return FileWriter(output, self.output_headers, max_rows=SHEETS_WRITER['max_rows'],
+                              max_interval=SHEETS_WRITER['max_interval'])
+        self.write_analytics_data(spreadsheet_id, 'Output!A1:K1', [self.output_headers])
+        return SheetsWriter(self.sheets, spreadsheet_id, sheet='Output', **SHEETS_WRITER)
+    
+    def process_influencers(self, spreadsheet_id, concurrent=False, concurrency=None,
+                            max_age=None, resume=True, source=None, analysis_workers=None,
+                            output=None):
+        """
+        Main function to process all influencers from sheet
+        source is any InputSource (default: the Input sheet, read page by
+        page); rows are processed as they are read
+        Rows go to the Output sheet, or to output (a .csv/.jsonl path)
+        With concurrent=True handles are fetched in parallel, limited per
+        platform by concurrency (defaults to config.CONCURRENCY), and rows
+        are built in analysis_workers processes (defaults to config.ANALYSIS)
+        max_age (seconds) refetches cached profile data older than that
+        Finished handles are journaled and written out in batches; with
+        resume=True an interrupted run picks up where it stopped
+        """
+        log.info("Starting to process influencers...")
+        self.cache.max_age = max_age
         
-        # Read influencer handles
-        print("Reading from Google Sheet...")
-        influencers = self.read_sheet_data(spreadsheet_id, 'Input!A2:B')
-        print(f"Found {len(influencers)} influencers to process")
+        if source is None:
+            log.info("Reading from Google Sheet...")
+            source = SheetsInputSource(self.sheets, spreadsheet_id, page_size=INPUT['page_size'])
         
-        # Prepare results array
-        results = []
-        headers = [
-            'Platform', 'Handle', 'Followers/Subscribers', 'Location',
-            'Content Language', 'Avg Views (15)', 'Avg Reach (15)',
-            'Avg Views (Branded)', 'Est. Gender Split', 'Est. State Split',
-            'Est. Age Split'
-        ]
-        results.append(headers)
+        writer = self.output_writer(spreadsheet_id, output)
         
-        for i, influencer in enumerate(influencers, 1):
-            print(f"\nProcessing influencer {i}/{len(influencers)}")
-            platform = influencer['platform'].lower()
-            handle = influencer['handle']
-            print(f"Platform: {platform}, Handle: {handle}")
-            
-            if platform == 'instagram':
-                data = self.get_instagram_data(handle)
-                if data:
-                    print("Successfully processed Instagram data")
-                    # Process Instagram data
-                    row = [
-                        'Instagram',
-                        handle,
-                        data['followers'],
-                        self.extract_location(data['bio']),
-                        self.detect_language(data['bio'], platform='instagram'),
-                        self.calculate_avg_views(data['recent_posts']),
-                        self.calculate_avg_reach(data['recent_posts']),
-                        self.calculate_branded_views(data['recent_posts']),
-                        'TBD',  # Gender split
-                        'TBD',  # State split
-                        'TBD'   # Age split
-                    ]
-                    results.append(row)
-                    
-            elif platform == 'youtube':
-                data = self.get_youtube_data(handle)
-                if data:
-                    print("Successfully processed YouTube data")
-                    # Process YouTube data
-                    row = [
-                        'YouTube',
-                        handle,
-                        data['subscriber_count'],
-                        data['channel_info'].get('country', 'Unknown'),
-                        self.detect_language(
-                            data['channel_info'].get('description', ''),
-                            platform='youtube',
-                            channel_info=data['channel_info']
-                        ),
-                        self.calculate_yt_avg_views(data['recent_videos']),
-                        'N/A',  # YouTube doesn't provide reach data
-                        self.calculate_yt_branded_views(data['recent_videos']),
-                        'TBD',  # Gender split
-                        'TBD',  # State split
-                        'TBD'   # Age split
-                    ]
-                    results.append(row)
+        # Every finished handle goes to the journal right away; rows reach
+        # the sheet in input order, in batches, once all rows before them are done
+        journal = RunJournal.for_spreadsheet(CHECKPOINT['directory'], output or spreadsheet_id,
+                                             fresh=not resume)
+        flusher = OrderedFlusher(journal, writer)
         
-        print("\nWriting results to Google Sheet...")
-        self.write_analytics_data(spreadsheet_id, 'Output!A1:K', results)
-        print("Done!")
+        in_flight = {}
+        rows_read = 0
         
-    def calculate_avg_views(self, posts):
-        """Calculate average views for Instagram posts"""
-        if not posts:
-            return "N/A"
-            
-        total_views = 0
-        valid_posts = 0
+        def on_result(index, row):
+            influencer = in_flight.pop(index)
+            journal.record(index, influencer['platform'], influencer['handle'], row)
+            flusher.add(index, row)
         
-        for post in posts:
-            if post.get('views'):
-                try:
-                    # Extract numeric value from views string (e.g., "1.2M views" -> 1200000)
-                    views_str = post['views'].lower()
-                    if 'k' in views_str:
-                        views = float(views_str.replace('k', '').replace('views', '').strip()) * 1000
-                    elif 'm' in views_str:
-                        views = float(views_str.replace('m', '').replace('views', '').strip()) * 1000000
-                    else:
-                        views = float(views_str.replace('views', '').strip())
-                    total_views += views
-                    valid_posts += 1
-                except (ValueError, TypeError):
+        def pending():
+            """Rows not finished by an earlier run, read lazily from the source"""
+            nonlocal rows_read
+            for index, influencer in enumerate(source, 1):
+                rows_read = index
+                if journal.completed(index, influencer['platform'], influencer['handle']):
                     continue
+                in_flight[index] = influencer
+                yield index, influencer
         
-        if valid_posts == 0:
-            return "N/A"
-            
-        avg_views = total_views / valid_posts
-        return f"{avg_views:,.0f}"
+        completed_run = False
+        try:
+            if concurrent:
+                from pipeline import ConcurrentProcessor
+                ConcurrentProcessor(self, concurrency, on_result=on_result,
+                                    analysis_workers=analysis_workers).run(pending())
+            else:
+                for batch in batched(pending(), MAX_IDS_PER_REQUEST):
+                    self.prefetch_youtube([i['handle'] for _, i in batch
+                                           if i['platform'].lower() == 'youtube'])
+                    for index, influencer in batch:
+                        log.info("Processing influencer %s", index)
+                        on_result(index, self.process_handle(influencer['platform'], influencer['handle'],
+                                                             country=influencer.get('country')))
+            completed_run = True
+        finally:
+            log.info("Writing remaining results to %s...", output or 'Google Sheet')
+            self.archive.flush()
+            flushed = flusher.flush()
+            journal.close(finished=completed_run and flushed and flusher.next_index > rows_read)
+            log.info("%s rows written to %s", writer.rows_written, output or 'the Output sheet')
+        
+        log.info("Startup: %s", ", ".join(f"{name} {seconds:.2f}s"
+                                          for name, seconds in self.startup_timings.items()))
+        if 'youtube_client' in self._subsystems:
+            log.info("YouTube quota: %s", self.youtube_client.quota.summary())
+        log.info("Cache stats: %s", self.cache.stats())
+        log.info("Rate limits: %s", self.rate_limiter.stats())
+        if 'language' in self._subsystems:
+            log.info("Language detection: %s", self.language_detector.stats())
+        log.info("Demographics: %s", self.demographics.stats())
+        if getattr(self, 'page_pool', None) is not None:
+            log.info("Browser pool stats: %s", self.page_pool.stats())
+        if getattr(self, 'profile_bytes', None):
+            mode = 'on' if self.resource_blocker.enabled else 'off'
+            log.info("Average transfer per Instagram profile: %.0f KB (resource blocking %s)",
+                     sum(self.profile_bytes) / len(self.profile_bytes) / 1024, mode)
+        if INSTRUMENTATION['enabled']:
+            path = write_summary(INSTRUMENTATION['summary_directory'],
+                                 rows_written=writer.rows_written,
+                                 startup=self.startup_timings)
+            log.info("Run summary written to %s", path)
+        log.info("Done!")
+        
+    def calculate_avg_views(self, posts):
+        """Calculate average views for Instagram posts"""
+        from metrics import format_count, profile_metrics
+        return format_count(profile_metrics('instagram', '', posts)['avg_views'])
         
     def calculate_avg_reach(self, posts):
         """Calculate average reach for Instagram posts"""
-        if not posts:
-            return "N/A"
-            
-        # Estimate reach based on views (typically 2-3x views)
-        avg_views = self.calculate_avg_views(posts)
-        if avg_views == "N/A":
-            return "N/A"
-            
-        try:
-            views = float(avg_views.replace(',', ''))
-            # Use a conservative estimate of 2x views for reach
-            reach = views * 2
-            return f"{reach:,.0f}"
-        except ValueError:
-            return "N/A"
+        # Estimated from the numeric average views rather than the formatted string
+        from metrics import format_count, profile_metrics
+        return format_count(profile_metrics('instagram', '', posts)['avg_reach'])
         
     def calculate_yt_avg_views(self, videos):
         """Calculate average views for YouTube videos"""
-        if not videos:
-            return "N/A"
-            
-        total_views = 0
-        valid_videos = 0
-        
-        for video in videos:
-            try:
-                views = int(video['statistics'].get('viewCount', 0))
-                total_views += views
-                valid_videos += 1
-            except (ValueError, TypeError):
-                continue
-        
-        if valid_videos == 0:
-            return "N/A"
-            
-        avg_views = total_views / valid_videos
-        return f"{avg_views:,.0f}"
+        from metrics import format_count, profile_metrics
+        return format_count(profile_metrics('youtube', '', videos)['avg_views'])
         
     def detect_language(self, text, platform=None, channel_info=None):
         """Detect content language using multiple methods"""
-        # For YouTube, use channel information first
-        if platform == 'youtube' and channel_info:
-            # Try defaultLanguage first
-            lang = channel_info.get('defaultLanguage')
-            if lang:
-                return lang.split('-')[0]  # Convert 'en-US' to 'en'
-                
-            # Try default audio language
-            lang = channel_info.get('defaultAudioLanguage')
-            if lang:
-                return lang.split('-')[0]
-                
-        # For text-based detection
-        if not text or not text.strip():
-            return 'Unknown'
-            
-        try:
-            # Import here to avoid potential import issues
-            from langdetect import detect, LangDetectException
-            
-            # Clean the text
-            text = text.strip()
-            
-            # Handle very short texts
-            if len(text) < 20:  # Increased minimum length for better accuracy
-                return 'Unknown'
-                
-            # Try to detect language
-            try:
-                lang = detect(text)
-                # Map language codes to more readable format
-                language_map = {
-                    'en': 'English',
-                    'es': 'Spanish',
-                    'fr': 'French',
-                    'de': 'German',
-                    'it': 'Italian',
-                    'pt': 'Portuguese',
-                    'ru': 'Russian',
-                    'ja': 'Japanese',
-                    'ko': 'Korean',
-                    'zh-cn': 'Chinese',
-                    'hi': 'Hindi'
-                }
-                return language_map.get(lang, lang)
-            except LangDetectException:
-                return 'Unknown'
-                
-        except ImportError:
-            print("Warning: langdetect library not installed. Installing now...")
-            try:
-                import subprocess
-                subprocess.check_call(['pip', 'install', 'langdetect'])
-                from langdetect import detect, LangDetectException
-                lang = detect(text)
-                return lang
-            except Exception as e:
-                print(f"Error installing/using langdetect: {str(e)}")
-                return 'Unknown'
-        except Exception as e:
-            print(f"Error detecting language: {str(e)}")
-            return 'Unknown'
+        return analysis.detect_language(self.language_detector, text, platform=platform,
+                                        channel_info=channel_info)
 
     def extract_location(self, bio):
         """Extract location from bio using NLP patterns"""
-        if not bio or not bio.strip():
-            return 'Unknown'
-            
-        # Common location patterns
-        location_patterns = [
-            r'📍\s*([^,\n]+)',  # Emoji followed by location
-            r'Location:\s*([^,\n]+)',  # "Location:" prefix
-            r'Based in\s*([^,\n]+)',  # "Based in" prefix
-            r'From\s*([^,\n]+)',  # "From" prefix
-            r'Living in\s*([^,\n]+)',  # "Living in" prefix
-            r'📍\s*([^,\n]+)',  # Location emoji
-            r'🌍\s*([^,\n]+)',  # Globe emoji
-            r'🌎\s*([^,\n]+)',  # Earth emoji
-        ]
-        
-        import re
-        for pattern in location_patterns:
-            match = re.search(pattern, bio, re.IGNORECASE)
-            if match:
-                location = match.group(1).strip()
-                # Clean up common suffixes
-                location = re.sub(r'[.,;].*$', '', location)
-                return location
-                
-        return 'Unknown'
+        return analysis.extract_location(bio)
 
     def calculate_branded_views(self, posts):
         """Calculate average views for branded Instagram posts"""
-        if not posts:
-            return "N/A"
-            
-        branded_posts = []
-        for post in posts:
-            # Check for common branded content indicators
-            alt_text = post.get('alt', '').lower()
-            if any(indicator in alt_text for indicator in [
-                'sponsored', 'ad', 'branded', 'collab', 'partnership',
-                'paid', 'promotion', 'sponsor', 'brand', 'product'
-            ]):
-                branded_posts.append(post)
-        
-        if not branded_posts:
-            return "N/A"
-            
-        # Calculate average views for branded posts
-        total_views = 0
-        valid_posts = 0
-        
-        for post in branded_posts:
-            if post.get('views'):
-                try:
-                    views_str = post['views'].lower()
-                    if 'k' in views_str:
-                        views = float(views_str.replace('k', '').replace('views', '').strip()) * 1000
-                    elif 'm' in views_str:
-                        views = float(views_str.replace('m', '').replace('views', '').strip()) * 1000000
-                    else:
-                        views = float(views_str.replace('views', '').strip())
-                    total_views += views
-                    valid_posts += 1
-                except (ValueError, TypeError):
-                    continue
-        
-        if valid_posts == 0:
-            return "N/A"
-            
-        avg_views = total_views / valid_posts
-        return f"{avg_views:,.0f}"
+        from metrics import format_count, profile_metrics
+        return format_count(profile_metrics('instagram', '', posts)['branded_avg_views'])
 
     def calculate_yt_branded_views(self, videos):
         """Calculate average views for branded YouTube videos"""
-        if not videos:
-            return "N/A"
-            
-        branded_videos = []
-        for video in videos:
-            # Check for common branded content indicators in title and description
-            title = video['snippet'].get('title', '').lower()
-            description = video['snippet'].get('description', '').lower()
-            
-            if any(indicator in title or indicator in description for indicator in [
-                'sponsored', 'ad', 'branded', 'collab', 'partnership',
-                'paid', 'promotion', 'sponsor', 'brand', 'product'
-            ]):
-                branded_videos.append(video)
-        
-        if not branded_videos:
-            return "N/A"
-            
-        # Calculate average views for branded videos
-        total_views = 0
-        valid_videos = 0
-        
-        for video in branded_videos:
-            try:
-                views = int(video['statistics'].get('viewCount', 0))
-                total_views += views
-                valid_videos += 1
-            except (ValueError, TypeError):
-                continue
-        
-        if valid_videos == 0:
-            return "N/A"
-            
-        avg_views = total_views / valid_videos
-        return f"{avg_views:,.0f}"
+        from metrics import format_count, profile_metrics
+        return format_count(profile_metrics('youtube', '', videos)['branded_avg_views'])
 
     def test_brightdata_connection(self):
         """Test if Bright Data Scraping Browser is working"""
         try:
-            print("Testing Bright Data Scraping Browser connection...")
-            page = self.context.new_page()
+            log.debug("Testing Bright Data Scraping Browser connection...")
+            return self._run_async(self._test_connection())
             
+        except Exception as e:
+            log.error("Error testing Bright Data connection: %s", e)
+            return False
+    
+    async def _test_connection(self):
+        async with self.page_pool.page() as page:
             # Try to access Instagram
-            response = page.goto('https://www.instagram.com', timeout=30000)
+            response = await page.goto('https://www.instagram.com', timeout=30000)
             
             if response and response.status == 200:
-                print("Successfully connected to Instagram through Bright Data")
-                page.close()
+                log.info("Successfully connected to Instagram through Bright Data")
                 return True
             else:
-                print(f"Failed to connect to Instagram. Status: {response.status if response else 'No response'}")
-                page.close()
+                log.warning("Failed to connect to Instagram. Status: %s",
+                            response.status if response else 'No response')
                 return False
-            
-        except Exception as e:
-            print(f"Error testing Bright Data connection: {str(e)}")
-            return False
+
+    def close(self):
+        """Cleanup Playwright resources"""
+        if getattr(self, 'archive', None) is not None:
+            self.archive.close()
+        analysis_pool = getattr(self, '_subsystems', {}).pop('analysis_pool', None)
+        if analysis_pool is not None:
+            analysis_pool.shutdown(wait=True)
+        self._shutdown_browser()
+        if getattr(self, '_loop', None) is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+    
+    def _shutdown_browser(self):
+        """Stop the session refresher and close the browser pool, if started"""
+        if getattr(self, '_session_refresher', None) is not None:
+            self._session_refresher.cancel()
+            self._session_refresher = None
+        if getattr(self, 'page_pool', None) is not None:
+            try:
+                self._run_async(self.page_pool.close())
+            except Exception as e:
+                log.error("Error closing browser pool: %s", e)
+            self.page_pool = None
 
     def __del__(self):
         """Cleanup Playwright resources"""
-        if hasattr(self, 'browser'):
-            self.browser.close()
-        if hasattr(self, 'playwright'):
-            self.playwright.stop() 
\ No newline at end of file
+        self.close()
@@ -0,0 +1,142 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from branded import detector
+
+# Conservative estimate of Instagram reach as a multiple of views
+REACH_MULTIPLIER = 2
+
+# "1.2M views" -> ("1.2", "m"); commas and the "views" suffix are stripped first
+VIEWS_PATTERN = r'^\s*(?P<number>\d+(?:\.\d+)?)\s*(?P<suffix>[km]?)\s*$'
+VIEW_MULTIPLIERS = {'': 1.0, 'k': 1e3, 'm': 1e6}
+VIEWS_REGEX = re.compile(VIEWS_PATTERN)
+
+METRIC_COLUMNS = ['posts', 'avg_views', 'avg_reach', 'branded_avg_views']
+
+
+def parse_views(views: pd.Series) -> pd.Series:
+    """View counts like '1,234', '1.2K views' or 5300 as floats (NaN if unparseable)"""
+    text = (views.astype('string').str.lower()
+            .str.replace('views', '', regex=False)
+            .str.replace(',', '', regex=False))
+    parts = text.str.extract(VIEWS_PATTERN)
+    number = pd.to_numeric(parts['number'], errors='coerce')
+    return (number * parts['suffix'].map(VIEW_MULTIPLIERS)).astype('float64')
+
+
+def instagram_columns(handle: str, posts: List[dict]) -> Dict[str, list]:
+    return {
+        'handle': [handle] * len(posts),
+        'platform': ['instagram'] * len(posts),
+        # Posts without a view count are left out of the averages
+        'views': [post.get('views') or None for post in posts],
+        'is_branded': detector.classify('instagram', posts)
+    }
+
+
+def youtube_columns(handle: str, videos: List[dict]) -> Dict[str, list]:
+    return {
+        'handle': [handle] * len(videos),
+        'platform': ['youtube'] * len(videos),
+        'views': [video.get('statistics', {}).get('viewCount', 0) for video in videos],
+        'is_branded': detector.classify('youtube', videos)
+    }
+
+
+COLUMN_BUILDERS = {
+    'instagram': instagram_columns,
+    'youtube': youtube_columns
+}
+
+
+def posts_frame(profiles: Iterable[Tuple[str, str, List[dict]]]) -> pd.DataFrame:
+    """
+    One typed row per post from (platform, handle, posts) triples, with views
+    parsed to numbers and branded posts flagged
+    """
+    columns = {'handle': [], 'platform': [], 'views': [], 'is_branded': []}
+    for platform, handle, posts in profiles:
+        for name, values in COLUMN_BUILDERS[platform](handle, posts or []).items():
+            columns[name].extend(values)
+
+    frame = pd.DataFrame({
+        'handle': pd.Categorical(columns['handle']),
+        'platform': pd.Categorical(columns['platform'], categories=list(COLUMN_BUILDERS)),
+        'views': parse_views(pd.Series(columns['views'], dtype='object')),
+        'is_branded': np.array(columns['is_branded'], dtype=bool)
+    })
+    return frame
+
+
+def aggregate(frame: pd.DataFrame) -> pd.DataFrame:
+    """Per (platform, handle) post count, average views, reach and branded views"""
+    keys = [frame['platform'], frame['handle']]
+    grouped = frame['views'].groupby(keys, observed=True, sort=False)
+    metrics = pd.DataFrame({
+        'posts': frame.groupby(keys, observed=True, sort=False).size(),
+        'avg_views': grouped.mean()
+    })
+    metrics['branded_avg_views'] = (
+        frame['views'].where(frame['is_branded'])
+        .groupby(keys, observed=True, sort=False).mean()
+    )
+    # Only Instagram gets a reach estimate; YouTube doesn't provide one
+    instagram = metrics.index.get_level_values('platform') == 'instagram'
+    metrics['avg_reach'] = np.where(instagram, metrics['avg_views'] * REACH_MULTIPLIER, np.nan)
+    return metrics[METRIC_COLUMNS]
+
+
+def parse_view(value) -> Optional[float]:
+    """parse_views for a single value, without building a Series"""
+    if value is None:
+        return None
+    match = VIEWS_REGEX.match(str(value).lower().replace('views', '').replace(',', ''))
+    if not match:
+        return None
+    return float(match.group('number')) * VIEW_MULTIPLIERS[match.group('suffix')]
+
+
+def profile_metrics(platform: str, handle: str, posts: List[dict]) -> Dict[str, Optional[float]]:
+    """
+    Unformatted metrics for one profile; missing values are None
+    Plain Python: a DataFrame per profile costs far more than the
+    arithmetic, so posts_frame/aggregate are kept for many profiles at once
+    """
+    if not posts:
+        return {column: None for column in METRIC_COLUMNS}
+    columns = COLUMN_BUILDERS[platform](handle, posts)
+    views, branded = [], []
+    for value, is_branded in zip(columns['views'], columns['is_branded']):
+        value = parse_view(value)
+        if value is not None:
+            views.append(value)
+            if is_branded:
+                branded.append(value)
+    avg_views = sum(views) / len(views) if views else None
+    # Only Instagram gets a reach estimate; YouTube doesn't provide one
+    avg_reach = None
+    if platform == 'instagram' and avg_views is not None:
+        avg_reach = avg_views * REACH_MULTIPLIER
+    return {
+        'posts': float(len(posts)),
+        'avg_views': avg_views,
+        'avg_reach': avg_reach,
+        'branded_avg_views': sum(branded) / len(branded) if branded else None
+    }
+
+
+def format_count(value: Optional[float]) -> str:
+    """Display a metric the way the Output sheet shows it"""
+    if value is None or pd.isna(value):
+        return "N/A"
+    return f"{value:,.0f}"
+
+
+def format_metrics(metrics: pd.DataFrame) -> pd.DataFrame:
+    """Display strings for a whole aggregate() table at once"""
+    return metrics[METRIC_COLUMNS[1:]].apply(
+        lambda column: column.map(format_count)
+    )
@@ -0,0 +1,186 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from analysis import analyze, init_process
+from config import ANALYSIS, CONCURRENCY, DEMOGRAPHIC_ESTIMATION
+from input_sources import batched
+from youtube_client import MAX_IDS_PER_REQUEST
+from instrumentation import count, get_logger, logging_settings, span
+
+log = get_logger(__name__)
+
+
+def physical_memory() -> Optional[int]:
+    """Bytes of RAM in this machine, if the OS says"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_workers() -> int:
+    """
+    Analysis processes when none are configured: one per spare core (with a
+    single core processes only add overhead), capped by ANALYSIS['max_workers']
+    and, since each process loads its own demographics model, by memory
+    """
+    workers = min((os.cpu_count() or 1) - 1, ANALYSIS['max_workers'])
+    memory = physical_memory()
+    if DEMOGRAPHIC_ESTIMATION['enabled'] and memory:
+        workers = min(workers, int(memory * ANALYSIS['memory_share'] // ANALYSIS['model_memory']))
+    return max(workers, 0)
+
+
+def start_analysis_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Analysis processes for ConcurrentProcessor; each loads its own detectors
+    once, so the pool is meant to be kept for the analyzer's lifetime
+    """
+    # spawn rather than fork: this process runs browser and API threads
+    return ProcessPoolExecutor(max_workers=workers,
+                               mp_context=multiprocessing.get_context('spawn'),
+                               initializer=init_process,
+                               initargs=logging_settings())
+
+
+class ConcurrentProcessor:
+    """
+    Run SocialMediaAnalyzer.process_handle for many influencers at once
+    Fetching and building rows are separate stages: fetch threads hand raw
+    payloads to a pool of analysis processes, so the next fetch starts
+    while earlier profiles are still being analyzed on other cores
+    """
+
+    def __init__(self, analyzer, concurrency: Optional[Dict[str, int]] = None,
+                 on_result: Optional[Callable[[int, Optional[list]], None]] = None,
+                 analysis_workers: Optional[int] = None):
+        self.analyzer = analyzer
+        # Called as on_result(index, row) as soon as each influencer finishes
+        self.on_result = on_result
+        self.concurrency = dict(CONCURRENCY)
+        if concurrency:
+            self.concurrency.update(concurrency)
+        # Don't read further ahead of the workers than this
+        self.max_in_flight = 4 * sum(self.concurrency.values())
+        # Analysis processes (defaults to config.ANALYSIS); 0 builds rows on the fetch threads
+        if analysis_workers is None:
+            analysis_workers = ANALYSIS['workers']
+        if analysis_workers is None:
+            analysis_workers = default_workers()
+        self.analysis_workers = analysis_workers
+
+    def run(self, influencers: Iterable[Tuple[int, dict]]) -> int:
+        """
+        Process (index, influencer) pairs, read lazily from the iterable
+        Rows are delivered through on_result (None for failures); returns
+        the number of influencers processed
+        """
+        return asyncio.run(self._run(influencers))
+
+    async def _run(self, influencers: Iterable[Tuple[int, dict]]) -> int:
+        # One bounded thread pool per platform, so a slow platform can't
+        # starve the other and each respects its own concurrency limit
+        executors = {
+            platform: ThreadPoolExecutor(max_workers=workers,
+                                         thread_name_prefix=f'{platform}-worker')
+            for platform, workers in self.concurrency.items()
+        }
+        # The analyzer owns the analysis processes and keeps them across runs
+        # (a worker runs once per leased batch), shutting them down in close()
+        analysis_pool = None
+        if self.analysis_workers:
+            analysis_pool = self.analyzer.analysis_pool(self.analysis_workers)
+        # Fetched payloads handed to (or waiting in) the analysis pool. When
+        # it's full, finished fetches wait, their rows stay in flight and the
+        # window below stops new fetches until analysis catches up
+        analysis_slots = asyncio.Semaphore(self.analysis_workers + ANALYSIS['queue_size'])
+        loop = asyncio.get_running_loop()
+        window = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        self.completed = 0
+        try:
+            for batch in batched(influencers, MAX_IDS_PER_REQUEST):
+                # Look up this batch's YouTube channels with batched API calls
+                # while its Instagram rows are already being fetched
+                prefetch = None
+                youtube_handles = [i['handle'] for _, i in batch
+                                   if i.get('platform', '').lower() == 'youtube']
+                if youtube_handles and 'youtube' in executors:
+                    prefetch = loop.run_in_executor(
+                        executors['youtube'], self.analyzer.prefetch_youtube, youtube_handles
+                    )
+
+                for index, influencer in batch:
+                    await window.acquire()
+                    task = asyncio.ensure_future(
+                        self._process(index, influencer, executors, prefetch,
+                                      analysis_pool, analysis_slots)
+                    )
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    task.add_done_callback(lambda _: window.release())
+
+            if tasks:
+                await asyncio.gather(*tasks)
+            return self.completed
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+    async def _process(self, index: int, influencer: dict,
+                       executors: Dict[str, ThreadPoolExecutor],
+                       prefetch: Optional[asyncio.Future] = None,
+                       analysis_pool: Optional[ProcessPoolExecutor] = None,
+                       analysis_slots: Optional[asyncio.Semaphore] = None) -> Optional[list]:
+        platform = influencer.get('platform', '').lower()
+        handle = influencer.get('handle')
+        executor = executors.get(platform)
+        if executor is None or not handle:
+            log.info("Skipping row %s: unsupported platform '%s' or missing handle",
+                     index, platform)
+            if self.on_result:
+                self.on_result(index, None)
+            return None
+
+        loop = asyncio.get_running_loop()
+        try:
+            if platform == 'youtube' and prefetch is not None:
+                await asyncio.shield(prefetch)
+            if analysis_pool is None:
+                row = await loop.run_in_executor(
+                    executor, self.analyzer.process_handle, platform, handle,
+                    influencer.get('country')
+                )
+            else:
+                row = await self._fetch_and_analyze(platform, handle, influencer.get('country'),
+                                                    executor, analysis_pool, analysis_slots)
+        except Exception as e:
+            # A single failed handle must never abort the whole run
+            log.error("Error processing %s handle %s: %s", platform, handle, e)
+            row = None
+
+        self.completed += 1
+        log.info("Finished influencer %s (%s done)", index, self.completed)
+        if self.on_result:
+            self.on_result(index, row)
+        return row
+
+    async def _fetch_and_analyze(self, platform: str, handle: str, country: Optional[str],
+                                 executor: ThreadPoolExecutor, analysis_pool: ProcessPoolExecutor,
+                                 analysis_slots: asyncio.Semaphore) -> Optional[list]:
+        """process_handle split over the two stages: fetch on a thread, build the row in a process"""
+        loop = asyncio.get_running_loop()
+        row = None
+        with span('handle', platform=platform):
+            data = await loop.run_in_executor(executor, self.analyzer.fetch_handle,
+                                              platform, handle, country)
+            if data:
+                async with analysis_slots:
+                    with span('analysis', platform=platform):
+                        row = await loop.run_in_executor(analysis_pool, analyze,
+                                                         platform, handle, data)
+        count('profiles', platform=platform, outcome='ok' if row else 'failed')
+        return row
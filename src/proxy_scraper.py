@@ -1,14 +1,16 @@
 import requests
 from bs4 import BeautifulSoup
-import time
-import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
+from rate_limiter import call_with_backoff, shared_limiter
+from instrumentation import get_logger
 
-def scrape_free_proxies():
-    """Scrape free proxies from multiple public proxy lists"""
-    proxies = []
-    
-    # List of free proxy sources
-    sources = [
+log = get_logger(__name__)
+
+def default_sources():
+    """Public proxy lists to scrape"""
+    return [
         {
             'url': 'https://free-proxy-list.net/',
             'scraper': scrape_free_proxy_list
@@ -18,33 +20,87 @@ def scrape_free_proxies():
             'scraper': scrape_ssl_proxies
         }
     ]
+
+def scrape_free_proxies(sources=None):
+    """Scrape free proxies from multiple public proxy lists"""
+    unique_proxies = []
+    asyncio.run(_scrape_sources(sources or default_sources(), unique_proxies.append))
+    log.info("Found %s unique proxies", len(unique_proxies))
+    return unique_proxies
+
+async def _scrape_sources(sources, on_proxy, executor=None):
+    """Fetch all sources at once, passing each new (deduplicated) proxy to on_proxy"""
+    loop = asyncio.get_running_loop()
+    seen = set()
     
-    for source in sources:
+    async def fetch(source):
         try:
-            new_proxies = source['scraper'](source['url'])
-            proxies.extend(new_proxies)
-            # Add delay between requests to avoid getting blocked
-            time.sleep(random.uniform(1, 3))
+            proxies = await loop.run_in_executor(executor, source['scraper'], source['url'])
         except Exception as e:
-            print(f"Error scraping {source['url']}: {e}")
+            log.error("Error scraping %s: %s", source['url'], e)
+            return
+        for proxy in proxies:
+            if proxy['server'] not in seen:
+                seen.add(proxy['server'])
+                result = on_proxy(proxy)
+                if asyncio.iscoroutine(result):
+                    await result
     
-    # Remove duplicates
-    unique_proxies = []
-    seen = set()
+    await asyncio.gather(*[fetch(source) for source in sources])
+
+async def stream_live_proxies(sources=None, concurrency=50, timeout=5,
+                              test_url='https://www.google.com', on_live=None):
+    """
+    Scrape all sources concurrently and validate candidates as they arrive
+    on a pool of `concurrency` workers; each working proxy is passed to
+    on_live as soon as it's confirmed. Returns all live proxies.
+    """
+    loop = asyncio.get_running_loop()
+    candidates = asyncio.Queue(maxsize=concurrency * 2)
+    live = []
+    checked = 0
     
-    for proxy in proxies:
-        proxy_str = proxy['server']
-        if proxy_str not in seen:
-            seen.add(proxy_str)
-            unique_proxies.append(proxy)
+    async def validate():
+        nonlocal checked
+        while True:
+            proxy = await candidates.get()
+            if proxy is None:
+                return
+            ok = await loop.run_in_executor(executor, test_proxy, proxy, test_url, timeout)
+            checked += 1
+            if ok:
+                live.append(proxy)
+                if on_live:
+                    on_live(proxy)
     
-    print(f"Found {len(unique_proxies)} unique proxies")
-    return unique_proxies
+    # Source fetches and proxy checks are blocking requests calls; give them
+    # their own threads so the concurrency limit is what we asked for
+    executor = ThreadPoolExecutor(max_workers=concurrency + len(sources or default_sources()),
+                                  thread_name_prefix='proxy-check')
+    try:
+        workers = [asyncio.ensure_future(validate()) for _ in range(concurrency)]
+        await _scrape_sources(sources or default_sources(), candidates.put, executor)
+        for _ in workers:
+            await candidates.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        executor.shutdown(wait=False)
+    
+    log.info("%s/%s scraped proxies are live", len(live), checked)
+    return live
+
+def fetch_page(url, max_retries=3):
+    """GET a proxy list page under its domain's rate limit, backing off on 429/5xx"""
+    def get():
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        return response
+    return call_with_backoff(get, shared_limiter().for_url(url), max_retries=max_retries, label=url)
 
 def scrape_free_proxy_list(url):
     """Scrape proxies from free-proxy-list.net"""
     proxies = []
-    response = requests.get(url)
+    response = fetch_page(url)
     soup = BeautifulSoup(response.text, 'html.parser')
     
     proxy_table = soup.find('table')
@@ -72,17 +128,25 @@ def scrape_ssl_proxies(url):
     # Similar implementation to free-proxy-list as they have same structure
     return scrape_free_proxy_list(url)
 
-def test_proxy(proxy):
+def proxy_url(proxy):
+    """Proxy server URL with its credentials, if any, embedded"""
+    if not proxy.get('username'):
+        return proxy['server']
+    parts = urlsplit(proxy['server'])
+    netloc = f"{proxy['username']}:{proxy.get('password') or ''}@{parts.netloc}"
+    return urlunsplit((parts.scheme, netloc, parts.path, parts.query, parts.fragment))
+
+def test_proxy(proxy, test_url='https://www.google.com', timeout=5):
     """Test if a proxy is working"""
     try:
         response = requests.get(
-            'https://www.google.com',
+            test_url,
             proxies={
-                'http': proxy['server'],
-                'https': proxy['server']
+                'http': proxy_url(proxy),
+                'https': proxy_url(proxy)
             },
-            timeout=5
+            timeout=timeout
         )
         return response.status_code == 200
-    except:
+    except Exception:
         return False 
\ No newline at end of file
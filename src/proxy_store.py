@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from typing import Dict, Iterator, List, Optional, Tuple
+from instrumentation import get_logger
+
+log = get_logger(__name__)
+
+# Proxy attributes kept per record; anything else in a source line is dropped
+PROXY_FIELDS = ('server', 'username', 'password', 'country',
+                'session_username', 'session_password', 'session_host')
+# Bumped whenever the snapshot layout changes, so stale snapshots are ignored
+SNAPSHOT_VERSION = 1
+
+
+class ProxyRecord:
+    """
+    One proxy and its rolling health (EWMA success rate and latency plus a
+    circuit breaker), stored in slots so large lists stay small in memory
+    Supports read-only mapping access, so it can be used like a proxy dict
+    """
+    __slots__ = PROXY_FIELDS + ('success_rate', 'latency', 'consecutive_failures',
+                                'trips', 'open_until')
+
+    def __init__(self, server: str, username: Optional[str] = None,
+                 password: Optional[str] = None, country: Optional[str] = None,
+                 session_username: Optional[str] = None, session_password: Optional[str] = None,
+                 session_host: Optional[str] = None):
+        self.server = server
+        self.username = username
+        self.password = password
+        self.country = country
+        self.session_username = session_username
+        self.session_password = session_password
+        self.session_host = session_host
+        self.success_rate: float = 1.0
+        self.latency: float = 1.0  # seconds
+        self.consecutive_failures: int = 0
+        self.trips: int = 0
+        self.open_until: float = 0
+
+    @classmethod
+    def from_dict(cls, proxy: dict) -> 'ProxyRecord':
+        return cls(*(proxy.get(field) for field in PROXY_FIELDS))
+
+    def fields(self) -> Tuple:
+        return tuple(getattr(self, field) for field in PROXY_FIELDS)
+
+    def score(self) -> float:
+        """Selection weight: reliable, fast proxies are picked more often"""
+        return max(self.success_rate, 0.01) / (1 + self.latency)
+
+    def is_open(self, now: float) -> bool:
+        return now < self.open_until
+
+    # Mapping access, e.g. proxy['server'], proxy.get('username'), dict(proxy)
+    def keys(self) -> List[str]:
+        return [field for field in PROXY_FIELDS if getattr(self, field) is not None]
+
+    def __getitem__(self, key: str):
+        if key not in PROXY_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        value = getattr(self, key, None) if key in PROXY_FIELDS else None
+        return default if value is None else value
+
+    def __repr__(self) -> str:
+        return f"ProxyRecord({self.server!r}, country={self.country!r})"
+
+
+def parse_proxy_line(line: str) -> Optional[Tuple]:
+    """Proxy fields from one line of a proxy list (JSON or ip:port[:username:password])"""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line.startswith('{'):
+        try:
+            proxy = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        if not proxy.get('server'):
+            return None
+        return tuple(proxy.get(field) for field in PROXY_FIELDS)
+    parts = line.split(':')
+    if len(parts) < 2:
+        return None
+    return (f'http://{parts[0]}:{parts[1]}',
+            parts[2] if len(parts) > 2 else None,
+            parts[3] if len(parts) > 3 else None,
+            None, None, None, None)
+
+
+class ProxyStore:
+    """Proxy records indexed by server and country for O(1) lookups"""
+
+    def __init__(self, snapshot_directory: Optional[str] = None):
+        self.records: List[ProxyRecord] = []
+        self.index: Dict[str, ProxyRecord] = {}
+        self.countries: Dict[str, List[ProxyRecord]] = {}
+        # Parsed proxy files are cached here, keyed by the file's mtime and size
+        self.snapshot_directory = snapshot_directory
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[ProxyRecord]:
+        return iter(self.records)
+
+    def __contains__(self, server: str) -> bool:
+        return server in self.index
+
+    def get(self, server: str) -> Optional[ProxyRecord]:
+        return self.index.get(server)
+
+    def lookup(self, proxy) -> Optional[ProxyRecord]:
+        """The stored record for a proxy record or dict"""
+        if isinstance(proxy, ProxyRecord):
+            return proxy
+        return self.index.get(proxy['server'])
+
+    def add(self, proxy) -> Optional[ProxyRecord]:
+        """Add a proxy (record, dict or field tuple); returns None if its server is already stored"""
+        if isinstance(proxy, tuple):
+            record = ProxyRecord(*proxy)
+        elif isinstance(proxy, ProxyRecord):
+            record = proxy
+        else:
+            record = ProxyRecord.from_dict(proxy)
+        if record.server in self.index:
+            return None
+        self.records.append(record)
+        self.index[record.server] = record
+        if record.country:
+            self.countries.setdefault(record.country, []).append(record)
+        return record
+
+    def by_country(self, country: Optional[str]) -> List[ProxyRecord]:
+        if country is None:
+            return self.records
+        return self.countries.get(country, [])
+
+    def snapshot_path(self, filepath: str) -> Optional[str]:
+        if not self.snapshot_directory:
+            return None
+        digest = hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.snapshot_directory, f'{digest}.pickle')
+
+    def load_file(self, filepath: str) -> int:
+        """
+        Add every proxy in a proxy list file; returns how many were new
+        A binary snapshot of the parsed list is reused while the file is unchanged
+        """
+        stat = os.stat(filepath)
+        key = (SNAPSHOT_VERSION, stat.st_mtime_ns, stat.st_size)
+        snapshot = self.snapshot_path(filepath)
+        rows = self._read_snapshot(snapshot, key) if snapshot else None
+        if rows is None:
+            with open(filepath, 'r') as f:
+                rows = [row for row in map(parse_proxy_line, f) if row is not None]
+            if snapshot:
+                self._write_snapshot(snapshot, key, rows)
+        return sum(1 for row in rows if self.add(row) is not None)
+
+    @staticmethod
+    def _read_snapshot(path: str, key: Tuple) -> Optional[List[Tuple]]:
+        try:
+            with open(path, 'rb') as f:
+                stored_key, rows = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+            return None
+        return rows if stored_key == key else None
+
+    @staticmethod
+    def _write_snapshot(path: str, key: Tuple, rows: List[Tuple]):
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((key, rows), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("Could not write proxy snapshot %s: %s", path, e)
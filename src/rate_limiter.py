@@ -0,0 +1,215 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+from config import RATE_LIMITS
+from instrumentation import count, get_logger
+
+log = get_logger(__name__)
+
+# HTTP statuses worth retrying after a backoff
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Google APIs report per-user rate limits as 403s with one of these reasons
+RATE_LIMIT_REASONS = (b'rateLimitExceeded', b'userRateLimitExceeded')
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 64.0) -> float:
+    """Exponential backoff with jitter: half the delay is fixed, half random"""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def http_status(error: Exception) -> Optional[int]:
+    """HTTP status of a googleapiclient or requests error, if it has one"""
+    resp = getattr(error, 'resp', None) or getattr(error, 'response', None)
+    status = getattr(resp, 'status', None) or getattr(resp, 'status_code', None)
+    return int(status) if status is not None else None
+
+
+def is_throttled(error: Exception) -> bool:
+    """True if the server told us to slow down"""
+    status = http_status(error)
+    if status == 429:
+        return True
+    content = getattr(error, 'content', None) or b''
+    return status == 403 and any(reason in content for reason in RATE_LIMIT_REASONS)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds from the Retry-After header of a throttling response, if given"""
+    resp = getattr(error, 'resp', None)
+    headers = resp if hasattr(resp, 'get') else getattr(getattr(error, 'response', None), 'headers', None)
+    try:
+        return float(headers.get('retry-after')) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket whose refill rate adapts AIMD-style: it creeps up while
+    requests succeed and is cut back on throttling responses or slow replies
+    """
+
+    def __init__(self, name: str, rate: float = 1.0, burst: float = 1,
+                 min_rate: float = 0.05, max_rate: Optional[float] = None,
+                 increase: float = 0.05, decrease: float = 0.5,
+                 slow_decrease: float = 0.9, latency_target: Optional[float] = None,
+                 cooldown: float = 30):
+        self.name = name
+        self.rate = rate                    # tokens per second
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.increase = increase            # added to the rate per success
+        self.decrease = decrease            # rate multiplier when throttled
+        self.slow_decrease = slow_decrease  # rate multiplier for slow replies and errors
+        self.latency_target = latency_target
+        self.cooldown = cooldown            # pause after a throttle without Retry-After
+
+        self.tokens = float(burst)
+        self.blocked_until = 0.0
+        self.requests = 0
+        self.throttles = 0
+        self.waited = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # A negative balance is the queue of callers already waiting
+            self.tokens -= 1
+            wait = max(-self.tokens / self.rate if self.tokens < 0 else 0,
+                       self.blocked_until - now)
+            self.requests += 1
+            self.waited += wait
+            return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self, latency: Optional[float] = None):
+        with self._lock:
+            if self.latency_target and latency is not None and latency > self.latency_target:
+                self.rate = max(self.min_rate, self.rate * self.slow_decrease)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_error(self):
+        """A server error: back off a little in case it's load related"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.slow_decrease)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """A 429, rate-limit error or challenge page: halve the rate and pause"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0)
+            self.blocked_until = max(self.blocked_until,
+                                     now + (retry_after if retry_after is not None else self.cooldown))
+            self.throttles += 1
+        count('throttles', bucket=self.name)
+        log.warning("Rate limited by %s, slowing to %.2f requests/s", self.name, self.rate)
+
+    def stats(self) -> dict:
+        return {
+            'rate': round(self.rate, 3),
+            'requests': self.requests,
+            'throttles': self.throttles,
+            'waited': round(self.waited, 1)
+        }
+
+
+class RateLimiter:
+    """One adaptive token bucket per domain or API, created on first use"""
+
+    def __init__(self, limits: Optional[Dict[str, dict]] = None):
+        limits = dict(RATE_LIMITS if limits is None else limits)
+        self.default = limits.pop('default', {})
+        self.limits = limits
+        self.buckets: Dict[str, AdaptiveTokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, key: str) -> AdaptiveTokenBucket:
+        with self._lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = AdaptiveTokenBucket(key, **{**self.default, **self.limits.get(key, {})})
+                self.buckets[key] = bucket
+            return bucket
+
+    def for_url(self, url: str) -> AdaptiveTokenBucket:
+        """The bucket for a URL's domain, e.g. www.instagram.com -> instagram.com"""
+        host = (urlsplit(url).hostname or url).lower()
+        for key in self.limits:
+            if host == key or host.endswith('.' + key):
+                return self.bucket(key)
+        return self.bucket(host[4:] if host.startswith('www.') else host)
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {key: bucket.stats() for key, bucket in self.buckets.items()}
+
+
+_shared: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def shared_limiter() -> RateLimiter:
+    """The process-wide limiter, so every code path sees the same buckets"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RateLimiter()
+        return _shared
+
+
+def call_with_backoff(func: Callable, bucket: Optional[AdaptiveTokenBucket] = None,
+                      max_retries: int = 5, base: float = 1.0, cap: float = 64.0,
+                      label: str = 'Request'):
+    """
+    Call func through a rate-limit bucket, retrying throttling and 5xx errors
+    with jittered exponential backoff and feeding the outcome back to the bucket
+    """
+    for attempt in range(max_retries + 1):
+        if bucket:
+            bucket.acquire()
+        start = time.monotonic()
+        try:
+            result = func()
+        except Exception as e:
+            throttled = is_throttled(e)
+            if (not throttled and http_status(e) not in RETRYABLE_STATUSES) or attempt == max_retries:
+                raise
+            if bucket:
+                if throttled:
+                    bucket.on_throttle(retry_after(e))
+                else:
+                    bucket.on_error()
+            delay = backoff_delay(attempt, base, cap)
+            count('retries', label=label)
+            log.info("%s returned %s, retrying in %.1fs", label, http_status(e), delay)
+            time.sleep(delay)
+            continue
+        if bucket:
+            bucket.on_success(time.monotonic() - start)
+        return result
@@ -0,0 +1,75 @@
+import re
+from typing import Dict, Iterable, Optional
+
+
+class ResourceBlocker:
+    """
+    Route handler for scraping pages: aborts requests we never need
+    (media, fonts, analytics) and counts the bytes of what does get through
+    """
+
+    def __init__(self, resource_types: Iterable[str] = ('image', 'media', 'font'),
+                 url_patterns: Iterable[str] = (), allow_thumbnails: bool = False,
+                 thumbnail_pattern: Optional[str] = None, enabled: bool = True):
+        self.enabled = enabled
+        self.resource_types = set(resource_types)
+        self.url_pattern = re.compile('|'.join(url_patterns)) if url_patterns else None
+        self.allow_thumbnails = allow_thumbnails
+        self.thumbnail_pattern = re.compile(thumbnail_pattern) if thumbnail_pattern else None
+
+        self._bytes: Dict[int, int] = {}
+        self._blocked: Dict[int, int] = {}
+
+    async def install(self, page):
+        """Attach blocking and byte counting to a page"""
+        key = id(page)
+        self._bytes[key] = 0
+        self._blocked[key] = 0
+
+        async def on_request_finished(request):
+            try:
+                sizes = await request.sizes()
+            except Exception:
+                return
+            self._bytes[key] = self._bytes.get(key, 0) + (
+                sizes.get('responseBodySize', 0) + sizes.get('responseHeadersSize', 0)
+            )
+
+        page.on('requestfinished', on_request_finished)
+        page.on('close', lambda _: self._forget(key))
+        if self.enabled:
+            await page.route('**/*', lambda route: self._handle(route, key))
+
+    def _forget(self, key: int):
+        self._bytes.pop(key, None)
+        self._blocked.pop(key, None)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if self.url_pattern and self.url_pattern.search(url):
+            return True
+        if resource_type not in self.resource_types:
+            return False
+        if (self.allow_thumbnails and resource_type == 'image' and
+                self.thumbnail_pattern and self.thumbnail_pattern.search(url)):
+            return False
+        return True
+
+    async def _handle(self, route, key: int):
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self._blocked[key] = self._blocked.get(key, 0) + 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def take_counts(self, page) -> dict:
+        """Bytes received and requests blocked on a page since the last call"""
+        key = id(page)
+        counts = {
+            'bytes': self._bytes.get(key, 0),
+            'blocked_requests': self._blocked.get(key, 0)
+        }
+        if key in self._bytes:
+            self._bytes[key] = 0
+            self._blocked[key] = 0
+        return counts
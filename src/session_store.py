@@ -0,0 +1,62 @@
+import json
+import os
+import re
+import time
+from typing import Optional
+from instrumentation import get_logger
+
+log = get_logger(__name__)
+
+
+class SessionStore:
+    """
+    On-disk cache of Playwright storage_state (cookies + localStorage),
+    one file per Instagram account and proxy country
+    """
+
+    def __init__(self, directory: str = '.sessions', ttl: float = 86400,
+                 refresh_margin: float = 3600):
+        self.directory = directory
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, account: str, country: str) -> str:
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', f"{account or 'anonymous'}_{country or 'any'}")
+        return os.path.join(self.directory, f"{name}.json")
+
+    def age(self, account: str, country: str) -> Optional[float]:
+        """Seconds since the session was saved, or None if there is none"""
+        try:
+            return time.time() - os.path.getmtime(self.path(account, country))
+        except OSError:
+            return None
+
+    def load(self, account: str, country: str) -> Optional[str]:
+        """Path to a storage_state file usable for new_context, if still within the TTL"""
+        age = self.age(account, country)
+        if age is None or age > self.ttl:
+            return None
+        return self.path(account, country)
+
+    def needs_refresh(self, account: str, country: str) -> bool:
+        """True when the session is missing or about to expire"""
+        age = self.age(account, country)
+        return age is None or age > self.ttl - self.refresh_margin
+
+    def save(self, account: str, country: str, state: dict):
+        """Atomically write a storage_state dict, readable only by the owner"""
+        path = self.path(account, country)
+        tmp_path = f"{path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+        log.info("Saved Instagram session for %s (%s)", account or 'anonymous', country or 'any')
+
+    def invalidate(self, account: str, country: str):
+        """Forget a session, e.g. after Instagram logged it out"""
+        try:
+            os.remove(self.path(account, country))
+        except OSError:
+            pass
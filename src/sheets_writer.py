@@ -0,0 +1,97 @@
+import time
+from typing import Callable, List, Optional
+
+from rate_limiter import AdaptiveTokenBucket, call_with_backoff, shared_limiter
+from instrumentation import get_logger, span
+
+log = get_logger(__name__)
+
+
+class SheetsWriter:
+    """
+    Buffers output rows and writes them to consecutive sheet rows with
+    values().batchUpdate once enough rows or time have accumulated
+    """
+
+    def __init__(self, sheets, spreadsheet_id: str, sheet: str = 'Output',
+                 start_row: int = 2, last_column: str = 'K',
+                 max_rows: int = 200, max_interval: float = 15,
+                 max_retries: int = 5, limiter: Optional[AdaptiveTokenBucket] = None,
+                 on_flush: Optional[Callable[[object, int], None]] = None):
+        self.sheets = sheets
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet = sheet
+        self.cursor = start_row
+        self.last_column = last_column
+        self.max_rows = max_rows
+        self.max_interval = max_interval
+        self.max_retries = max_retries
+        # Shared with every other Sheets API caller in the process
+        self.limiter = limiter or shared_limiter().bucket('sheets')
+        # Called as on_flush(checkpoint, cursor) after each successful write
+        self.on_flush = on_flush
+
+        self._buffer: List[list] = []
+        self._checkpoint = None
+        self._last_flush = time.monotonic()
+        self.rows_written = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def append(self, rows: List[list], checkpoint=None):
+        """Queue rows for writing; checkpoint is passed to on_flush once they're written"""
+        self._buffer.extend(rows)
+        if checkpoint is not None:
+            self._checkpoint = checkpoint
+        self.maybe_flush()
+
+    def maybe_flush(self) -> bool:
+        """Flush if the buffer is large or old enough"""
+        if (len(self._buffer) >= self.max_rows or
+                time.monotonic() - self._last_flush >= self.max_interval):
+            return self.flush()
+        return True
+
+    def flush(self) -> bool:
+        """Write everything buffered; on failure the rows stay buffered"""
+        self._last_flush = time.monotonic()
+        if not self._buffer and self._checkpoint is None:
+            return True
+
+        data = []
+        cursor = self.cursor
+        for i in range(0, len(self._buffer), self.max_rows):
+            chunk = self._buffer[i:i + self.max_rows]
+            data.append({
+                'range': f"{self.sheet}!A{cursor}:{self.last_column}{cursor + len(chunk) - 1}",
+                'values': chunk
+            })
+            cursor += len(chunk)
+
+        if data:
+            try:
+                with span('sheets.flush'):
+                    result = self._execute(self.sheets.spreadsheets().values().batchUpdate(
+                        spreadsheetId=self.spreadsheet_id,
+                        body={'valueInputOption': 'USER_ENTERED', 'data': data}
+                    ))
+            except Exception as e:
+                log.error("Error writing to sheet: %s", e)
+                return False
+            log.info("%s cells updated (rows %s-%s)",
+                     result.get('totalUpdatedCells'), self.cursor, cursor - 1)
+
+        self.rows_written += len(self._buffer)
+        self.cursor = cursor
+        self._buffer = []
+        if self.on_flush and self._checkpoint is not None:
+            self.on_flush(self._checkpoint, self.cursor)
+        self._checkpoint = None
+        return True
+
+    def _execute(self, request):
+        """Execute a request under the Sheets rate limit, retrying 429/5xx with backoff"""
+        return call_with_backoff(request.execute, self.limiter,
+                                 max_retries=self.max_retries, label='Sheets API')
@@ -0,0 +1,261 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from zoneinfo import ZoneInfo
+
+from rate_limiter import AdaptiveTokenBucket, call_with_backoff, shared_limiter
+from instrumentation import count, get_logger, span
+
+log = get_logger(__name__)
+
+# Quota units charged by the YouTube Data API v3 per request
+QUOTA_COSTS = {
+    'search.list': 100,
+    'channels.list': 1,
+    'playlistItems.list': 1,
+    'videos.list': 1
+}
+
+MAX_IDS_PER_REQUEST = 50
+
+
+class QuotaExceeded(Exception):
+    """Raised instead of making a call that would run past the daily quota"""
+
+
+class QuotaTracker:
+    """Counts quota units spent today (Pacific time, like Google) and this run"""
+
+    def __init__(self, daily_limit: int = 10000, reserve: int = 0,
+                 state_path: Optional[str] = None):
+        self.daily_limit = daily_limit
+        self.reserve = reserve
+        self.state_path = state_path
+        self.used_this_run = 0
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._day = self._today()
+        self.used_today = self._load()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(ZoneInfo('America/Los_Angeles')).strftime('%Y-%m-%d')
+
+    def _load(self) -> int:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return 0
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            return state['used'] if state.get('date') == self._day else 0
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def _save(self):
+        if self.state_path:
+            with open(self.state_path, 'w') as f:
+                json.dump({'date': self._day, 'used': self.used_today}, f)
+
+    @property
+    def remaining(self) -> int:
+        return self.daily_limit - self.reserve - self.used_today
+
+    def spend(self, method: str):
+        """Reserve the units for one call, refusing it if the budget would run out"""
+        cost = QUOTA_COSTS[method]
+        with self._lock:
+            if self._today() != self._day:
+                self._day = self._today()
+                self.used_today = 0
+            if self.used_today + cost > self.daily_limit - self.reserve:
+                raise QuotaExceeded(
+                    f"YouTube quota budget reached ({self.used_today}/{self.daily_limit} units used today)"
+                )
+            self.used_today += cost
+            self.used_this_run += cost
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self._save()
+        count('quota_units', cost, api='youtube')
+
+    def summary(self) -> dict:
+        return {
+            'used_this_run': self.used_this_run,
+            'used_today': self.used_today,
+            'remaining': self.remaining,
+            'calls': dict(self.calls)
+        }
+
+
+def chunked(items: List[str], size: int = MAX_IDS_PER_REQUEST):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def channel_data(channel: dict, videos: List[dict]) -> dict:
+    """get_youtube_data's shape from a channels.list item and its recent videos.list items"""
+    return {
+        'channel_id': channel['id'],
+        'subscriber_count': channel['statistics'].get('subscriberCount', 'N/A'),
+        'channel_info': channel['snippet'],
+        'recent_videos': videos
+    }
+
+
+class YouTubeClient:
+    """
+    Quota-aware wrapper around the YouTube Data API that batches channel and
+    video lookups across many channels
+    """
+
+    def __init__(self, service: Callable[[], object], quota: QuotaTracker,
+                 max_videos: int = 15, cache=None,
+                 limiter: Optional[AdaptiveTokenBucket] = None, max_retries: int = 3):
+        # service returns the discovery client to use on the calling thread
+        self.service = service
+        self.quota = quota
+        self.max_videos = max_videos
+        # Optional DataCache; handle -> channel ID lookups never go stale
+        self.cache = cache
+        self.limiter = limiter or shared_limiter().bucket('youtube')
+        self.max_retries = max_retries
+
+    def _execute(self, method: str, request):
+        def attempt():
+            # Failed calls are charged too, so every attempt spends quota
+            self.quota.spend(method)
+            with span('youtube.api', method=method):
+                return request.execute()
+        return call_with_backoff(attempt, self.limiter, max_retries=self.max_retries,
+                                 label=f'YouTube {method}')
+
+    @staticmethod
+    def normalize_handle(handle: str) -> str:
+        """Accept '@name', 'name', channel URLs and raw channel IDs"""
+        handle = handle.strip()
+        match = re.search(r'youtube\.com/(?:channel/|c/|user/)?([^/?#]+)', handle)
+        if match:
+            handle = match.group(1)
+        return handle
+
+    def resolve_handle(self, handle: str) -> Optional[str]:
+        """Turn a handle into a channel ID, using the cache or the 1-unit forHandle lookup"""
+        handle = self.normalize_handle(handle)
+        if re.fullmatch(r'UC[\w-]{22}', handle):
+            return handle
+
+        if self.cache:
+            channel_id = self.cache.get_resolved('youtube', handle)
+            if channel_id:
+                return channel_id
+
+        channel_id = self._lookup_channel_id(handle)
+        if channel_id and self.cache:
+            self.cache.set_resolved('youtube', handle, channel_id)
+        return channel_id
+
+    def _lookup_channel_id(self, handle: str) -> Optional[str]:
+        response = self._execute('channels.list', self.service().channels().list(
+            part='id',
+            forHandle=handle if handle.startswith('@') else f'@{handle}'
+        ))
+        if response.get('items'):
+            return response['items'][0]['id']
+
+        # Legacy custom names aren't handles; fall back to a 100-unit search
+        log.info("No channel with handle %s, falling back to search...", handle)
+        response = self._execute('search.list', self.service().search().list(
+            part='id',
+            q=handle,
+            type='channel',
+            maxResults=1
+        ))
+        if response.get('items'):
+            return response['items'][0]['id']['channelId']
+        return None
+
+    def get_channels(self, channel_ids: Iterable[str]) -> Dict[str, dict]:
+        """Channel snippet, statistics and uploads playlist, 50 IDs per request"""
+        channels = {}
+        for batch in chunked(list(dict.fromkeys(channel_ids))):
+            response = self._execute('channels.list', self.service().channels().list(
+                part='snippet,statistics,contentDetails',
+                id=','.join(batch),
+                maxResults=MAX_IDS_PER_REQUEST
+            ))
+            for item in response.get('items', []):
+                channels[item['id']] = item
+        return channels
+
+    def get_recent_video_ids(self, uploads_playlist_id: str) -> List[str]:
+        """Newest video IDs from a channel's uploads playlist"""
+        response = self._execute('playlistItems.list', self.service().playlistItems().list(
+            part='contentDetails',
+            playlistId=uploads_playlist_id,
+            maxResults=self.max_videos
+        ))
+        return [item['contentDetails']['videoId'] for item in response.get('items', [])]
+
+    def get_videos(self, video_ids: Iterable[str]) -> Dict[str, dict]:
+        """Video snippet, statistics and paid placement flags, 50 IDs per request"""
+        videos = {}
+        for batch in chunked(list(dict.fromkeys(video_ids))):
+            response = self._execute('videos.list', self.service().videos().list(
+                part='statistics,snippet,paidProductPlacementDetails',
+                id=','.join(batch),
+                maxResults=MAX_IDS_PER_REQUEST
+            ))
+            for item in response.get('items', []):
+                videos[item['id']] = item
+        return videos
+
+    def fetch_channels(self, handles: Iterable[str],
+                       raw: Optional[Dict[str, dict]] = None) -> Dict[str, Optional[dict]]:
+        """
+        Channel data plus recent videos for many handles, in the shape
+        returned by SocialMediaAnalyzer.get_youtube_data (None if not found)
+        Given a dict as raw, it receives each found handle's API resources
+        as {'channel': channels.list item, 'videos': [videos.list items]}
+        """
+        handles = list(dict.fromkeys(handles))
+        channel_ids = {}
+        for handle in handles:
+            channel_id = self.resolve_handle(handle)
+            if channel_id:
+                channel_ids[handle] = channel_id
+            else:
+                log.info("No channel found with handle: %s", handle)
+
+        channels = self.get_channels(channel_ids.values())
+
+        recent = {}
+        for channel_id, channel in channels.items():
+            uploads = channel.get('contentDetails', {}).get('relatedPlaylists', {}).get('uploads')
+            if not uploads:
+                recent[channel_id] = []
+                continue
+            try:
+                recent[channel_id] = self.get_recent_video_ids(uploads)
+            except QuotaExceeded:
+                raise
+            except Exception as e:
+                # Channels without public uploads return 404 for the playlist
+                log.warning("Could not list uploads for %s: %s", channel_id, e)
+                recent[channel_id] = []
+
+        videos = self.get_videos(video_id for ids in recent.values() for video_id in ids)
+
+        results = {}
+        for handle in handles:
+            channel = channels.get(channel_ids.get(handle))
+            if not channel:
+                results[handle] = None
+                continue
+            results[handle] = channel_data(
+                channel, [videos[v] for v in recent.get(channel['id'], []) if v in videos]
+            )
+            if raw is not None:
+                raw[handle] = {'channel': channel, 'videos': results[handle]['recent_videos']}
+        return results
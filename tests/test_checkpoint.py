@@ -0,0 +1,92 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from checkpoint import OrderedFlusher, RunJournal  # noqa: E402
+
+ROWS = {1: 'alice', 2: 'bob', 3: 'carol', 4: 'dave'}
+
+
+class FakeWriter:
+    """SheetsWriter stand-in that keeps the written rows in memory"""
+
+    def __init__(self, sheet=None):
+        # Rows written so far, by sheet row number
+        self.sheet = {} if sheet is None else sheet
+        self.cursor = 2
+        self.on_flush = None
+        self._buffer = []
+        self._checkpoint = None
+
+    def append(self, rows, checkpoint=None):
+        self._buffer.extend(rows)
+        if checkpoint is not None:
+            self._checkpoint = checkpoint
+
+    def maybe_flush(self):
+        return True
+
+    def flush(self):
+        for row in self._buffer:
+            self.sheet[self.cursor] = row
+            self.cursor += 1
+        self._buffer = []
+        if self.on_flush and self._checkpoint is not None:
+            self.on_flush(self._checkpoint, self.cursor)
+        self._checkpoint = None
+        return True
+
+
+def run(path, sheet, fail=(), flush=True):
+    """One (interrupted) run over ROWS, skipping what the journal has done"""
+    journal = RunJournal(path)
+    writer = FakeWriter(sheet)
+    flusher = OrderedFlusher(journal, writer)
+    processed = []
+    for index, handle in ROWS.items():
+        if journal.completed(index, 'instagram', handle):
+            continue
+        processed.append(index)
+        row = None if index in fail else [handle]
+        journal.record(index, 'instagram', handle, row)
+        flusher.add(index, row)
+    if flush:
+        flusher.flush()
+    journal.close()
+    return processed
+
+
+def test_resume_retries_failed_row_already_written_past(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    sheet = {}
+    assert run(path, sheet, fail={2}) == [1, 2, 3, 4]
+    assert sheet == {2: ['alice'], 3: ['carol'], 4: ['dave']}
+
+    # Only the failed row is fetched again; it goes after the rows written
+    assert run(path, sheet) == [2]
+    assert sheet == {2: ['alice'], 3: ['carol'], 4: ['dave'], 5: ['bob']}
+
+    # ...and isn't fetched or written a third time
+    assert run(path, sheet) == []
+    assert len(sheet) == 4
+
+
+def test_resume_retries_failed_row_in_order(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    sheet = {}
+    # Interrupted before anything reached the sheet
+    assert run(path, sheet, fail={2}, flush=False) == [1, 2, 3, 4]
+    assert sheet == {}
+
+    assert run(path, sheet) == [2]
+    assert sheet == {2: ['alice'], 3: ['bob'], 4: ['carol'], 5: ['dave']}
+
+
+def test_completed_ignores_failed_entries(tmp_path):
+    journal = RunJournal(str(tmp_path / 'journal.jsonl'))
+    journal.record(1, 'Instagram', 'alice', None)
+    journal.record(2, 'Instagram', 'bob', ['bob'])
+    assert journal.completed(1, 'instagram', 'alice') is None
+    assert journal.completed(2, 'instagram', 'bob')['row'] == ['bob']
+    journal.close()